@@ -0,0 +1,292 @@
+"""
+Capture of the JSON product APIs retailers fill their grids from.
+
+Instead of waiting for the grid to render and reading it back out of the DOM,
+ApiCapture listens to the page's responses for the retailer's PRODUCT_API
+URL patterns and parses the JSON payloads into product dicts:
+
+    PRODUCT_API = {
+        "patterns": [r"/search/results\\?"],    # response URLs to capture (regex)
+        "items": "results",                     # dotted path to the product list; omit to detect it
+        "fields": {"price": "price.formattedValue"},   # dotted paths overriding the key search
+        "image_base": "https://img.example.com/",      # base for relative image paths (default: the API URL)
+        "page_param": "page",                   # query parameter stepped when replaying
+    }
+
+Without "items", the list is detected: the largest list whose entries mostly
+carry a name and a price (failing that, a name and an image, then a name and
+a link), so navigation and category menus are not taken for products. Each
+field without a path is looked up by its usual key names (see FIELD_KEYS).
+
+Once a payload has been captured, replay() fetches the page after the highest
+one captured or replayed so far directly over HTTP (same URL with page_param
+stepped, same request headers), so later pages skip the browser entirely. A
+replay without new products means the listing is exhausted. If a replay fails,
+replaying is switched off and the handler goes back to loading pages in the
+browser.
+"""
+import re
+import json
+import asyncio
+import logging
+from urllib.parse import urljoin, urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
+
+import usage_ledger
+from http_fetch import http_client, is_challenge
+from proxy_monitor import OXYLABS
+from rate_limiter import throttle
+
+API_CAPTURE_TIMEOUT = 10
+
+FIELD_KEYS = {
+    "name": ("name", "productName", "title", "displayName"),
+    "price": ("formattedValue", "priceString", "displayPrice", "formattedPrice",
+              "salePrice", "currentPrice", "price"),
+    "image": ("imageUrl", "thumbnailUrl", "imageURL", "image", "filePath", "src", "url"),
+    "url": ("url", "canonicalUrl", "productUrl", "pdpUrl"),
+    "id": ("code", "id", "productId", "usItemId", "sku"),
+    "tags": ("tags", "badges", "flags"),
+}
+
+# headers Playwright reports that must not be replayed verbatim
+_SKIP_HEADERS = {"content-length", "host", "connection", "accept-encoding"}
+
+
+def _path(value, path):
+    for part in path.split("."):
+        if isinstance(value, list):
+            value = value[int(part)] if part.isdigit() and int(part) < len(value) else None
+        elif isinstance(value, dict):
+            value = value.get(part)
+        else:
+            return None
+    return value
+
+
+def _find(value, keys, depth=3):
+    """Breadth-first search of nested dicts/lists for the first scalar under one of keys."""
+    level = [value]
+    for _ in range(depth + 1):
+        following = []
+        for node in level:
+            items = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, list) else ()
+            for key in keys:
+                found = node.get(key) if isinstance(node, dict) else None
+                if isinstance(found, (str, int, float)) and not isinstance(found, bool) and str(found).strip():
+                    return found
+            following.extend(v for _, v in items if isinstance(v, (dict, list)))
+        level = following
+    return None
+
+
+def _item_lists(value, depth=6):
+    if depth < 0:
+        return
+    if isinstance(value, list):
+        if value and all(isinstance(v, dict) for v in value):
+            yield value
+        for v in value:
+            yield from _item_lists(v, depth - 1)
+    elif isinstance(value, dict):
+        for v in value.values():
+            yield from _item_lists(v, depth - 1)
+
+
+def _field(item, field, config, depth=3):
+    path = config.get("fields", {}).get(field)
+    return _path(item, path) if path else _find(item, FIELD_KEYS[field], depth)
+
+
+def _detect_items(payload, config):
+    """
+    The named objects of the list that most looks like products. Lists are
+    ranked by the strongest evidence most of their entries carry next to the
+    name: a price, else an image, else a link. Lists where most entries carry
+    none of these (menus, facets) are never picked.
+    """
+    best, best_rank = [], (0, 0)
+    for items in _item_lists(payload):
+        named = [item for item in items if _field(item, "name", config, depth=1)]
+        if len(named) * 2 <= len(items):
+            continue
+        evidence = (lambda item: _price(item, config), lambda item: _image(item, config),
+                    lambda item: _field(item, "url", config))
+        for strength, has in zip((3, 2, 1), evidence):
+            count = sum(1 for item in named if has(item))
+            if count * 2 > len(items):
+                if (strength, count) > best_rank:
+                    best, best_rank = named, (strength, count)
+                break
+    return best
+
+
+def _price(item, config):
+    if "price" in config.get("fields", {}):
+        return _path(item, config["fields"]["price"])
+    # price objects ({"value": 100, "currency": "USD"}) are read from the inside
+    for key in ("price", "prices", "priceInfo", "pricing"):
+        if isinstance(item.get(key), (dict, list)):
+            found = _find(item[key], FIELD_KEYS["price"] + ("value", "amount"))
+            if found is not None:
+                return found
+    return _find(item, FIELD_KEYS["price"])
+
+
+def _image(item, config):
+    path = config.get("fields", {}).get("image")
+    if path:
+        return _path(item, path)
+    # look inside image containers first, so the product's own "url" is not taken for its image
+    for key in ("images", "image", "imagery", "imageInfo", "media", "primaryImage"):
+        if isinstance(item.get(key), (dict, list)):
+            found = _find(item[key], FIELD_KEYS["image"])
+            if found:
+                return found
+    return _find(item, FIELD_KEYS["image"][:4], depth=1)
+
+
+def parse_products(payload, config, base_url=None):
+    """Product dicts (name, price, image, url, id, tags) from one API payload."""
+    items_path = config.get("items")
+    items = _path(payload, items_path) if items_path else _detect_items(payload, config)
+    fields = config.get("fields", {})
+    products = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        product = {}
+        for field in ("name", "url", "id"):
+            product[field] = _path(item, fields[field]) if field in fields else _find(item, FIELD_KEYS[field])
+        product["price"] = _price(item, config)
+        product["image"] = _image(item, config)
+        tags = _path(item, fields["tags"]) if "tags" in fields else next(
+            (item[k] for k in FIELD_KEYS["tags"] if isinstance(item.get(k), list)), [])
+        product["tags"] = [t if isinstance(t, str) else _find(t, ("text", "label", "name", "value"))
+                           for t in tags or []]
+        product["tags"] = [t for t in product["tags"] if t]
+        if isinstance(product["price"], (int, float)):
+            product["price"] = f"{product['price']:,.2f}"
+        for field, base in (("image", config.get("image_base", base_url)), ("url", base_url)):
+            if isinstance(product[field], str) and base:
+                product[field] = urljoin(base, product[field])
+        if product["name"]:
+            products.append(product)
+    return products
+
+
+class ApiCapture:
+    """Collects a retailer's product API responses from pages it is attached to."""
+
+    def __init__(self, config):
+        self.config = config
+        self.patterns = [re.compile(p) for p in config.get("patterns", [])]
+        self.products = []
+        self.request_url = None       # request of the highest page so far, the template for replays
+        self.request_headers = None
+        self.page = None              # page_param value of request_url
+        self.replay_failed = False
+        self.misses = 0               # pages loaded without any payload
+        self._seen = set()
+        self._captured = asyncio.Event()
+
+    def attach(self, page):
+        """Start listening on page; call before navigating."""
+        self.products = []
+        self._captured.clear()
+        page.on("response", self._on_response)
+
+    async def _on_response(self, response):
+        if not any(p.search(response.url) for p in self.patterns):
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        try:
+            payload = await response.json()
+        except Exception as e:
+            logging.debug(f"Unreadable API payload from {response.url}: {e}")
+            return
+        products = [p for p in parse_products(payload, self.config, response.url) if self._new(p)]
+        if not products:
+            return
+        logging.info(f"Captured {len(products)} products from {response.url}")
+        self.products.extend(products)
+        page = self._page_of(response.url)
+        if response.request.method == "GET" and (
+                self.request_url is None or (page is not None and (self.page is None or page > self.page))):
+            # a page that loads more on scroll fires one request per API page; replay after the last
+            self.request_url, self.page = response.url, page
+            headers = await response.request.all_headers()
+            self.request_headers = {k: v for k, v in headers.items()
+                                    if k.lower() not in _SKIP_HEADERS and not k.startswith(":")}
+        self._captured.set()
+
+    def _new(self, product):
+        key = product.get("id") or product.get("url") or product.get("name")
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        return True
+
+    async def wait(self, timeout=API_CAPTURE_TIMEOUT):
+        """
+        Products captured on the attached page, waiting up to timeout seconds
+        for the first payload. Once a page has come up empty without any
+        payload ever captured, later pages are not waited for.
+        """
+        if self.misses and self.request_url is None:
+            timeout = 0
+        try:
+            await asyncio.wait_for(self._captured.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.misses += 1
+        return list(self.products)
+
+    def _page_of(self, url):
+        param = self.config.get("page_param")
+        value = next((v for k, v in parse_qsl(urlsplit(url).query) if k == param), None) if param else None
+        return int(value) if value is not None and value.lstrip("-").isdigit() else None
+
+    @property
+    def replayable(self):
+        return bool(self.request_url) and self.page is not None and not self.replay_failed
+
+    def _replay_url(self, page):
+        parts = urlsplit(self.request_url)
+        param = self.config["page_param"]
+        query = [(k, str(page) if k == param else v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+
+    async def replay(self):
+        """
+        Products of the API page after the highest one captured or replayed,
+        fetched over HTTP. Returns [] once a page brings no new products (the
+        listing is exhausted), and None (and stops replaying) if the API
+        answers with anything but product JSON.
+        """
+        url = self._replay_url(self.page + 1)
+        await throttle(url)
+        try:
+            response = await http_client().get(url, headers=self.request_headers)
+            usage_ledger.ledger.record_request(OXYLABS, url, len(response.content))
+            if is_challenge(response) or response.status_code >= 400:
+                raise ValueError(f"HTTP {response.status_code}")
+            products = [p for p in parse_products(response.json(), self.config, url) if self._new(p)]
+        except (httpx.HTTPError, ValueError, json.JSONDecodeError) as e:
+            logging.warning(f"API replay of {url} failed ({e}); loading pages in the browser again")
+            self.replay_failed = True
+            return None
+        logging.info(f"Replayed {url}: {len(products)} products")
+        self.request_url, self.page = url, self.page + 1
+        return products
+
+
+def tile_fields(product):
+    """(name, price, image_url, additional info) of a captured product, as the handlers read them from tiles."""
+    return (
+        product["name"] or "N/A",
+        product["price"] or "N/A",
+        product["image"] or "N/A",
+        " | ".join(product["tags"]) or "N/A",
+    )
@@ -1,5 +1,5 @@
 
-from flask import Flask, render_template, request,send_file, jsonify
+from flask import Flask, render_template, request,send_file, jsonify, Response, stream_with_context
 import os
 import re
 import openpyxl
@@ -15,146 +15,25 @@ from openpyxl.drawing.image import Image as XLImage
 import pymssql
 import tempfile
 from urllib.parse import urlparse
-from proxy import check_proxies
-from scrapers.ernest_jones import handle_ernest_jones
-from scrapers.shaneco import handle_shane_co
-from scrapers.fhinds import handle_fhinds
-from scrapers.gabriel import handle_gabriel
-from scrapers.hsamuel import handle_h_samuel
-from scrapers.kay import handle_kay
-from scrapers.jared import handle_jared
-from scrapers.tiffany import handle_tiffany
-#==========================================#
-from scrapers.kayoutlet import handle_kayoutlet
-from scrapers.zales import handle_zales
-from scrapers.helzberg import handle_helzberg
-from scrapers.rosssimons import handle_rosssimons
-from scrapers.peoplesjewellers import handle_peoplesjewellers
-from scrapers.fraserhart import handle_fraserhart
-from scrapers.fields import handle_fields
-from scrapers.warrenjames import handle_warrenjames
-from scrapers.goldsmiths import handle_goldsmiths
-from scrapers.thediamondstore import handle_thediamondstore
-from scrapers.prouds import handle_prouds
-from scrapers.goldmark import handle_goldmark
-from scrapers.anguscoote import handle_anguscoote
-from scrapers.bash import handle_bash
-from scrapers.shiels import handle_shiels
-from scrapers.mazzucchellis import handle_mazzucchellis
-from scrapers.hoskings import handle_hoskings
-from scrapers.hardybrothers import handle_hardybrothers
-from scrapers.zamels import handle_zamels
-from scrapers.wallacebishop import handle_wallacebishop
-from scrapers.bevilles import handle_bevilles
-from scrapers.michaelhill import handle_michaelhill
-from scrapers.apart import handle_apart
-from scrapers.macys import handle_macys
-from scrapers.jcpenney import handle_jcpenney
-from scrapers.fredmeyer import handle_fredmeyer
-from scrapers.beaverbrooks import handle_beaverbrooks
-#############################################################################################################
-            #stage 2
-#############################################################################################################
-from scrapers.finks import handle_finks
-from scrapers.smilingrocks import handle_smilingrocks
-from scrapers.bluenile import handle_bluenile
-from scrapers.benbridge import handle_benbridge
-from scrapers.hannoush import handle_hannoush
-from scrapers.jcojewellery import handle_jcojewellery
-from scrapers.diamonds import handle_77diamonds
-from scrapers.reeds import handle_reeds
-from scrapers.walmart import handle_walmart
-#############################################################################################################
-from scrapers.armansfinejewellery import handle_armansfinejewellery
-from scrapers.jacquefinejewellery import handle_jacquefinejewellery
-from scrapers.medleyjewellery import handle_medleyjewellery
-from scrapers.cullenjewellery import handle_cullenjewellery
-from scrapers.grahams import handle_grahams
-from scrapers.larsenjewellery import handle_larsenjewellery
-from scrapers.ddsdiamonds import handle_ddsdiamonds
-from scrapers.garenjewellery import handle_garenjewellery
-from scrapers.stefandiamonds import handle_stefandiamonds
-from scrapers.goodstoneinc import handle_goodstoneinc
-from scrapers.natashaschweitzer import handle_natasha
-from scrapers.sarahandsebastian import handle_sarahandsebastian
-from scrapers.moissanite import handle_moissanite
-from scrapers.daimondcollection import handle_diamondcollection
-from scrapers.cushlawhiting import handle_cushlawhiting
-from scrapers.cerrone import handle_cerrone
-from scrapers.briju import handle_briju
-from scrapers.histoiredor import handle_histoiredor
-from scrapers.marcorian import handle_marcorian
-from scrapers.klenotyaurum import handle_klenotyaurum
-from scrapers.stroilioro import handle_stroilioro
-from scrapers.mariemass import handle_mariemass
-from scrapers.mattioli import handle_mattioli
-from scrapers.pomellato import handle_pomellato
-from scrapers.dior import handle_dior
-from scrapers.bonnie import handle_bonnie
-
-########################################### 24/07 ################################################################## 
-from scrapers.diamondsfactory import handle_diamondsfactory
-from scrapers.davidmarshalllondon import handle_davidmarshalllondon
-from scrapers.monicavinader import handle_monicavinader
-from scrapers.boodles import handle_boodles
-from scrapers.mariablack import handle_mariablack
-from scrapers.londonjewelers import handle_londonjewelers
-from scrapers.fernandojorge import handle_fernandojorge
-from scrapers.pandora import handle_pandora
-from scrapers.daisyjewellery import handle_daisyjewellery
-from scrapers.missoma import handle_missoma
-from scrapers.astleyclarke import handle_astleyclarke
-from scrapers.edgeofember import handle_edgeofember
-from scrapers.mateo import handle_mateo
-from scrapers.bybonniejewelry import handle_bybonniejewelry
-################################################ 25/04 ############################################################# 
-from scrapers.tacori import handle_tacori
-from scrapers.vancleefarpels import handle_vancleefarpels
-from scrapers.davidyurman import handle_davidyurman
-from scrapers.chopard import handle_chopard
-from scrapers.jonehardy import handle_jonehardy
-from scrapers.anitako import handle_anitako
-from scrapers.jennifermeyer import handle_jennifermeyer 
-from scrapers.jacquieaiche import handle_jacquieaiche
-from scrapers.jacobandco import handle_jacobandco
-from scrapers.ferkos import handle_ferkos
-from scrapers.heartsonfire import handle_heartsonfire
-
-################################################## 26 /04 ###########################################################
-from scrapers.chanel import handle_chanel
-from scrapers.buccellati import handle_buccellati
-from scrapers.harrywinston import handle_harrywinston
-
-from scrapers.jadetrau import handle_jadetrau
-from scrapers.vrai import handle_vrai
-from scrapers.stephaniegottlieb import handle_stephaniegottlieb
-from scrapers.marcobicego import handle_marcobicego
-from scrapers.ringconcierge import handle_ringconcierge
-from scrapers.eastwestgemco import handle_eastwestgemco
-from scrapers.facets import handle_facets
-from scrapers.birks import handle_birks
-from scrapers.boochier import handle_boochier
-
-############################################# 28/04  ########################################################
-from scrapers.graff import handle_graff
-from scrapers.mejuri import handle_mejuri
-from scrapers.boucheron import handle_boucheron
-from scrapers.chaumet import handle_chaumet
-from scrapers.brilliantearth import handle_brilliantearth
-from scrapers.forevermark import handle_forevermark
-from scrapers.louisvuitton import handle_louisvuitton
-
-from scrapers.piaget import handle_piaget
-from scrapers.harrods import handle_harrods
-from scrapers.cartier import handle_cartier
-from scrapers.bulgari import handle_bulgari
-from scrapers.laurenbjewelry1 import handle_laurenbjewelry1
-from scrapers.ajaffe import handle_ajaffe
+from proxy import check_proxies, proxy_health, start_health_checks
+from robots import robots_cache
+from resource_blocking import blocking_report
+from rate_limiter import rate_stats
+from infinite_scroll import scroll_report
+from http_fetch import fetch_modes
+from usage_ledger import ledger as usage_ledger
+from scraper_registry import load_registry, resolve as resolve_scraper
+from exports import file_id_for, resolve_file, download_url
+from jobs import submit_job, get_job, stream_events, JOB_EXECUTOR
+from crawl_queue import get_crawl_queue
+from batch import submit_batch, get_batch, normalize_items, BATCH_MAX_CONCURRENCY, BATCH_CONCURRENCY_LIMIT
+from scraper_loop import run_scraper, shutdown as shutdown_scraper_loop
+from scheduler import get_scheduler
 
 
 #############################################################################################################
 
-import asyncio
+import atexit
 from flask_cors import CORS
 from utils import get_public_ip,log_event
 from limit_checker import check_monthly_limit
@@ -165,6 +44,18 @@ from dotenv import load_dotenv
 load_dotenv
 app = Flask(__name__)
 CORS(app)
+load_registry()
+atexit.register(shutdown_scraper_loop)
+start_health_checks()
+
+# Let this web process also work the shared crawl queue
+if os.getenv("CRAWL_NODE_ENABLED", "0") == "1":
+    from crawl_node import CrawlNode
+    CrawlNode().start()
+
+# Launch the recurring crawls from crawl_schedules.json
+if os.getenv("SCHEDULER_ENABLED", "0") == "1":
+    get_scheduler().start()
 #############################################################################################################
 import logging
 import os
@@ -178,29 +69,6 @@ DB_CONFIG = {
 
 os.makedirs("logs", exist_ok=True)
 
-# File to store request count
-request_count_file = "logs/proxy_request_count.txt"
-
-# Read request count from file or initialize it
-if os.path.exists(request_count_file):
-    with open(request_count_file, "r") as f:
-        try:
-            request_count = int(f.read().strip())
-        except ValueError:
-            request_count = 0
-else:
-    request_count = 0
-
-def log_and_increment_request_count():
-    """Increment and log the number of requests made via proxy."""
-    global request_count
-    request_count += 1
-    with open(request_count_file, "w") as f:
-        f.write(str(request_count))
-    logging.info(f"Total requests via proxy: {request_count}")
-
-
-        
 #############################################################################################################
 # Load JSON data
 def load_websites():
@@ -228,7 +96,10 @@ def fetch_data():
    
     # Get URL and pagination details
     url = request.form.get('url')
-    max_pages = int(request.form.get('maxPages', 1))  # Ensure max_pages is an integer
+    try:
+        max_pages = _int_param(request.form.get('maxPages', 1), 'maxPages')
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # print("Final URL:", final_url)
     domain = urlparse(url).netloc.lower()
@@ -238,278 +109,21 @@ def fetch_data():
     print(domain)
     logging.info(f"Processing request for domain: {domain}")
 
-    # Increment and log request count
-    log_and_increment_request_count()
-
-    # Check domain and call corresponding handler function
-    if 'www.jared.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jared(url, max_pages))    
-    elif 'www.kay.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_kay(url, max_pages))    
-    elif 'www.fhinds.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_fhinds(url, max_pages))
-    elif 'www.ernestjones.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_ernest_jones(url, max_pages))
-    elif 'www.gabrielny.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_gabriel(url, max_pages)) 
-    elif 'www.hsamuel.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_h_samuel(url, max_pages)) 
-    elif 'www.tiffany.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_tiffany(url, max_pages)) 
-    elif 'www.shaneco.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_shane_co(url, max_pages))
-#======================================================================#
-    elif 'www.kayoutlet.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_kayoutlet(url, max_pages)) 
-    elif 'www.zales.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_zales(url, max_pages))       
-    elif 'www.helzberg.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_helzberg(url, max_pages))
-    elif 'www.ross-simons.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_rosssimons(url, max_pages))
-    elif 'www.peoplesjewellers.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_peoplesjewellers(url, max_pages))  
-    elif 'www.fraserhart.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_fraserhart(url, max_pages)) 
-    elif 'www.fields.ie' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_fields(url, max_pages))
-    elif 'www.warrenjames.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_warrenjames(url, max_pages))
-    elif 'www.goldsmiths.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_goldsmiths(url, max_pages))
-    elif 'www.thediamondstore.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_thediamondstore(url, max_pages))
-    elif 'www.prouds.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_prouds(url, max_pages)) 
-    elif 'goldmark.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_goldmark(url, max_pages))
-    elif 'www.anguscoote.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_anguscoote(url, max_pages))   
-    elif 'bash.com' in domain:  
-        base64_encoded, filename, file_path = asyncio.run(handle_bash(url, max_pages)) 
-    elif 'www.shiels.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_shiels(url, max_pages)) 
-    elif 'mazzucchellis.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mazzucchellis(url, max_pages)) 
-    elif 'hoskings.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_hoskings(url, max_pages)) 
-    elif 'www.hardybrothers.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_hardybrothers(url, max_pages))
-    elif 'www.zamels.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_zamels(url, max_pages))
-    elif 'www.wallacebishop.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_wallacebishop(url, max_pages)) 
-    elif 'www.bevilles.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_bevilles(url, max_pages))    
-    elif 'www.michaelhill.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_michaelhill(url, max_pages))
-    elif 'www.apart.eu' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_apart(url, max_pages))
-    elif 'www.macys.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_macys(url, max_pages))
-    elif 'www.jcpenney.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jcpenney(url, max_pages))
-    elif 'www.fredmeyerjewelers.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_fredmeyer(url, max_pages))
-    elif 'www.beaverbrooks.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_beaverbrooks(url, max_pages)) 
-        
-######################################### 21/04 ####################################################################                                                                                          
-    elif 'www.finks.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_finks(url, max_pages))  
-    elif 'smilingrocks.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_smilingrocks(url, max_pages))
-    elif 'www.bluenile.com' in domain: 
-        base64_encoded, filename, file_path = asyncio.run(handle_bluenile(url, max_pages)) 
-    elif 'www.benbridge.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_benbridge(url, max_pages)) 
-    elif 'www.hannoush.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_hannoush(url, max_pages)) 
-    elif 'www.jcojewellery.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jcojewellery(url, max_pages))
-    elif 'www.77diamonds.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_77diamonds(url, max_pages))
-    elif 'www.reeds.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_reeds(url, max_pages))
-    elif 'www.walmart.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_walmart(url, max_pages))     
-############################################# 22/04 ################################################################               
-    elif 'armansfinejewellery.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_armansfinejewellery(url, max_pages)) 
-    elif 'jacquefinejewellery.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jacquefinejewellery(url, max_pages))
-    elif 'medleyjewellery.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_medleyjewellery(url, max_pages))
-    elif 'cullenjewellery.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_cullenjewellery(url, max_pages)) 
-    elif 'www.grahams.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_grahams(url, max_pages))
-    elif 'www.larsenjewellery.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_larsenjewellery(url, max_pages))  
-    elif 'ddsdiamonds.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_ddsdiamonds(url, max_pages))
-    elif 'www.garenjewellery.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_garenjewellery(url, max_pages))
-    elif 'stefandiamonds.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_stefandiamonds(url, max_pages))
-    elif 'www.goodstoneinc.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_goodstoneinc(url, max_pages))                             
-    elif 'natashaschweitzer.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_natasha(url, max_pages))
-    elif 'www.sarahandsebastian.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_sarahandsebastian(url, max_pages))
-    elif 'tmcfinejewellers.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_moissanite(url, max_pages))
-    elif 'diamondcollective.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_diamondcollection(url, max_pages))
-    elif 'cushlawhiting.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_cushlawhiting(url, max_pages))
-    elif 'cerrone.com.au' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_cerrone(url, max_pages))     
-#############################################################################################################
-    elif 'www.briju.pl' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_briju(url, max_pages))
-    elif 'www.histoiredor.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_histoiredor(url, max_pages))
-    elif 'www.marc-orian.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_marcorian(url, max_pages))
-    elif 'www.klenotyaurum.cz' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_klenotyaurum(url, max_pages))       
-    elif 'www.stroilioro.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_stroilioro(url, max_pages)) 
-    # elif 'bash.com' in domain:
-    #     base64_encoded, filename, file_path = asyncio.run(handle_americanswiss(url, max_pages))  
-    elif 'mariemas.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mariemass(url, max_pages))
-    elif 'mattioli.it' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mattioli(url, max_pages))
-    elif 'www.pomellato.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_pomellato(url, max_pages))
-    elif 'www.dior.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_dior(url, max_pages))
-        
-                        
-########################################### 24/07 ################################################################## 
-    elif 'www.diamondsfactory.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_diamondsfactory(url, max_pages)) 
-    elif 'www.davidmarshalllondon.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_davidmarshalllondon(url, max_pages))
-    elif 'www.monicavinader.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_monicavinader(url, max_pages))        
-    elif 'www.boodles.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_boodles(url, max_pages))
-    elif 'www.maria-black.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mariablack(url, max_pages))    
-    elif 'www.londonjewelers.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_londonjewelers(url, max_pages))
-    elif 'fernandojorge.co.uk' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_fernandojorge(url, max_pages)) 
-    elif 'us.pandora.net' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_pandora(url, max_pages)) 
-    elif 'www.daisyjewellery.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_daisyjewellery(url, max_pages)) 
-    elif 'www.missoma.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_missoma(url, max_pages)) 
-    elif 'bybonniejewelry.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_bybonniejewelry(url, max_pages))
-    elif 'mateonewyork.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mateo(url, max_pages))
-    elif 'edgeofember.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_edgeofember(url, max_pages))
-    elif 'www.astleyclarke.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_astleyclarke(url, max_pages))  
-################################################ 25/04 ############################################################# 
-    elif 'www.tacori.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_tacori(url, max_pages))
-    elif 'www.vancleefarpels.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_vancleefarpels(url, max_pages))
-    elif 'www.davidyurman.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_davidyurman(url, max_pages))
-    elif 'www.chopard.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_chopard(url, max_pages)) 
-    elif "johnhardy.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jonehardy(url, max_pages))
-    elif "www.anitako.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_anitako(url, max_pages))
-    elif "jennifermeyer.com" in domain: 
-        base64_encoded, filename, file_path = asyncio.run(handle_jennifermeyer(url, max_pages))
-    elif "jacquieaiche.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jacquieaiche(url, max_pages))
-    elif "jacobandco.shop" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jacobandco(url, max_pages))
-    elif "ferkosfinejewelry.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_ferkos(url, max_pages))
-    elif "www.heartsonfire.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_heartsonfire(url, max_pages))
-                                             
-################################################### 26 /04 ##########################################################
-    elif 'www.chanel.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_chanel(url, max_pages)) 
-    elif 'www.buccellati.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_buccellati(url, max_pages))
-    elif 'www.harrywinston.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_harrywinston(url, max_pages))  
-    
-    elif "jadetrau.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_jadetrau(url, max_pages))
-    elif "www.vrai.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_vrai(url, max_pages))
-    elif "stephaniegottlieb.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_stephaniegottlieb(url, max_pages))
-    elif "marcobicego.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_marcobicego(url, max_pages))
-    elif "ringconcierge.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_ringconcierge(url, max_pages))
-    elif "eastwestgemco.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_eastwestgemco(url, max_pages))
-    elif "64facets.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_facets(url, max_pages))
-    elif "boochier.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_boochier(url, max_pages))
-    elif "www.birks.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_birks(url, max_pages))
-    
-           
-############################################# 28/04  ################################################################ 
-    elif 'www.graff.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_graff(url, max_pages))
-    elif 'mejuri.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_mejuri(url, max_pages))  
-    elif 'www.boucheron.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_boucheron(url, max_pages)) 
-    elif 'www.chaumet.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_chaumet(url, max_pages)) 
-    elif 'www.brilliantearth.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_brilliantearth(url, max_pages))
-    elif 'www.forevermark.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_forevermark(url, max_pages))
-    elif 'eu.louisvuitton.com' in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_louisvuitton(url, max_pages))
-    elif "www.piaget.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_piaget(url, max_pages))
-    elif "www.harrods.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_harrods(url, max_pages))
-    elif "www.cartier.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_cartier(url, max_pages))
-
-    elif "www.bulgari.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_bulgari(url, max_pages))
-    elif "www.laurenbjewelry.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_laurenbjewelry1(url, max_pages))
-    elif "ajaffe.com" in domain:
-        base64_encoded, filename, file_path = asyncio.run(handle_ajaffe(url, max_pages))
-    
-                            
-#############################################################################################################
-    else:
+    # Look up the retailer's handler in the scraper registry
+    scraper = resolve_scraper(url)
+    if scraper is None:
         log_event(f"Unknown website attempted: {domain}")
         return jsonify({"error": "Unknown website"}), 500
+
+    filename, file_path = run_scraper(scraper.load_handler()(url, max_pages))
     
     # Return file download link or error message
     if filename:
         # update_scrape_status(scrape_id, 'inactive')
         log_event(f"Successfully scraped {domain}. File generated: {filename}")
-        return jsonify({'file': base64_encoded, 'filename': filename, 'filepath': file_path}),200
+        file_id = file_id_for(file_path)
+        return jsonify({'file_id': file_id, 'download_url': download_url(file_id),
+                        'filename': filename, 'filepath': file_path}),200
     else:
         # update_scrape_status(scrape_id, 'error')
         print("output")
@@ -518,6 +132,263 @@ def fetch_data():
 
 
 
+#############################################################################################################
+
+def _int_param(value, name):
+    """value as an int; ValueError naming the parameter if it is not one."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def _scrape_params():
+    """URL and page count from either a form post or a JSON body."""
+    data = request.get_json(silent=True) or request.form
+    return data.get('url'), _int_param(data.get('maxPages', data.get('max_pages', 1)), 'maxPages')
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a scrape and return its job id without waiting for it to run."""
+    if not check_monthly_limit():
+        return jsonify({"errormsg": "Daily limit reached. Scraping is disabled."}), 400
+
+    try:
+        url, max_pages = _scrape_params()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    scraper = resolve_scraper(url or "")
+    if scraper is None:
+        log_event(f"Unknown website attempted: {urlparse(url or '').netloc.lower()}")
+        return jsonify({"error": "Unknown website"}), 400
+
+    job = submit_job(scraper, url, max_pages)
+    return jsonify({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Live progress for a job as Server-Sent Events (page loaded, products, images, DB rows)."""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    last_id = int(request.headers.get("Last-Event-ID", 0) or 0)
+    return Response(
+        stream_with_context(stream_events(job, last_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    if not job.cancel():
+        return jsonify({"error": "Job cannot be cancelled", "status": job.status}), 409
+    log_event(f"Cancel requested for scrape job {job_id}")
+    return jsonify({"job_id": job.id, "cancel_requested": True}), 202
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    file_id = file_id_for(job.file_path)
+    if resolve_file(file_id) is None:
+        return jsonify({"error": "Result not available", "status": job.status}), 409
+    return download_file(file_id)
+
+
+@app.route('/files/<file_id>', methods=['GET'])
+def download_file(file_id):
+    """
+    Stream an export from disk. conditional=True gives Content-Length, ETag and
+    HTTP Range support, so large workbooks are never loaded into memory whole.
+    """
+    path = resolve_file(file_id)
+    if path is None:
+        return jsonify({"error": "Unknown file"}), 404
+    return send_file(
+        path,
+        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        as_attachment=True,
+        download_name=file_id,
+        conditional=True,
+    )
+
+
+@app.route('/proxy-health', methods=['GET'])
+def proxy_health_status():
+    """Last proxy check; ?refresh=1 re-checks before answering."""
+    return jsonify(proxy_health(force=request.args.get("refresh") == "1"))
+
+
+@app.route('/robots-cache', methods=['GET'])
+def robots_cache_stats():
+    return jsonify(robots_cache.stats())
+
+
+@app.route('/resource-blocking', methods=['GET'])
+def resource_blocking_report():
+    """Per retailer: aborted requests by type and bytes/seconds saved against baseline pages."""
+    return jsonify(blocking_report())
+
+
+@app.route('/rate-limits', methods=['GET'])
+def rate_limits():
+    return jsonify(rate_stats())
+
+
+@app.route('/scroll-stats', methods=['GET'])
+def scroll_stats():
+    """Per retailer: scrolls and seconds each listing page needed to finish loading."""
+    return jsonify(scroll_report())
+
+
+@app.route('/fetch-modes', methods=['GET'])
+def fetch_mode_status():
+    """Per domain: whether listing pages are read over plain HTTP or need the browser."""
+    return jsonify(fetch_modes.snapshot())
+
+
+@app.route('/proxy-usage', methods=['GET'])
+def proxy_usage():
+    """
+    Proxy requests, bytes and navigation time from the usage ledger.
+    ?group_by=domain|proxy|job (comma separated), ?since=YYYY-MM-DD, ?job=<id>, ?limit=n
+    """
+    group_by = request.args.get("group_by", "domain").split(",")
+    try:
+        limit = _int_param(request.args.get("limit", 100), "limit")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    rows = usage_ledger.query(group_by, request.args.get("since"), request.args.get("job"), limit)
+    return jsonify({"totals": usage_ledger.totals(), "rows": rows})
+
+
+@app.route('/workers', methods=['GET'])
+def worker_status():
+    """Per-process metrics when jobs run on the worker farm (SCRAPE_EXECUTOR=process)."""
+    if JOB_EXECUTOR != "process":
+        return jsonify({"executor": JOB_EXECUTOR})
+    from worker_farm import get_farm
+    return jsonify({"executor": JOB_EXECUTOR, **get_farm().stats()})
+
+
+@app.route('/queue', methods=['POST'])
+def enqueue_crawl():
+    """Add URLs to the shared crawl queue; any scraper node may pick them up."""
+    if not check_monthly_limit():
+        return jsonify({"errormsg": "Daily limit reached. Scraping is disabled."}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        items = normalize_items(data.get("items", []))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid queue items: {e}"}), 400
+    unknown = [item["url"] for item in items if resolve_scraper(item["url"]) is None]
+    if unknown:
+        return jsonify({"error": "Unknown website", "urls": unknown}), 400
+
+    queue = get_crawl_queue()
+    task_ids = [queue.enqueue(item["url"], item["max_pages"]) for item in items]
+    return jsonify({"task_ids": task_ids}), 202
+
+
+@app.route('/queue', methods=['GET'])
+def crawl_queue_stats():
+    return jsonify(get_crawl_queue().stats())
+
+
+@app.route('/queue/<task_id>', methods=['GET'])
+def crawl_task_status(task_id):
+    task = get_crawl_queue().get(task_id)
+    if task is None:
+        return jsonify({"error": "Unknown task"}), 404
+    return jsonify(task.to_dict())
+
+
+@app.route('/batch', methods=['POST'])
+def create_batch():
+    """
+    Scrape many URLs concurrently. Body: {"items": [{"url": ..., "max_pages": ...}],
+    "max_concurrency": n}, n capped at BATCH_CONCURRENCY_LIMIT. Returns a batch id; the manifest
+    fills in at /batch/<id>.
+    """
+    if not check_monthly_limit():
+        return jsonify({"errormsg": "Daily limit reached. Scraping is disabled."}), 400
+
+    data = request.get_json(silent=True) or {}
+    try:
+        items = normalize_items(data.get("items", []))
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid batch items: {e}"}), 400
+    if not items:
+        return jsonify({"error": "No items to scrape"}), 400
+
+    unknown = [item["url"] for item in items if resolve_scraper(item["url"]) is None]
+    if unknown:
+        return jsonify({"error": "Unknown website", "urls": unknown}), 400
+
+    max_concurrency = data.get("max_concurrency", BATCH_MAX_CONCURRENCY)
+    if type(max_concurrency) is not int or max_concurrency < 1:
+        return jsonify({"error": "max_concurrency must be a positive integer"}), 400
+
+    batch = submit_batch(items, min(max_concurrency, BATCH_CONCURRENCY_LIMIT))
+    return jsonify({"batch_id": batch.id, "status": batch.status, "status_url": f"/batch/{batch.id}"}), 202
+
+
+@app.route('/batch/<batch_id>', methods=['GET'])
+def batch_status(batch_id):
+    batch = get_batch(batch_id)
+    if batch is None:
+        return jsonify({"error": "Unknown batch"}), 404
+    return jsonify(batch.to_dict())
+
+
+@app.route('/schedules', methods=['GET'])
+def list_schedules():
+    return jsonify(get_scheduler().list())
+
+
+@app.route('/schedules', methods=['POST'])
+def save_schedule():
+    """
+    Create or replace a recurring crawl. Body: {"id", "url", "max_pages",
+    "cadence": "hourly"|"daily"|"weekly"|hours, "window": {"start": "HH:MM", "end": "HH:MM"}}.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        schedule = get_scheduler().upsert(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid schedule: {e}"}), 400
+    return jsonify(schedule.to_dict()), 201
+
+
+@app.route('/schedules/<schedule_id>', methods=['DELETE'])
+def delete_schedule(schedule_id):
+    if not get_scheduler().remove(schedule_id):
+        return jsonify({"error": "Unknown schedule"}), 404
+    return jsonify({"deleted": schedule_id})
+
+
+@app.route('/schedules/runs', methods=['GET'])
+def schedule_runs():
+    return jsonify(get_scheduler().recent_runs(request.args.get("schedule_id")))
+
+
 #############################################################################################################
 
 @app.route("/reset-limit", methods=["GET"])
@@ -0,0 +1,210 @@
+"""
+Batch crawl: run many category URLs concurrently and collect one manifest.
+
+    python batch.py urls.json --concurrency 6 --output manifest.json
+
+urls.json is a list of {"url": ..., "max_pages": ...} objects (or plain URL
+strings, which use --pages). A plain text file with one "url [max_pages]"
+per line works too.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import threading
+
+from scraper_registry import load_registry, resolve
+from exports import file_id_for, download_url
+from proxy import check_proxies
+from scraper_loop import run_scraper
+from usage_ledger import bind_job, unbind_job
+from utils import log_event
+
+# Scrapes running at once across all retailers in one batch
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+# Highest max_concurrency a /batch request may ask for
+BATCH_CONCURRENCY_LIMIT = int(os.getenv("BATCH_CONCURRENCY_LIMIT", "16"))
+
+
+def normalize_items(raw_items, default_pages=1):
+    """Accept URL strings or {url, max_pages} dicts and return uniform dicts."""
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, str):
+            items.append({"url": raw.strip(), "max_pages": default_pages})
+        else:
+            if not isinstance(raw["url"], str):
+                raise ValueError(f"url must be a string, not {type(raw['url']).__name__}")
+            items.append({
+                "url": raw["url"].strip(),
+                "max_pages": int(raw.get("max_pages", raw.get("maxPages", default_pages))),
+            })
+    return items
+
+
+async def run_batch(items, max_concurrency=BATCH_MAX_CONCURRENCY, on_result=None):
+    """
+    Scrape every item concurrently and return a manifest.
+    At most max_concurrency scrapes run at once, and each retailer is further
+    capped by its registry `concurrency` setting, so total time tracks the
+    slowest retailer rather than the sum of all of them.
+    """
+    global_slots = asyncio.Semaphore(max_concurrency)
+    retailer_slots = {}
+    started_at = time.time()
+
+    async def run_one(index, item):
+        url, max_pages = item["url"], item["max_pages"]
+        result = {
+            "index": index, "url": url, "max_pages": max_pages, "retailer": None,
+            "status": "failed", "filename": None, "file_path": None,
+            "error": None, "seconds": None,
+        }
+        scraper = resolve(url)
+        if scraper is None:
+            result["error"] = "Unknown website"
+        else:
+            result["retailer"] = scraper.name
+            slots = retailer_slots.setdefault(
+                scraper.name, asyncio.Semaphore(scraper.settings["concurrency"])
+            )
+            # take the retailer slot first so a queued retailer does not hold a global slot
+            async with slots, global_slots:
+                start = time.perf_counter()
+                try:
+                    handler = scraper.load_handler()
+                    filename, file_path = await handler(url, max_pages)
+                    result.update(status="done" if filename else "failed",
+                                  filename=filename, file_path=file_path,
+                                  download_url=download_url(file_id_for(file_path)))
+                    if not filename:
+                        result["error"] = "Scraper did not produce a file"
+                except Exception as e:
+                    logging.error(f"Batch item {url} failed: {e}")
+                    result["error"] = str(e)
+                result["seconds"] = round(time.perf_counter() - start, 2)
+        if on_result:
+            on_result(result)
+        return result
+
+    results = await asyncio.gather(*(run_one(i, item) for i, item in enumerate(items)))
+    finished_at = time.time()
+    return {
+        "started_at": started_at,
+        "finished_at": finished_at,
+        "elapsed_seconds": round(finished_at - started_at, 2),
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "done"),
+        "failed": sum(1 for r in results if r["status"] != "done"),
+        "results": results,
+    }
+
+
+class BatchRun:
+    """A batch submitted through the web API; results fill in as items finish."""
+
+    def __init__(self, items, max_concurrency):
+        self.id = uuid.uuid4().hex
+        self.items = items
+        self.max_concurrency = max_concurrency
+        self.status = "running"
+        self.results = []
+        self.manifest = None
+        self.error = None
+
+    def to_dict(self):
+        if self.manifest is not None:
+            return {"batch_id": self.id, "status": self.status, **self.manifest}
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "total": len(self.items),
+            "completed": len(self.results),
+            "results": sorted(self.results, key=lambda r: r["index"]),
+            "error": self.error,
+        }
+
+
+_batches = {}
+_lock = threading.Lock()
+
+
+def submit_batch(items, max_concurrency=BATCH_MAX_CONCURRENCY):
+    """Start a batch in the background and return its BatchRun."""
+    batch = BatchRun(items, max_concurrency)
+    with _lock:
+        _batches[batch.id] = batch
+
+    def _run():
+        try:
+            is_valid, message = check_proxies()
+            if not is_valid:
+                raise RuntimeError(f"Proxy validation failed: {message}")
+            job_token = bind_job(f"batch-{batch.id}")
+            try:
+                batch.manifest = run_scraper(run_batch(items, max_concurrency, batch.results.append))
+            finally:
+                unbind_job(job_token)
+            batch.status = "done"
+            log_event(f"Batch {batch.id} finished: {batch.manifest['succeeded']}/{batch.manifest['total']} succeeded "
+                      f"in {batch.manifest['elapsed_seconds']}s")
+        except Exception as e:
+            batch.error = str(e)
+            batch.status = "failed"
+            logging.error(f"Batch {batch.id} failed: {e}")
+
+    threading.Thread(target=_run, name=f"batch-{batch.id[:8]}", daemon=True).start()
+    return batch
+
+
+def get_batch(batch_id):
+    with _lock:
+        return _batches.get(batch_id)
+
+
+def _read_items(path, default_pages):
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    try:
+        return normalize_items(json.loads(text), default_pages)
+    except json.JSONDecodeError:
+        items = []
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            items.append({"url": parts[0], "max_pages": int(parts[1]) if len(parts) > 1 else default_pages})
+        return items
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape a list of category URLs concurrently.")
+    parser.add_argument("input", help="JSON list of {url, max_pages} or a text file of 'url [max_pages]' lines")
+    parser.add_argument("--pages", type=int, default=1, help="max_pages for entries that do not set one")
+    parser.add_argument("--concurrency", type=int, default=BATCH_MAX_CONCURRENCY,
+                        help="scrapes running at once across all retailers")
+    parser.add_argument("--output", help="write the manifest here instead of stdout")
+    args = parser.parse_args()
+
+    from limit_checker import check_monthly_limit
+    if not check_monthly_limit():
+        sys.exit("Monthly limit reached. Scraping is disabled.")
+
+    load_registry()
+    items = _read_items(args.input, args.pages)
+    manifest = run_scraper(run_batch(items, args.concurrency))
+
+    output = json.dumps(manifest, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Startup benchmark: eager vs lazy scraper loading.
+
+Each run happens in a fresh interpreter so import caches do not leak between
+modes. Reports wall-clock startup time and peak resident memory.
+
+    python benchmarks/startup_benchmark.py              # registry only
+    python benchmarks/startup_benchmark.py --target app # full Flask app import
+    python benchmarks/startup_benchmark.py --runs 10
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+if {target!r} == "app":
+    import app
+else:
+    import scraper_registry
+    scraper_registry.load_registry()
+elapsed = time.perf_counter() - start
+scrapers_loaded = sum(1 for name in sys.modules if name.startswith("scrapers."))
+print(json.dumps({{
+    "seconds": elapsed,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "scraper_modules": scrapers_loaded,
+}}))
+"""
+
+
+def run_once(target, eager):
+    env = dict(os.environ)
+    env["SCRAPER_EAGER_IMPORT"] = "1" if eager else "0"
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT.format(target=target)],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(label, samples):
+    seconds = [s["seconds"] for s in samples]
+    rss_mb = [s["max_rss_kb"] / 1024 for s in samples]
+    print(f"{label:<6} startup: median {statistics.median(seconds):.3f}s "
+          f"(min {min(seconds):.3f}s, max {max(seconds):.3f}s) | "
+          f"peak RSS: {statistics.median(rss_mb):.1f} MB | "
+          f"scraper modules imported: {samples[0]['scraper_modules']}")
+    return statistics.median(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare eager and lazy scraper loading at startup.")
+    parser.add_argument("--target", choices=["registry", "app"], default="registry")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    eager = [run_once(args.target, eager=True) for _ in range(args.runs)]
+    lazy = [run_once(args.target, eager=False) for _ in range(args.runs)]
+
+    eager_median = summarize("eager", eager)
+    lazy_median = summarize("lazy", lazy)
+    if lazy_median > 0:
+        print(f"lazy loading is {eager_median / lazy_median:.1f}x faster to start")
+
+
+if __name__ == "__main__":
+    main()
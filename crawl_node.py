@@ -0,0 +1,213 @@
+"""
+Scraper node: pulls (url, max_pages) tasks from the shared crawl queue and
+runs them through the registered handle_* coroutines. Product URLs queued by
+sitemap discovery are read with product_pages.scrape_product instead.
+
+    python crawl_node.py run --concurrency 2        # work the queue until stopped
+    python crawl_node.py enqueue urls.json --pages 3
+    python crawl_node.py stats
+"""
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+
+from crawl_queue import get_crawl_queue, DEFAULT_LEASE_SECONDS
+from product_pages import scrape_product
+from scraper_registry import load_registry, resolve
+from scraper_loop import submit
+from sitemaps import SitemapState, is_product_url
+from limit_checker import check_monthly_limit
+from usage_ledger import bind_job, unbind_job
+from utils import log_event
+
+NODE_CONCURRENCY = int(os.getenv("CRAWL_NODE_CONCURRENCY", "1"))
+POLL_INTERVAL = float(os.getenv("CRAWL_POLL_INTERVAL", "5"))
+
+
+class CrawlNode:
+    """Leases tasks from a CrawlQueue and runs them, heartbeating while each runs."""
+
+    def __init__(self, queue=None, node_id=None, concurrency=NODE_CONCURRENCY,
+                 lease_seconds=DEFAULT_LEASE_SECONDS, poll_interval=POLL_INTERVAL):
+        self.queue = queue or get_crawl_queue()
+        self.node_id = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+        self._sitemap_state = None
+        self._state_lock = threading.Lock()
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._work, args=(f"{self.node_id}#{i}",),
+                                      name=f"crawl-node-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        log_event(f"Crawl node {self.node_id} started with {self.concurrency} slot(s)")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _work(self, worker_id):
+        while not self._stop.is_set():
+            try:
+                if not check_monthly_limit():
+                    self._stop.wait(self.poll_interval * 12)
+                    continue
+                task = self.queue.lease(worker_id, self.lease_seconds)
+            except Exception as e:
+                logging.error(f"Crawl node {worker_id} could not lease a task: {e}")
+                self._stop.wait(self.poll_interval)
+                continue
+            if task is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            try:
+                self._run_task(worker_id, task)
+            except Exception as e:
+                # the lease runs out and the task is requeued; the slot keeps working
+                logging.exception(f"Crawl node {worker_id} crashed on task {task.id}: {e}")
+
+    def _settle(self, method, worker_id, task, *args):
+        """
+        Call heartbeat/complete/fail on the queue. A queue error (e.g. a
+        database blip) is logged and gives None, so it is never mistaken for
+        a handler failure and never ends the worker thread.
+        """
+        try:
+            return getattr(self.queue, method)(task.id, worker_id, *args)
+        except Exception as e:
+            logging.error(f"Crawl node {worker_id} could not {method} task {task.id}: {e}")
+            return None
+
+    def _run_task(self, worker_id, task):
+        logging.info(f"{worker_id} running crawl task {task.id}: {task.url} (attempt {task.attempts})")
+        scraper = resolve(task.url)
+        if scraper is None:
+            self._settle("fail", worker_id, task, "Unknown website")
+            return
+        if is_product_url(task.url):
+            self._run_product_task(worker_id, task)
+            return
+
+        start = time.perf_counter()
+        job_token = bind_job(f"task-{task.id}")
+        try:
+            future = submit(scraper.load_handler()(task.url, task.max_pages))
+        finally:
+            unbind_job(job_token)
+        lease_lost = False
+        last_beat = time.monotonic()
+        # heartbeat at a third of the lease so one missed beat does not lose it
+        while True:
+            try:
+                filename, file_path = future.result(timeout=self.lease_seconds / 3)
+                break
+            except FutureTimeoutError:
+                if lease_lost:
+                    continue
+                held = self._settle("heartbeat", worker_id, task, self.lease_seconds)
+                if held:
+                    last_beat = time.monotonic()
+                # a failed heartbeat call is retried until the lease would have run out anyway
+                elif held is False or time.monotonic() - last_beat >= self.lease_seconds:
+                    logging.warning(f"Lease on crawl task {task.id} lost; cancelling")
+                    lease_lost = True
+                    future.cancel()
+            except CancelledError:
+                return
+            except Exception as e:
+                if not lease_lost:
+                    self._settle("fail", worker_id, task, e)
+                logging.error(f"Crawl task {task.id} failed: {e}")
+                return
+
+        result = {"filename": filename, "file_path": file_path,
+                  "seconds": round(time.perf_counter() - start, 2), "node": worker_id}
+        if filename:
+            if self._settle("complete", worker_id, task, result):
+                log_event(f"Crawl task {task.id} done: {filename}")
+        else:
+            self._settle("fail", worker_id, task, "Scraper did not produce a file")
+
+    def _run_product_task(self, worker_id, task):
+        """One product page: a single HTTP fetch, well within one lease, so no heartbeats."""
+        start = time.perf_counter()
+        job_token = bind_job(f"task-{task.id}")
+        try:
+            future = submit(scrape_product(task.url))
+        finally:
+            unbind_job(job_token)
+        try:
+            product = future.result(timeout=self.lease_seconds)
+        except Exception as e:
+            future.cancel()
+            self._fail_product(worker_id, task, e)
+            logging.error(f"Crawl task {task.id} failed: {e}")
+            return
+        if product:
+            self._settle("complete", worker_id, task, {"product": product, "node": worker_id,
+                                                       "seconds": round(time.perf_counter() - start, 2)})
+        else:
+            self._fail_product(worker_id, task, "No product data on page")
+
+    def _fail_product(self, worker_id, task, error):
+        """
+        Fail a product task and forget its sitemap lastmod; discovery stored it
+        when queueing, and would otherwise skip the URL until its lastmod changes.
+        """
+        self._settle("fail", worker_id, task, error)
+        try:
+            with self._state_lock:
+                if self._sitemap_state is None:
+                    self._sitemap_state = SitemapState()
+            self._sitemap_state.forget(task.url)
+        except sqlite3.Error as e:
+            logging.error(f"Could not reset the sitemap state of {task.url}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scraper node for the shared crawl queue.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="lease and run tasks until interrupted")
+    run.add_argument("--concurrency", type=int, default=NODE_CONCURRENCY)
+    enqueue = sub.add_parser("enqueue", help="add URLs to the queue")
+    enqueue.add_argument("input", help="JSON list of {url, max_pages} or a text file of 'url [max_pages]' lines")
+    enqueue.add_argument("--pages", type=int, default=1)
+    sub.add_parser("stats", help="print task counts by status")
+    args = parser.parse_args()
+
+    queue = get_crawl_queue()
+    if args.command == "stats":
+        print(json.dumps(queue.stats(), indent=2))
+    elif args.command == "enqueue":
+        if not check_monthly_limit():
+            sys.exit("Monthly limit reached. Scraping is disabled.")
+        from batch import _read_items
+        for item in _read_items(args.input, args.pages):
+            print(queue.enqueue(item["url"], item["max_pages"]), item["url"])
+    else:
+        load_registry()
+        node = CrawlNode(queue, concurrency=args.concurrency).start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            node.stop()
+            sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
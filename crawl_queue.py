@@ -0,0 +1,439 @@
+"""
+Shared crawl queue so several scraper nodes can work through one workload.
+
+Tasks are (url, max_pages) pairs — the same arguments every handle_* coroutine
+takes. A node leases a task for a fixed time and keeps the lease alive with
+heartbeats while the handler runs; if the node dies the lease expires and the
+task goes back on the queue (up to max_attempts). Enqueueing a URL that is
+already queued or leased returns the existing task instead of a duplicate.
+
+Backends:
+    SQLiteCrawlQueue  local file, for a single machine and for tests
+    MSSQLCrawlQueue   the shared Webstudy database, for several machines
+
+Pick one with CRAWL_QUEUE_BACKEND=sqlite|mssql (CRAWL_QUEUE_PATH sets the
+SQLite file).
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from urllib.parse import urlsplit, urlunsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+DEFAULT_LEASE_SECONDS = int(os.getenv("CRAWL_LEASE_SECONDS", "300"))
+DEFAULT_MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "3"))
+
+
+def dedupe_key(url):
+    """Identical-URL key: lowercase scheme/host, no fragment, no trailing slash."""
+    parts = urlsplit(url.strip())
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+class CrawlTask:
+    def __init__(self, id, url, max_pages, status, attempts, max_attempts,
+                 lease_owner=None, lease_expires=None, result=None, error=None,
+                 created_at=None, updated_at=None, **_):
+        self.id = id
+        self.url = url
+        self.max_pages = max_pages
+        self.status = status
+        self.attempts = attempts
+        self.max_attempts = max_attempts
+        self.lease_owner = lease_owner
+        self.lease_expires = lease_expires
+        self.result = json.loads(result) if isinstance(result, str) and result else result
+        self.error = error
+        self.created_at = created_at
+        self.updated_at = updated_at
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class CrawlQueue(ABC):
+    """Interface every queue backend implements."""
+
+    @abstractmethod
+    def enqueue(self, url, max_pages, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """Add a task, or return the id of the identical task already in flight."""
+        pass
+
+    @abstractmethod
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Claim the oldest queued task for worker_id; None when the queue is empty."""
+        pass
+
+    @abstractmethod
+    def heartbeat(self, task_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend a lease. False means the lease was lost and the work should stop."""
+        pass
+
+    @abstractmethod
+    def complete(self, task_id, worker_id, result=None):
+        pass
+
+    @abstractmethod
+    def fail(self, task_id, worker_id, error):
+        """Give the task back for another attempt, or mark it failed when out of attempts."""
+        pass
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Return tasks whose lease ran out to the queue. Returns how many were touched."""
+        pass
+
+    @abstractmethod
+    def get(self, task_id):
+        pass
+
+    @abstractmethod
+    def stats(self):
+        pass
+
+
+class SQLiteCrawlQueue(CrawlQueue):
+    """
+    File-backed queue. Safe across threads and processes on one machine.
+
+    Each thread gets its own connection to the file. path=":memory:" keeps the
+    queue in one connection shared by all threads instead; its transactions
+    are serialized with a lock, since SQLite allows one open transaction per
+    connection.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv("CRAWL_QUEUE_PATH", os.path.join(BASE_DIR, "logs", "crawl_queue.db"))
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._memory_conn = None
+        self._memory_lock = threading.Lock() if self.path == ":memory:" else None
+        with self._transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS crawl_tasks (
+                    id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    dedupe_key TEXT NOT NULL,
+                    max_pages INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    lease_owner TEXT,
+                    lease_expires REAL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_crawl_status ON crawl_tasks (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_crawl_dedupe ON crawl_tasks (dedupe_key, status)")
+
+    def _conn(self):
+        if self.path == ":memory:":
+            # one shared connection, otherwise every thread would see its own empty database
+            if self._memory_conn is None:
+                self._memory_conn = sqlite3.connect(":memory:", check_same_thread=False, isolation_level=None)
+                self._memory_conn.row_factory = sqlite3.Row
+            return self._memory_conn
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    class _Tx:
+        def __init__(self, conn, lock=None):
+            self.conn = conn
+            self.lock = lock
+
+        def __enter__(self):
+            if self.lock:
+                self.lock.acquire()
+            try:
+                # IMMEDIATE takes the write lock up front so two nodes cannot lease the same row
+                self.conn.execute("BEGIN IMMEDIATE")
+            except BaseException:
+                if self.lock:
+                    self.lock.release()
+                raise
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            try:
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+            finally:
+                if self.lock:
+                    self.lock.release()
+            return False
+
+    def _transaction(self):
+        return self._Tx(self._conn(), self._memory_lock)
+
+    def _query(self, sql, params=()):
+        if self._memory_lock is None:
+            return self._conn().execute(sql, params).fetchall()
+        with self._memory_lock:
+            return self._conn().execute(sql, params).fetchall()
+
+    def enqueue(self, url, max_pages, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        key = dedupe_key(url)
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM crawl_tasks WHERE dedupe_key = ? AND status IN (?, ?)",
+                (key, QUEUED, LEASED),
+            ).fetchone()
+            if row:
+                return row["id"]
+            task_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO crawl_tasks (id, url, dedupe_key, max_pages, status, attempts, max_attempts, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, 0, ?, ?, ?)",
+                (task_id, url, key, int(max_pages), QUEUED, max_attempts, now, now),
+            )
+            return task_id
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.requeue_expired()
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM crawl_tasks WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE crawl_tasks SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (LEASED, worker_id, now + lease_seconds, now, row["id"]),
+            )
+            task = dict(row)
+        task.update(status=LEASED, lease_owner=worker_id, lease_expires=now + lease_seconds,
+                    attempts=task["attempts"] + 1)
+        return CrawlTask(**task)
+
+    def heartbeat(self, task_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE crawl_tasks SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (now + lease_seconds, now, task_id, LEASED, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id, worker_id, result=None):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE crawl_tasks SET status = ?, result = ?, lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE, json.dumps(result, default=str), time.time(), task_id, LEASED, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id, worker_id, error):
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE crawl_tasks SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (FAILED, QUEUED, str(error), time.time(), task_id, LEASED, worker_id),
+            )
+            return cursor.rowcount == 1
+
+    def requeue_expired(self):
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE crawl_tasks SET status = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+                "error = COALESCE(error, 'lease expired'), lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE status = ? AND lease_expires < ?",
+                (FAILED, QUEUED, now, LEASED, now),
+            )
+            if cursor.rowcount:
+                logging.warning(f"Requeued {cursor.rowcount} crawl task(s) with expired leases")
+            return cursor.rowcount
+
+    def get(self, task_id):
+        rows = self._query("SELECT * FROM crawl_tasks WHERE id = ?", (task_id,))
+        return CrawlTask(**dict(rows[0])) if rows else None
+
+    def stats(self):
+        rows = self._query("SELECT status, COUNT(*) AS n FROM crawl_tasks GROUP BY status")
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class MSSQLCrawlQueue(CrawlQueue):
+    """Queue table in the shared Webstudy database, for nodes on several machines."""
+
+    TABLE = "dbo.IBM_Algo_Webstudy_crawl_queue"
+
+    def __init__(self, db_config=None):
+        from database import DB_CONFIG
+        self.db_config = db_config or DB_CONFIG
+        self._create_table()
+
+    def _connect(self):
+        import pymssql
+        return pymssql.connect(**self.db_config)
+
+    def _create_table(self):
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f"""
+                IF OBJECT_ID('{self.TABLE}', 'U') IS NULL
+                BEGIN
+                    CREATE TABLE {self.TABLE} (
+                        id NVARCHAR(32) PRIMARY KEY,
+                        url NVARCHAR(2000) NOT NULL,
+                        dedupe_key NVARCHAR(450) NOT NULL,
+                        max_pages INT NOT NULL,
+                        status NVARCHAR(16) NOT NULL,
+                        attempts INT NOT NULL DEFAULT 0,
+                        max_attempts INT NOT NULL,
+                        lease_owner NVARCHAR(255) NULL,
+                        lease_expires FLOAT NULL,
+                        result NVARCHAR(MAX) NULL,
+                        error NVARCHAR(MAX) NULL,
+                        created_at FLOAT NOT NULL,
+                        updated_at FLOAT NOT NULL
+                    );
+                    CREATE INDEX ix_crawl_status ON {self.TABLE} (status, created_at);
+                    CREATE INDEX ix_crawl_dedupe ON {self.TABLE} (dedupe_key, status);
+                END
+                """)
+                conn.commit()
+
+    def enqueue(self, url, max_pages, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        key = dedupe_key(url)
+        now = time.time()
+        task_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                # UPDLOCK + HOLDLOCK keeps two nodes from inserting the same URL at once
+                cursor.execute(f"""
+                    SELECT id FROM {self.TABLE} WITH (UPDLOCK, HOLDLOCK)
+                    WHERE dedupe_key = %s AND status IN (%s, %s)
+                """, (key, QUEUED, LEASED))
+                row = cursor.fetchone()
+                if row:
+                    conn.commit()
+                    return row["id"]
+                cursor.execute(f"""
+                    INSERT INTO {self.TABLE} (id, url, dedupe_key, max_pages, status, attempts, max_attempts,
+                                              created_at, updated_at)
+                    VALUES (%s, %s, %s, %s, %s, 0, %s, %s, %s)
+                """, (task_id, url, key, int(max_pages), QUEUED, max_attempts, now, now))
+                conn.commit()
+        return task_id
+
+    def lease(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.requeue_expired()
+        now = time.time()
+        with self._connect() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                # READPAST skips rows another node is leasing right now instead of waiting on them
+                cursor.execute(f"""
+                    WITH next_task AS (
+                        SELECT TOP (1) * FROM {self.TABLE} WITH (UPDLOCK, READPAST, ROWLOCK)
+                        WHERE status = %s ORDER BY created_at
+                    )
+                    UPDATE next_task
+                    SET status = %s, lease_owner = %s, lease_expires = %s,
+                        attempts = attempts + 1, updated_at = %s
+                    OUTPUT inserted.*
+                """, (QUEUED, LEASED, worker_id, now + lease_seconds, now))
+                row = cursor.fetchone()
+                conn.commit()
+        return CrawlTask(**row) if row else None
+
+    def _update(self, sql, params):
+        with self._connect() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                count = cursor.rowcount
+                conn.commit()
+        return count
+
+    def heartbeat(self, task_id, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        now = time.time()
+        return self._update(f"""
+            UPDATE {self.TABLE} SET lease_expires = %s, updated_at = %s
+            WHERE id = %s AND status = %s AND lease_owner = %s
+        """, (now + lease_seconds, now, task_id, LEASED, worker_id)) == 1
+
+    def complete(self, task_id, worker_id, result=None):
+        return self._update(f"""
+            UPDATE {self.TABLE} SET status = %s, result = %s, lease_owner = NULL, lease_expires = NULL,
+                updated_at = %s
+            WHERE id = %s AND status = %s AND lease_owner = %s
+        """, (DONE, json.dumps(result, default=str), time.time(), task_id, LEASED, worker_id)) == 1
+
+    def fail(self, task_id, worker_id, error):
+        return self._update(f"""
+            UPDATE {self.TABLE}
+            SET status = CASE WHEN attempts >= max_attempts THEN %s ELSE %s END,
+                error = %s, lease_owner = NULL, lease_expires = NULL, updated_at = %s
+            WHERE id = %s AND status = %s AND lease_owner = %s
+        """, (FAILED, QUEUED, str(error), time.time(), task_id, LEASED, worker_id)) == 1
+
+    def requeue_expired(self):
+        now = time.time()
+        count = self._update(f"""
+            UPDATE {self.TABLE}
+            SET status = CASE WHEN attempts >= max_attempts THEN %s ELSE %s END,
+                error = COALESCE(error, 'lease expired'), lease_owner = NULL, lease_expires = NULL,
+                updated_at = %s
+            WHERE status = %s AND lease_expires < %s
+        """, (FAILED, QUEUED, now, LEASED, now))
+        if count:
+            logging.warning(f"Requeued {count} crawl task(s) with expired leases")
+        return count
+
+    def get(self, task_id):
+        with self._connect() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                cursor.execute(f"SELECT * FROM {self.TABLE} WHERE id = %s", (task_id,))
+                row = cursor.fetchone()
+        return CrawlTask(**row) if row else None
+
+    def stats(self):
+        with self._connect() as conn:
+            with conn.cursor(as_dict=True) as cursor:
+                cursor.execute(f"SELECT status, COUNT(*) AS n FROM {self.TABLE} GROUP BY status")
+                rows = cursor.fetchall()
+        counts = {QUEUED: 0, LEASED: 0, DONE: 0, FAILED: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_crawl_queue():
+    """The queue configured by CRAWL_QUEUE_BACKEND (sqlite by default)."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            backend = os.getenv("CRAWL_QUEUE_BACKEND", "sqlite")
+            _queue = MSSQLCrawlQueue() if backend == "mssql" else SQLiteCrawlQueue()
+    return _queue
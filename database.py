@@ -4,6 +4,7 @@ import logging
 from dotenv import load_dotenv
 from utils import log_event
 from pattern_checking import process_row
+from progress import report_progress
 
 # Load environment variables
 load_dotenv()
@@ -16,6 +17,9 @@ DB_CONFIG = {
     "database": os.getenv("DB_NAME"),
 }
 
+# create_table() runs once, on the first insert, instead of at import time
+_table_checked = False
+
 
 def create_table():
     """Ensure the Products table exists and contains all necessary columns."""
@@ -62,8 +66,17 @@ def create_table():
 
                 conn.commit()
                 logging.info("Table and column 'AdditionalInfo' checked/created successfully.")
+                return True
     except pymssql.DatabaseError as e:
         logging.error(f"Database error: {e}")
+    return False
+
+
+def ensure_table():
+    """Run create_table() the first time it is needed in this process."""
+    global _table_checked
+    if not _table_checked:
+        _table_checked = create_table()
 
 
 
@@ -72,7 +85,8 @@ def insert_into_db(data):
     if not data:
         log_event("No data to insert into the database.")
         return
-    
+
+    ensure_table()
     try:
         with pymssql.connect(**DB_CONFIG) as conn:
             with conn.cursor() as cursor:
@@ -87,6 +101,7 @@ def insert_into_db(data):
                 cursor.executemany(query, processed_data)
                 conn.commit()
                 logging.info(f"Inserted {len(processed_data)} records successfully.")
+                report_progress("db_rows_inserted", count=len(processed_data))
                 
     except pymssql.DatabaseError as e:
         logging.error(f"Database error: {e}")
@@ -111,8 +126,6 @@ def get_scraping_settings():
         return {"success": False, "error": f"Database error: {str(e)}"}
 
 
-create_table()
-
 def reset_scraping_limit():
     """Resets `products_fetched_today` to 0 and `is_disabled` to 0 using pymssql."""
     try:
@@ -150,4 +163,39 @@ def get_all_scraped_products():
                     return {"success": False, "message": "No products found."}
                 return {"success": True, "data": products}
     except pymssql.Error as e:
-        return {"success": False, "error": f"Database error: {str(e)}"}    
\ No newline at end of file
+        return {"success": False, "error": f"Database error: {str(e)}"}    
+
+_crawl_runs_checked = False
+
+
+def insert_crawl_run(run):
+    """Record one scheduled crawl run (duration, product count, outcome)."""
+    global _crawl_runs_checked
+    try:
+        with pymssql.connect(**DB_CONFIG) as conn:
+            with conn.cursor() as cursor:
+                if not _crawl_runs_checked:
+                    cursor.execute("""
+                    IF OBJECT_ID('dbo.IBM_Algo_Webstudy_crawl_runs', 'U') IS NULL
+                    CREATE TABLE dbo.IBM_Algo_Webstudy_crawl_runs (
+                        id INT IDENTITY(1,1) PRIMARY KEY,
+                        schedule_id NVARCHAR(255),
+                        url NVARCHAR(2000),
+                        started_at DATETIME,
+                        finished_at DATETIME,
+                        duration_seconds FLOAT,
+                        products INT,
+                        status NVARCHAR(32),
+                        error NVARCHAR(MAX) NULL
+                    )
+                    """)
+                    _crawl_runs_checked = True
+                cursor.execute("""
+                    INSERT INTO dbo.IBM_Algo_Webstudy_crawl_runs
+                    (schedule_id, url, started_at, finished_at, duration_seconds, products, status, error)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, (run["schedule_id"], run["url"], run["started_at"], run["finished_at"],
+                      run["duration_seconds"], run["products"], run["status"], run["error"]))
+                conn.commit()
+    except pymssql.Error as e:
+        logging.error(f"Database error recording crawl run: {e}")
@@ -0,0 +1,30 @@
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXCEL_DATA_PATH = os.path.join(BASE_DIR, 'static', 'ExcelData')
+
+
+def file_id_for(file_path):
+    """
+    Id a finished workbook is downloaded by. Handlers write every export into
+    static/ExcelData, so the file name is enough and stays valid across
+    processes and restarts (worker farm, crawl nodes).
+    """
+    if not file_path:
+        return None
+    real = os.path.realpath(file_path)
+    if os.path.dirname(real) != os.path.realpath(EXCEL_DATA_PATH):
+        return None
+    return os.path.basename(real)
+
+
+def resolve_file(file_id):
+    """Path of an export by id, or None if it does not exist or escapes the export folder."""
+    if not file_id or file_id != os.path.basename(file_id) or file_id.startswith("."):
+        return None
+    path = os.path.join(EXCEL_DATA_PATH, file_id)
+    return path if os.path.isfile(path) else None
+
+
+def download_url(file_id):
+    return f"/files/{file_id}" if file_id else None
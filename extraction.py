@@ -0,0 +1,138 @@
+"""
+In-page product extraction.
+
+Reading a tile field by field with query_selector / inner_text /
+get_attribute costs one Playwright round trip per call, which adds up to
+thousands per listing page. extract_tiles instead sends the retailer's field
+spec into the page and reads every tile in a single evaluate call.
+
+A spec names the tile selector and, per field, where to read it:
+
+    PRODUCT_TILES = {
+        "tile": "div.product",
+        "fields": {
+            "name": "h2.name",                                   # inner text
+            "image": {"selector": ["img.main", "img"],           # first selector that matches
+                      "attr": ["data-src", "src"]},              # first non-empty attribute
+            "product_id": {"attr": "data-id"},                   # no selector: the tile itself
+            "badges": {"selector": ".badge", "all": True},       # list, one value per match
+        },
+    }
+
+Text is the element's innerText unless "prop": "textContent" is given.
+Missing values are None (or [] for "all" fields); values are stripped.
+
+extract_tiles_from_html applies the same spec to server-rendered HTML fetched
+without a browser (see http_fetch.py).
+"""
+import re
+import time
+import logging
+
+from bs4 import BeautifulSoup
+
+_EXTRACT_JS = """
+([tileSelector, fields]) => {
+    const matches = (root, selectors) => {
+        if (!selectors) return [root];
+        for (const selector of selectors) {
+            const found = root.querySelectorAll(selector);
+            if (found.length) return Array.from(found);
+        }
+        return [];
+    };
+    const read = (el, field) => {
+        if (field.attr) {
+            for (const attr of field.attr) {
+                const value = el.getAttribute(attr);
+                if (value && value.trim()) return value.trim();
+            }
+            return null;
+        }
+        const text = field.prop === "textContent" ? el.textContent : el.innerText;
+        return text && text.trim() ? text.trim() : null;
+    };
+    return Array.from(document.querySelectorAll(tileSelector), tile => {
+        const row = {};
+        for (const [name, field] of Object.entries(fields)) {
+            const els = matches(tile, field.selector);
+            if (field.all) {
+                row[name] = els.map(el => read(el, field)).filter(value => value !== null);
+            } else {
+                row[name] = els.length ? read(els[0], field) : null;
+            }
+        }
+        return row;
+    });
+}
+"""
+
+
+def _listify(value):
+    if value is None or isinstance(value, list):
+        return value
+    return [value]
+
+
+def _normalize(fields):
+    normalized = {}
+    for name, field in fields.items():
+        if isinstance(field, str):
+            field = {"selector": field}
+        normalized[name] = {
+            "selector": _listify(field.get("selector")),
+            "attr": _listify(field.get("attr")),
+            "all": bool(field.get("all")),
+            "prop": field.get("prop", "innerText"),
+        }
+    return normalized
+
+
+async def extract_tiles(page, spec):
+    """Read every tile matching spec["tile"] in one round trip; returns a list of dicts."""
+    start = time.perf_counter()
+    rows = await page.evaluate(_EXTRACT_JS, [spec["tile"], _normalize(spec["fields"])])
+    logging.info(f"Extracted {len(rows)} tiles in {(time.perf_counter() - start) * 1000:.0f}ms")
+    return rows
+
+
+def _read_html(el, field):
+    if field["attr"]:
+        for attr in field["attr"]:
+            value = el.get(attr)
+            if isinstance(value, list):
+                value = " ".join(value)
+            if value and value.strip():
+                return value.strip()
+        return None
+    # closest match to innerText without a layout engine
+    text = re.sub(r"\s+", " ", el.get_text(" ")).strip()
+    return text or None
+
+
+def _matches_html(tile, selectors):
+    if not selectors:
+        return [tile]
+    for selector in selectors:
+        found = tile.select(selector)
+        if found:
+            return found
+    return []
+
+
+def extract_tiles_from_html(html, spec):
+    """extract_tiles for an HTML string; returns (rows, page title)."""
+    soup = BeautifulSoup(html, "lxml")
+    fields = _normalize(spec["fields"])
+    rows = []
+    for tile in soup.select(spec["tile"]):
+        row = {}
+        for name, field in fields.items():
+            els = _matches_html(tile, field["selector"])
+            if field["all"]:
+                row[name] = [v for v in (_read_html(el, field) for el in els) if v is not None]
+            else:
+                row[name] = _read_html(els[0], field) if els else None
+        rows.append(row)
+    title = soup.title.get_text().strip() if soup.title else ""
+    return rows, title
@@ -0,0 +1,259 @@
+"""
+HTTP-first fetching of listing pages.
+
+Many listing pages are rendered on the server, so their product tiles are in
+the HTML and Chromium is not needed to read them. fetch_listing first GETs
+the page through the Oxylabs proxy with a pooled httpx client and applies the
+handler's PRODUCT_TILES spec to the HTML. It falls back to a proxied browser
+when the response contains no tiles or is blocked (HTTP 403/429/503).
+
+The backend follows proxysetup's selection: Bright Data is only reachable as
+a remote browser, so pages whose robots.txt check puts Bright Data first (and
+whose Bright Data circuit is not open) go straight to the browser.
+
+The mode that worked is remembered per domain and saved to
+logs/fetch_modes.json every FETCH_MODES_FLUSH_SECONDS. A domain that needed the browser goes straight to it next time, and HTTP is
+tried again after FETCH_MODE_RETRY_SECONDS. A retailer's `fetch_mode`
+registry setting can pin it to "http" or "browser"; the default is "auto".
+"""
+import os
+import json
+import atexit
+import time
+import asyncio
+import logging
+import threading
+import weakref
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+import usage_ledger
+from extraction import extract_tiles, extract_tiles_from_html
+from proxy_monitor import monitor as proxy_monitor, OXYLABS
+from proxysetup import preferred_proxies
+from rate_limiter import throttle
+from scraper_registry import resolve, DEFAULT_SETTINGS
+from utils import LOG_DIR
+
+load_dotenv()
+PROXY_SERVER = os.getenv("PROXY_SERVER")
+PROXY_USERNAME = os.getenv("PROXY_USERNAME")
+PROXY_PASSWORD = os.getenv("PROXY_PASSWORD")
+
+HTTP_FETCH_TIMEOUT = int(os.getenv("HTTP_FETCH_TIMEOUT", "20"))
+FETCH_MODE_RETRY_SECONDS = int(os.getenv("FETCH_MODE_RETRY_SECONDS", str(24 * 3600)))
+FETCH_MODES_FILE = os.path.join(LOG_DIR, "fetch_modes.json")
+FETCH_MODES_FLUSH_SECONDS = int(os.getenv("FETCH_MODES_FLUSH_SECONDS", "30"))
+
+HTTP = "http"
+BROWSER = "browser"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                  "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+BLOCK_STATUSES = (403, 429, 503)
+
+# Found only on interstitials served instead of the page by common bot managers;
+# their regular page tags (challenge-platform scripts, datadome tags) are not markers
+CHALLENGE_MARKERS = (
+    "cf-chl-", "_cf_chl_opt", "<title>just a moment", "<title>attention required! | cloudflare",
+    "_incapsula_resource", 'id="px-captcha"',
+)
+# DataDome's interstitial is a near-empty page that only loads its captcha
+DATADOME_MARKER = "captcha-delivery.com"
+CHALLENGE_MAX_BYTES = 20000
+
+
+def _domain(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _proxy_url():
+    if not PROXY_SERVER:
+        return None
+    server = PROXY_SERVER if "://" in PROXY_SERVER else f"http://{PROXY_SERVER}"
+    if not PROXY_USERNAME:
+        return server
+    scheme, rest = server.split("://", 1)
+    return f"{scheme}://{PROXY_USERNAME}:{PROXY_PASSWORD}@{rest}"
+
+
+def is_challenge(response):
+    """Whether response is a bot manager's block or interstitial instead of the page."""
+    if response.status_code in BLOCK_STATUSES:
+        return True
+    head = response.text[:CHALLENGE_MAX_BYTES].lower()
+    if any(marker in head for marker in CHALLENGE_MARKERS):
+        return True
+    return len(response.content) < CHALLENGE_MAX_BYTES and DATADOME_MARKER in head
+
+
+class FetchModes:
+    """Which fetch mode works for each domain, kept across restarts."""
+
+    def __init__(self, path=FETCH_MODES_FILE, flush_seconds=FETCH_MODES_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._flusher = None
+        self._stop = threading.Event()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.modes = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            self.modes = {}
+
+    def get(self, domain):
+        with self._lock:
+            entry = self.modes.get(domain)
+        if not entry:
+            return HTTP
+        if entry["mode"] == BROWSER and time.time() - entry["since"] > FETCH_MODE_RETRY_SECONDS:
+            return HTTP
+        return entry["mode"]
+
+    def record(self, domain, mode, reason=None):
+        with self._lock:
+            entry = self.modes.setdefault(domain, {"mode": mode, "since": time.time(), "pages": 0})
+            if entry["mode"] != mode:
+                logging.info(f"Fetch mode for {domain}: {entry['mode']} -> {mode} ({reason})")
+                entry.update(mode=mode, since=time.time(), pages=0)
+            entry["pages"] += 1
+            entry["reason"] = reason
+            self._dirty = True
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="fetch-modes", daemon=True)
+                self._flusher.start()
+
+    def flush(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            tmp = self.path + ".tmp"
+            try:
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(self.modes, f, indent=2)
+                os.replace(tmp, self.path)
+                self._dirty = False
+            except OSError as e:
+                # stays dirty, so the next flush tries again
+                logging.warning(f"Could not save fetch modes: {e}")
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return json.loads(json.dumps(self.modes))
+
+
+fetch_modes = FetchModes()
+atexit.register(fetch_modes.flush)
+
+# one client per event loop; httpx connections cannot be shared across loops
+_clients = weakref.WeakKeyDictionary()
+
+
+def http_client():
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = httpx.AsyncClient(
+            proxy=_proxy_url(), headers=HEADERS, follow_redirects=True, timeout=HTTP_FETCH_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        )
+    return client
+
+
+class ListingPage:
+    def __init__(self, tiles, title, mode):
+        self.tiles = tiles
+        self.title = title
+        self.mode = mode
+
+
+async def _http_proxy_selected(url):
+    """
+    Whether the proxy selection for url puts Oxylabs first. Bright Data is a
+    remote browser rather than an HTTP proxy, so HTTP mode is only used then.
+    """
+    return proxy_monitor.order(await preferred_proxies(url))[0] == OXYLABS
+
+
+async def _fetch_http(url, spec):
+    """Returns (tiles, title), or None with the reason when the browser is needed."""
+    await throttle(url)
+    start = time.perf_counter()
+    try:
+        response = await http_client().get(url)
+    except httpx.HTTPError as e:
+        return None, f"request failed: {e}"
+    nav_ms = (time.perf_counter() - start) * 1000
+    usage_ledger.bind_site(url)
+    usage_ledger.ledger.record_request(OXYLABS, url, len(response.content))
+    usage_ledger.ledger.record_navigation(OXYLABS, url, nav_ms, ok=response.status_code < 400)
+    if response.status_code in BLOCK_STATUSES:
+        return None, f"bot challenge (HTTP {response.status_code})"
+    if response.status_code >= 400:
+        return None, f"HTTP {response.status_code}"
+    # tiles first: regular pages carry bot-manager tags too, only an empty page can be a challenge
+    tiles, title = extract_tiles_from_html(response.text, spec)
+    if not tiles:
+        return None, "bot challenge page" if is_challenge(response) else "no product tiles in HTML"
+    return (tiles, title), None
+
+
+async def _fetch_browser(p, url, spec, open_browser, prepare):
+    browser = None
+    page = None
+    try:
+        browser, page = await open_browser(p, url)
+        if prepare:
+            await prepare(page)
+        return await extract_tiles(page, spec), await page.title()
+    finally:
+        if page:
+            await page.close()
+        if browser:
+            await browser.close()
+
+
+async def fetch_listing(p, url, spec, open_browser, prepare=None):
+    """
+    Read the tiles of one listing page, over plain HTTP when the proxy
+    selection picks Oxylabs and HTTP works for the domain, and through
+    open_browser(p, url) otherwise. prepare(page) runs
+    before extraction in browser mode (e.g. scrolling). Returns a ListingPage.
+    """
+    domain = _domain(url)
+    entry = resolve(url)
+    pinned = (entry.settings if entry else DEFAULT_SETTINGS).get("fetch_mode", "auto")
+    mode = pinned if pinned in (HTTP, BROWSER) else fetch_modes.get(domain)
+
+    if mode == HTTP and not await _http_proxy_selected(url):
+        # a Bright Data page says nothing about whether HTTP works for the domain
+        tiles, title = await _fetch_browser(p, url, spec, open_browser, prepare)
+        return ListingPage(tiles, title, BROWSER)
+
+    reason = None
+    if mode == HTTP:
+        result, reason = await _fetch_http(url, spec)
+        if result:
+            fetch_modes.record(domain, HTTP, "tiles found in HTML")
+            return ListingPage(*result, HTTP)
+        logging.info(f"HTTP fetch of {url} not usable ({reason}), falling back to the browser")
+
+    tiles, title = await _fetch_browser(p, url, spec, open_browser, prepare)
+    # an empty page (e.g. past the last page) says nothing about which mode works
+    if tiles and pinned not in (HTTP, BROWSER):
+        fetch_modes.record(domain, BROWSER, reason or "browser mode")
+    return ListingPage(tiles, title, BROWSER)
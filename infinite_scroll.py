@@ -0,0 +1,224 @@
+"""
+Scrolling listing pages until their lazy-loaded products are all in the DOM.
+
+Instead of sleeping a fixed 1-3 seconds after every scroll, each scroll waits
+inside the page on a MutationObserver: it returns as soon as the product count
+(or, without a selector, the page height) grows and the DOM has been quiet for
+SCROLL_QUIET_MS, and gives up after the retailer's adaptive timeout. The
+timeout follows how long that retailer's pages have taken to grow (a running
+average, kept between SCROLL_MIN_WAIT_MS and SCROLL_MAX_WAIT_MS). Before
+concluding that a page is complete, requests still in flight are waited for
+and the count checked once more, so slow tiles are not cut off.
+
+Load-more buttons get the same treatment: after a click, wait_for_more_items
+waits in the page for the product count to pass its count before the click
+instead of sleeping.
+
+Each page's scroll time is logged and reported as a "page_scrolled" progress
+event; scroll_report() sums it per retailer.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from progress import report_progress
+from scraper_registry import resolve, normalize_host
+
+SCROLL_MIN_WAIT_MS = int(os.getenv("SCROLL_MIN_WAIT_MS", "500"))
+SCROLL_MAX_WAIT_MS = int(os.getenv("SCROLL_MAX_WAIT_MS", "4000"))
+SCROLL_QUIET_MS = int(os.getenv("SCROLL_QUIET_MS", "300"))
+# Growth timeout as a multiple of the retailer's average time to grow
+SCROLL_WAIT_FACTOR = 3
+# Wait for a load-more click to add products
+LOAD_MORE_TIMEOUT_MS = int(os.getenv("LOAD_MORE_TIMEOUT_MS", "15000"))
+
+# Scrolls once, then resolves when the page grew and settled, or on timeout
+_SCROLL_JS = """
+async ([selector, container, timeout, quiet]) => {
+    const target = container ? document.querySelector(container) : null;
+    const size = () => selector
+        ? document.querySelectorAll(selector).length
+        : (target || document.body).scrollHeight;
+    const before = size();
+    const start = performance.now();
+    if (target) target.scrollTo(0, target.scrollHeight);
+    else window.scrollTo(0, document.body.scrollHeight);
+
+    return await new Promise(resolve => {
+        let grewAt = null, settle = null;
+        const finish = () => {
+            observer.disconnect();
+            clearTimeout(deadline);
+            resolve({before, after: size(), grew: grewAt !== null,
+                     growMs: grewAt === null ? null : grewAt - start});
+        };
+        const observer = new MutationObserver(() => {
+            if (grewAt === null && size() > before) grewAt = performance.now();
+            if (grewAt !== null) {
+                clearTimeout(settle);
+                settle = setTimeout(finish, quiet);
+            }
+        });
+        observer.observe(document.body, {childList: true, subtree: true});
+        const deadline = setTimeout(finish, timeout);
+    });
+}
+"""
+
+_MORE_JS = """
+([selector, before]) => document.querySelectorAll(selector).length > before
+"""
+
+_SIZE_JS = """
+([selector, container]) => selector
+    ? document.querySelectorAll(selector).length
+    : (container ? document.querySelector(container) : document.body).scrollHeight
+"""
+
+
+class ScrollResult:
+    def __init__(self, items, scrolls, elapsed_ms, timeout_ms):
+        self.items = items            # product count (page height without a selector)
+        self.scrolls = scrolls
+        self.elapsed_ms = elapsed_ms
+        self.timeout_ms = timeout_ms
+
+
+class ScrollStats:
+    """Running totals for one retailer."""
+
+    def __init__(self):
+        self.pages = 0
+        self.scrolls = 0
+        self.elapsed_ms = 0.0
+        self.avg_grow_ms = None
+
+    def timeout_ms(self):
+        if self.avg_grow_ms is None:
+            return SCROLL_MAX_WAIT_MS
+        wait = SCROLL_WAIT_FACTOR * self.avg_grow_ms + SCROLL_QUIET_MS
+        return int(min(SCROLL_MAX_WAIT_MS, max(SCROLL_MIN_WAIT_MS, wait)))
+
+    def observe_growth(self, grow_ms):
+        self.avg_grow_ms = grow_ms if self.avg_grow_ms is None else 0.7 * self.avg_grow_ms + 0.3 * grow_ms
+
+    def report(self):
+        return {
+            "pages": self.pages,
+            "avg_scrolls_per_page": round(self.scrolls / self.pages, 1) if self.pages else None,
+            "avg_seconds_per_page": round(self.elapsed_ms / self.pages / 1000, 2) if self.pages else None,
+            "avg_grow_ms": round(self.avg_grow_ms) if self.avg_grow_ms is not None else None,
+            "timeout_ms": self.timeout_ms(),
+        }
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+def _stats_for(url):
+    entry = resolve(url)
+    key = entry.name if entry else normalize_host(url)
+    with _lock:
+        return _stats.setdefault(key, ScrollStats())
+
+
+class _NetworkWatch:
+    """Requests in flight on a page, so the last scroll can wait for them to land."""
+
+    def __init__(self, page):
+        self.page = page
+        self.inflight = set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def _started(self, request):
+        self.inflight.add(request)
+        self.idle.clear()
+
+    def _done(self, request):
+        self.inflight.discard(request)
+        if not self.inflight:
+            self.idle.set()
+
+    def __enter__(self):
+        self.page.on("request", self._started)
+        self.page.on("requestfinished", self._done)
+        self.page.on("requestfailed", self._done)
+        return self
+
+    def __exit__(self, *exc):
+        self.page.remove_listener("request", self._started)
+        self.page.remove_listener("requestfinished", self._done)
+        self.page.remove_listener("requestfailed", self._done)
+
+    async def wait_idle(self, timeout_ms):
+        try:
+            await asyncio.wait_for(self.idle.wait(), timeout_ms / 1000)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+async def scroll_until_loaded(page, item_selector=None, max_scrolls=10, container=None):
+    """
+    Scroll page until item_selector stops matching more elements (or, without
+    a selector, until the page stops growing), at most max_scrolls times.
+    container scrolls that element instead of the window.
+    """
+    stats = _stats_for(page.url)
+    timeout_ms = stats.timeout_ms()
+    start = time.perf_counter()
+    scrolls = 0
+    items = await page.evaluate(_SIZE_JS, [item_selector, container])
+    with _NetworkWatch(page) as network:
+        while scrolls < max_scrolls:
+            scrolls += 1
+            result = await page.evaluate(_SCROLL_JS, [item_selector, container, timeout_ms, SCROLL_QUIET_MS])
+            items = result["after"]
+            if result["grew"]:
+                with _lock:
+                    stats.observe_growth(result["growMs"])
+                continue
+            # nothing new within the timeout: let pending requests land before giving up
+            if network.inflight and await network.wait_idle(SCROLL_MAX_WAIT_MS):
+                items = await page.evaluate(_SIZE_JS, [item_selector, container])
+                if items > result["after"]:
+                    continue
+            break
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    with _lock:
+        stats.pages += 1
+        stats.scrolls += scrolls
+        stats.elapsed_ms += elapsed_ms
+    logging.info(f"Scrolled {page.url} {scrolls} times in {elapsed_ms / 1000:.1f}s ({items} items)")
+    report_progress("page_scrolled", url=page.url, scrolls=scrolls, items=items,
+                    seconds=round(elapsed_ms / 1000, 2))
+    return ScrollResult(items, scrolls, elapsed_ms, timeout_ms)
+
+
+async def item_count(page, item_selector):
+    return await page.evaluate(_SIZE_JS, [item_selector, None])
+
+
+async def wait_for_more_items(page, item_selector, before, timeout_ms=LOAD_MORE_TIMEOUT_MS):
+    """
+    Wait until item_selector matches more than `before` elements, e.g. after
+    clicking a load-more button. Returns False if none arrived within timeout_ms.
+    """
+    try:
+        await page.wait_for_function(_MORE_JS, arg=[item_selector, before], timeout=timeout_ms)
+        return True
+    except PlaywrightTimeoutError:
+        logging.info(f"No more {item_selector} on {page.url} after {timeout_ms / 1000:.0f}s")
+        return False
+
+
+def scroll_report():
+    with _lock:
+        return {retailer: stats.report() for retailer, stats in _stats.items()}
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+
+from exports import file_id_for, download_url
+from progress import bind_listener, unbind_listener
+from usage_ledger import bind_job, unbind_job
+from proxy import check_proxies
+from scraper_loop import run_scraper, submit, SHARED_LOOP_ENABLED
+from utils import log_event
+from worker_farm import get_farm
+
+# Number of scrapes that may run at the same time in this process
+JOB_WORKERS = int(os.getenv("SCRAPE_JOB_WORKERS", "4"))
+# "thread" runs scrapes in this process; "process" hands them to the worker farm
+JOB_EXECUTOR = os.getenv("SCRAPE_EXECUTOR", "thread")
+# Finished jobs kept in memory for status/result lookups
+MAX_FINISHED_JOBS = int(os.getenv("SCRAPE_JOB_HISTORY", "500"))
+
+# Progress events kept per job for late /events subscribers
+MAX_JOB_EVENTS = 2000
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+
+class ScrapeJob:
+    """One scrape request and its progress."""
+
+    def __init__(self, scraper, url, max_pages):
+        self.id = uuid.uuid4().hex
+        self.scraper = scraper
+        self.url = url
+        self.max_pages = max_pages
+        self.status = QUEUED
+        self.pages_done = 0
+        self.products_found = 0
+        self.rows_inserted = 0
+        self.filename = None
+        self.file_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.event_count = 0
+        self.cancel_requested = False
+        self._future = None
+        # orders cancel() against _run_job starting the job and submitting its future
+        self._cancel_lock = threading.Lock()
+        self._changed = threading.Condition()
+
+    def on_progress(self, event, data):
+        if event == "products_extracted":
+            self.pages_done += 1
+            self.products_found += data.get("count", 0)
+        elif event == "db_rows_inserted":
+            self.rows_inserted += data.get("count", 0)
+        self.add_event(event, data)
+
+    def add_event(self, event, data=None):
+        """Record a timestamped event and wake any /events streams."""
+        now = time.time()
+        with self._changed:
+            last = self.events[-1]["time"] if self.events else (self.started_at or self.created_at)
+            self.event_count += 1
+            self.events.append({
+                "id": self.event_count,
+                "event": event,
+                "time": now,
+                "elapsed": round(now - (self.started_at or self.created_at), 2),
+                # a large gap here is a stall, e.g. a navigation timing out
+                "since_last": round(now - last, 2),
+                "data": data or {},
+            })
+            if len(self.events) > MAX_JOB_EVENTS:
+                del self.events[0]
+            self._changed.notify_all()
+
+    def events_after(self, last_id, timeout):
+        """Events newer than last_id, waiting up to timeout seconds for one to arrive."""
+        with self._changed:
+            if self.event_count <= last_id and self.status not in FINISHED:
+                self._changed.wait(timeout)
+            return [e for e in self.events if e["id"] > last_id]
+
+    def cancel(self):
+        """Stop the running handler. Returns False if the job cannot be cancelled."""
+        with self._cancel_lock:
+            if self.status in FINISHED:
+                return False
+            self.cancel_requested = True
+            future = self._future
+            # not started on the loop yet: _run_job checks the flag before submitting
+            cancellable = self.status == QUEUED or (JOB_EXECUTOR == "thread" and SHARED_LOOP_ENABLED)
+        if future is not None:
+            return future.cancel()
+        return cancellable
+
+    def to_dict(self):
+        finished = self.finished_at or time.time()
+        return {
+            "job_id": self.id,
+            "url": self.url,
+            "retailer": self.scraper.name,
+            "max_pages": self.max_pages,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            # handlers that do not report per page only report at insert time
+            "products_found": self.products_found or self.rows_inserted,
+            "filename": self.filename,
+            "file_id": file_id_for(self.file_path),
+            "result_url": download_url(file_id_for(self.file_path)),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed_seconds": round(finished - self.started_at, 2) if self.started_at else None,
+        }
+
+
+_jobs = {}
+_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="scrape-job")
+
+
+def submit_job(scraper, url, max_pages):
+    """Queue a scrape on the background pool and return the job immediately."""
+    job = ScrapeJob(scraper, url, max_pages)
+    with _lock:
+        _jobs[job.id] = job
+        _prune_finished()
+    _executor.submit(_run_job, job)
+    log_event(f"Queued scrape job {job.id} for {url} ({max_pages} pages)")
+    return job
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def list_jobs():
+    with _lock:
+        return sorted(_jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+
+def _prune_finished():
+    finished = [job for job in _jobs.values() if job.status in FINISHED]
+    if len(finished) <= MAX_FINISHED_JOBS:
+        return
+    finished.sort(key=lambda job: job.finished_at)
+    for job in finished[:len(finished) - MAX_FINISHED_JOBS]:
+        del _jobs[job.id]
+
+
+def _run_job(job):
+    with job._cancel_lock:
+        cancelled = job.cancel_requested
+        if not cancelled:
+            job.status = RUNNING
+    if cancelled:
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        job.add_event("status", {"status": job.status})
+        return
+    job.started_at = time.time()
+    job.add_event("status", {"status": job.status})
+    token = bind_listener(job.on_progress)
+    job_token = bind_job(job.id)
+    try:
+        is_valid, message = check_proxies()
+        if not is_valid:
+            raise RuntimeError(f"Proxy validation failed: {message}")
+
+        if JOB_EXECUTOR == "process":
+            result = get_farm().submit(job.url, job.max_pages, job.on_progress, job_id=job.id).result()
+            if result["status"] != "done":
+                raise RuntimeError(result["error"])
+            filename, file_path = result["filename"], result["file_path"]
+        elif SHARED_LOOP_ENABLED:
+            # keep the future so the job can be cancelled from /jobs/<id>/cancel
+            with job._cancel_lock:
+                if job.cancel_requested:
+                    raise CancelledError()
+                job._future = submit(job.scraper.load_handler()(job.url, job.max_pages))
+            filename, file_path = job._future.result()
+        else:
+            handler = job.scraper.load_handler()
+            filename, file_path = run_scraper(handler(job.url, job.max_pages))
+        if not filename:
+            raise RuntimeError("Scraper did not produce a file")
+
+        job.filename = filename
+        job.file_path = file_path
+        job.status = DONE
+        log_event(f"Scrape job {job.id} finished: {filename}")
+    except CancelledError:
+        job.status = CANCELLED
+        log_event(f"Scrape job {job.id} cancelled")
+    except Exception as e:
+        job.error = str(e)
+        job.status = FAILED
+        logging.error(f"Scrape job {job.id} for {job.url} failed: {e}")
+    finally:
+        job.finished_at = time.time()
+        unbind_job(job_token)
+        unbind_listener(token)
+        job.add_event("status", {"status": job.status, "error": job.error, "filename": job.filename})
+
+
+def stream_events(job, last_id=0, keepalive=15):
+    """
+    Server-Sent Events for one job: replays what already happened, then
+    yields new events as the handler emits them until the job finishes.
+    """
+    while True:
+        events = job.events_after(last_id, keepalive)
+        for event in events:
+            last_id = event["id"]
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+        if job.status in FINISHED and job.event_count <= last_id:
+            return
+        if not events:
+            # comment line keeps proxies from closing an idle stream
+            yield f": waiting {round(time.time() - (job.started_at or job.created_at))}s\n\n"
@@ -0,0 +1,78 @@
+"""
+Concurrent page fetching within one retailer crawl.
+
+When a handler knows its page URLs up front (`/page/N`, `?page=N`), pages
+1..N do not have to be loaded one after another. fetch_pages runs the
+handler's per-page coroutine for up to `page_concurrency` pages at once (a
+registry setting), each in its own browser context, and hands the results
+back in page order. Every navigation still goes through proxysetup, so the
+retailer's rate limit applies across all of them.
+
+A page that shows no product tiles ends the crawl: pages after it that have
+not started are skipped and those in flight are cancelled. Emptiness is
+judged on the tiles the page showed, not on the rows the handler kept, since
+handlers drop tiles with missing data.
+"""
+import asyncio
+import logging
+
+from scraper_registry import resolve, DEFAULT_SETTINGS
+
+
+def _page_concurrency(url):
+    entry = resolve(url)
+    settings = entry.settings if entry else DEFAULT_SETTINGS
+    return max(1, int(settings["page_concurrency"]))
+
+
+async def fetch_pages(url_for_page, max_pages, fetch_page, on_page=None, concurrency=None):
+    """
+    Run fetch_page(page_number, page_url) for pages 1..max_pages, at most
+    `concurrency` at once, and return the results in page order.
+
+    fetch_page returns (tiles, result): the number of product tiles the page
+    showed and what to hand on_page, e.g. the rows kept from those tiles. A
+    page with no tiles stops the crawl. If fetch_page raises, the error is
+    logged and the page is skipped. on_page(page_number, result) is called in
+    page order as soon as every earlier page has finished, e.g. to append rows
+    and save progress.
+    """
+    concurrency = concurrency or _page_concurrency(url_for_page(1))
+    semaphore = asyncio.Semaphore(concurrency)
+    last_page = max_pages
+
+    async def run(page_number):
+        nonlocal last_page
+        async with semaphore:
+            if page_number > last_page:
+                return None
+            page_url = url_for_page(page_number)
+            try:
+                tiles, result = await fetch_page(page_number, page_url)
+            except Exception as e:
+                logging.error(f"Error processing page {page_number} ({page_url}): {e}")
+                return None
+            if tiles == 0:
+                logging.info(f"No products on page {page_number}, stopping at {page_url}")
+                last_page = min(last_page, page_number)
+            return tiles, result
+
+    # the semaphore wakes waiters in order, so pages start in page order
+    tasks = [asyncio.create_task(run(n)) for n in range(1, max_pages + 1)]
+    results = []
+    try:
+        for page_number, task in enumerate(tasks, start=1):
+            outcome = await task
+            if outcome is None:
+                continue
+            tiles, result = outcome
+            if tiles == 0:
+                break
+            if on_page:
+                on_page(page_number, result)
+            results.append(result)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return results
@@ -0,0 +1,47 @@
+"""
+Product detail pages queued by sitemap discovery.
+
+Sitemap discovery (sitemaps.py) queues product URLs rather than listing
+pages, and the retailers' handle_* coroutines only know how to walk listings.
+A crawl node therefore reads such a URL with scrape_product: the page is
+fetched over HTTP, its structured data (see structured_data.py) gives the
+product, and the product is stored as one row. The row's ImagePath holds the
+image URL; no image is downloaded.
+"""
+import re
+import uuid
+import logging
+from datetime import datetime
+
+from api_capture import tile_fields
+from database import insert_into_db
+from limit_checker import update_product_count
+from structured_data import product_from_page
+
+KT_PATTERN = re.compile(r"\b\d{1,2}K\s*(?:White|Yellow|Rose)?\s*Gold\b|\bPlatinum\b|\bSilver\b", re.IGNORECASE)
+DIAMOND_WEIGHT_PATTERN = re.compile(r"\d+(?:[-/.]\d+)?(?:\s+\d+/\d+)?\s*ct(?:\s*tw)?\b", re.IGNORECASE)
+
+
+async def scrape_product(url):
+    """Read and store the product at url. Returns its fields, or None if the page has no product data."""
+    listing = await product_from_page(url)
+    if listing is None:
+        logging.info(f"No structured product data on {url}")
+        return None
+    product_name, price, image_url, additional_info = tile_fields(listing.products[0])
+    kt_match = KT_PATTERN.search(product_name)
+    diamond_weight_match = DIAMOND_WEIGHT_PATTERN.search(product_name)
+    product = {
+        "url": url,
+        "name": product_name,
+        "price": price,
+        "kt": kt_match.group() if kt_match else "Not found",
+        "diamond_weight": diamond_weight_match.group() if diamond_weight_match else "N/A",
+        "image": image_url,
+        "additional_info": additional_info,
+        "source": listing.source,
+    }
+    insert_into_db([(str(uuid.uuid4()), datetime.now().strftime("%Y-%m-%d"), listing.title, product_name,
+                     image_url, product["kt"], price, product["diamond_weight"], additional_info)])
+    update_product_count(1)
+    return product
@@ -0,0 +1,27 @@
+import logging
+import contextvars
+
+# Listener for the scrape running in the current context (a job, a CLI run...).
+# Context variables follow asyncio tasks, so handlers and the helpers they call
+# can report progress without threading a callback through every signature.
+_listener = contextvars.ContextVar("scrape_progress_listener", default=None)
+
+
+def bind_listener(listener):
+    """Route progress events in the current context to listener(event, data). Returns a reset token."""
+    return _listener.set(listener)
+
+
+def unbind_listener(token):
+    _listener.reset(token)
+
+
+def report_progress(event, **data):
+    """Report a progress event; a no-op when nothing is listening."""
+    listener = _listener.get()
+    if listener is None:
+        return
+    try:
+        listener(event, data)
+    except Exception as e:
+        logging.warning(f"Progress listener failed on {event}: {e}")
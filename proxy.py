@@ -1,7 +1,11 @@
 import asyncio
 import logging
 import os
-from playwright.async_api import async_playwright
+import time
+import threading
+from proxy_monitor import monitor as proxy_monitor, BRIGHT_DATA, OXYLABS
+from scraper_loop import run_scraper, shared_playwright
+from utils import log_event
 
 # Load environment variables
 PROXY_URL = os.getenv("PROXY_URL")  # Bright Data CDP Proxy URL
@@ -9,50 +13,53 @@ PROXY_SERVER = os.getenv("PROXY_SERVER")  # Oxylabs Proxy server
 PROXY_USERNAME = os.getenv("PROXY_USERNAME")
 PROXY_PASSWORD = os.getenv("PROXY_PASSWORD")
 
+# Seconds a proxy check result is trusted; failures are re-checked sooner
+PROXY_HEALTH_TTL = int(os.getenv("PROXY_HEALTH_TTL", "300"))
+PROXY_HEALTH_FAILED_TTL = int(os.getenv("PROXY_HEALTH_FAILED_TTL", "30"))
+PROXY_CHECK_TIMEOUT_MS = int(os.getenv("PROXY_CHECK_TIMEOUT", "60")) * 1000
 
-async def check_bri_data_proxy() -> bool:
-    """Check if Bright Data proxy is working via CDP."""
+
+async def _probe(backend, label, open_browser) -> bool:
+    """Load httpbin through one proxy and feed the timings to the proxy monitor."""
+    start = time.perf_counter()
+    connect_ms = None
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.connect_over_cdp(PROXY_URL)
-            context = await browser.new_context()
-            page = await context.new_page()
-            await page.goto("https://httpbin.org/ip", timeout=180_000,wait_until="domcontentloaded")
-            await browser.close()
-            return True
+        async with shared_playwright() as p:
+            browser = await open_browser(p)
+            # the driver is shared now, so never leave the browser behind
+            try:
+                context = await browser.new_context()
+                page = await context.new_page()
+                connect_ms = (time.perf_counter() - start) * 1000
+                await page.goto("https://httpbin.org/ip", timeout=PROXY_CHECK_TIMEOUT_MS, wait_until="domcontentloaded")
+            finally:
+                await browser.close()
+        proxy_monitor.record(backend, True, connect_ms, (time.perf_counter() - start) * 1000 - connect_ms)
+        return True
     except Exception as e:
-        logging.error(f"Bright Data proxy failed: {e}")
+        proxy_monitor.record(backend, False, connect_ms, error=e)
+        logging.error(f"{label} proxy failed: {e}")
         return False
 
 
+async def check_bri_data_proxy() -> bool:
+    """Check if Bright Data proxy is working via CDP."""
+    return await _probe(BRIGHT_DATA, "Bright Data", lambda p: p.chromium.connect_over_cdp(PROXY_URL))
+
+
 async def check_oxylabs_proxy() -> bool:
     """Check if Oxylabs proxy is working using standard Chromium proxy config."""
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                proxy={
-                    "server": PROXY_SERVER,
-                    "username": PROXY_USERNAME,
-                    "password": PROXY_PASSWORD
-                },
-                headless=True
-            )
-            context = await browser.new_context()
-            page = await context.new_page()
-            await page.goto("https://httpbin.org/ip", timeout=180_000,wait_until="domcontentloaded")
-            await browser.close()
-            return True
-    except Exception as e:
-        logging.error(f"Oxylabs proxy failed: {e}")
-        return False
+    return await _probe(OXYLABS, "Oxylabs", lambda p: p.chromium.launch(
+        proxy={
+            "server": PROXY_SERVER,
+            "username": PROXY_USERNAME,
+            "password": PROXY_PASSWORD
+        },
+        headless=True
+    ))
 
-async def _check_proxies_async():
-    """Check both proxies and return a unified status message."""
-    bri_ok, oxy_ok = await asyncio.gather(
-        check_bri_data_proxy(),
-        check_oxylabs_proxy()
-    )
 
+def _summarize(bri_ok, oxy_ok):
     if bri_ok and oxy_ok:
         return True, "Both Bright Data and Oxylabs proxies are working."
     elif bri_ok:
@@ -63,14 +70,112 @@ async def _check_proxies_async():
         return False, "Both Bright Data and Oxylabs proxies failed."
 
 
-def check_proxies():
-    """Synchronous wrapper to run proxy checks without URL input."""
-    try:
-        result, message = asyncio.run(_check_proxies_async())
-        print(result)
-        print(message)
-        return result, message
-    except Exception as e:
-        logging.error(f"Proxy check error: {e}")
-        return False, f"Proxy check failed: {str(e)}"
+async def _timed(check):
+    start = time.perf_counter()
+    ok = await check()
+    return {"ok": ok, "checked_at": time.time(), "latency_ms": round((time.perf_counter() - start) * 1000)}
+
+
+async def _check_proxies_async():
+    """Check both proxies and return the status plus per-proxy timings."""
+    bri, oxy = await asyncio.gather(_timed(check_bri_data_proxy), _timed(check_oxylabs_proxy))
+    result, message = _summarize(bri["ok"], oxy["ok"])
+    return {
+        "ok": result,
+        "message": message,
+        "checked_at": time.time(),
+        "proxies": {"bright_data": bri, "oxylabs": oxy},
+    }
+
+
+class ProxyHealthCache:
+    """
+    Last known proxy status. A background thread re-checks every `ttl`
+    seconds (sooner after a failure), so callers read the cached status
+    instead of opening two proxied browsers per scrape. Only the very first
+    read, before any check has finished, waits for one.
+    """
+
+    def __init__(self, ttl=PROXY_HEALTH_TTL, failed_ttl=PROXY_HEALTH_FAILED_TTL):
+        self.ttl = ttl
+        self.failed_ttl = failed_ttl
+        self._status = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._checked = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Run the checks now and store the result."""
+        with self._refresh_lock:
+            try:
+                status = run_scraper(_check_proxies_async())
+            except Exception as e:
+                logging.error(f"Proxy check error: {e}")
+                status = {"ok": False, "message": f"Proxy check failed: {str(e)}",
+                          "checked_at": time.time(), "proxies": {}}
+            with self._lock:
+                self._status = status
+            self._checked.set()
+            log_event(f"Proxy health: {status['message']}")
+            return status
+
+    def _max_age(self, status):
+        return self.ttl if status["ok"] else self.failed_ttl
+
+    def _run(self):
+        while True:
+            with self._lock:
+                status = self._status
+            wait = 0 if status is None else status["checked_at"] + self._max_age(status) - time.time()
+            if wait > 0:
+                self._wake.wait(wait)
+                self._wake.clear()
+                continue
+            self.refresh()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="proxy-health", daemon=True)
+                self._thread.start()
+        return self
+
+    def get(self, force=False):
+        """Cached status dict; refreshed inline only when forced."""
+        self.start()
+        if force:
+            status = self.refresh()
+            self._wake.set()
+        else:
+            # before the first check finishes, wait for the background thread's
+            # rather than probing both proxies a second time
+            self._checked.wait()
+            with self._lock:
+                status = self._status
+        return dict(status, age_seconds=round(time.time() - status["checked_at"], 1))
+
+
+_health = ProxyHealthCache()
+
+
+def start_health_checks():
+    """Start the background checks so the first scrape finds a warm status."""
+    _health.start()
+
+
+def proxy_health(force=False):
+    """
+    Last proxy check result (ok, message, checked_at, per-proxy latency_ms)
+    plus the proxy monitor's rolling stats and circuit state per backend and
+    the warm browser pools.
+    """
+    from proxysetup import browser_pool_stats
+    return dict(_health.get(force), backends=proxy_monitor.snapshot(), browser_pools=browser_pool_stats())
+
 
+def check_proxies(force=False):
+    """Return (ok, message) from the cached proxy status; force=True re-checks now."""
+    status = _health.get(force)
+    return status["ok"], status["message"]
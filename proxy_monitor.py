@@ -0,0 +1,161 @@
+"""
+Rolling health of each proxy backend, fed by every browser the scrapers open
+and by the background proxy checks.
+
+For each backend the monitor keeps the last PROXY_MONITOR_WINDOW attempts
+(success, connect latency, navigation latency). After PROXY_BREAKER_FAILURES
+consecutive failures, or once the failure rate over a full window passes
+PROXY_BREAKER_FAILURE_RATE, the backend's circuit opens and callers skip it
+until PROXY_BREAKER_COOLDOWN seconds have passed; then one trial attempt is
+let through and its outcome closes or re-opens the circuit.
+
+Stats are per process; each worker farm process keeps its own.
+"""
+import os
+import time
+import threading
+from collections import deque
+
+BRIGHT_DATA = "bright_data"
+OXYLABS = "oxylabs"
+
+PROXY_MONITOR_WINDOW = int(os.getenv("PROXY_MONITOR_WINDOW", "50"))
+PROXY_BREAKER_FAILURES = int(os.getenv("PROXY_BREAKER_FAILURES", "5"))
+PROXY_BREAKER_FAILURE_RATE = float(os.getenv("PROXY_BREAKER_FAILURE_RATE", "0.5"))
+PROXY_BREAKER_COOLDOWN = int(os.getenv("PROXY_BREAKER_COOLDOWN", "120"))
+# Samples needed before the failure rate alone can open the circuit
+MIN_RATE_SAMPLES = 10
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p90": None, "p99": None}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))])
+
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99)}
+
+
+class BackendHealth:
+    """Sliding window of attempts and the circuit state for one backend."""
+
+    def __init__(self, name, window=PROXY_MONITOR_WINDOW):
+        self.name = name
+        self.samples = deque(maxlen=window)   # (time, ok, connect_ms, nav_ms)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.last_error = None
+        self.total = 0
+        self.failures = 0
+
+    def failure_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(1 for s in self.samples if not s[1]) / len(self.samples)
+
+    def to_dict(self):
+        samples = list(self.samples)
+        return {
+            "state": self.state,
+            "samples": len(samples),
+            "success_rate": round(1 - self.failure_rate(), 3) if samples else None,
+            "consecutive_failures": self.consecutive_failures,
+            "connect_ms": _percentiles([s[2] for s in samples if s[2] is not None]),
+            "navigation_ms": _percentiles([s[3] for s in samples if s[3] is not None]),
+            "opened_at": self.opened_at,
+            "last_error": self.last_error,
+            "total_attempts": self.total,
+            "total_failures": self.failures,
+        }
+
+
+class ProxyMonitor:
+    def __init__(self, cooldown=PROXY_BREAKER_COOLDOWN, max_failures=PROXY_BREAKER_FAILURES,
+                 failure_rate=PROXY_BREAKER_FAILURE_RATE):
+        self.cooldown = cooldown
+        self.max_failures = max_failures
+        self.max_failure_rate = failure_rate
+        self._backends = {name: BackendHealth(name) for name in (BRIGHT_DATA, OXYLABS)}
+        self._lock = threading.Lock()
+
+    def _backend(self, name):
+        if name not in self._backends:
+            self._backends[name] = BackendHealth(name)
+        return self._backends[name]
+
+    def available(self, name):
+        """Whether this backend could be tried now (closed, or due a trial). Claims nothing."""
+        with self._lock:
+            backend = self._backend(name)
+            if backend.state == CLOSED:
+                return True
+            if backend.state == OPEN:
+                return time.time() - backend.opened_at >= self.cooldown
+            return not backend.trial_in_flight
+
+    def allow(self, name):
+        """
+        Whether a caller may use this backend now. Claims the trial slot when
+        half-open, so call it right before the attempt, which must then be
+        recorded to release the slot.
+        """
+        with self._lock:
+            backend = self._backend(name)
+            if backend.state == CLOSED:
+                return True
+            if backend.state == OPEN and time.time() - backend.opened_at >= self.cooldown:
+                backend.state = HALF_OPEN
+                backend.trial_in_flight = False
+            if backend.state == HALF_OPEN and not backend.trial_in_flight:
+                backend.trial_in_flight = True
+                return True
+            return False
+
+    def order(self, names):
+        """
+        The given backends minus those whose circuit is open, in the same order.
+        If every backend is open the full list is returned: with no healthy
+        alternative a doomed attempt is no worse than failing outright.
+        """
+        available = [name for name in names if self.available(name)]
+        return available or list(names)
+
+    def record(self, name, ok, connect_ms=None, nav_ms=None, error=None):
+        with self._lock:
+            backend = self._backend(name)
+            backend.samples.append((time.time(), ok, connect_ms, nav_ms))
+            backend.total += 1
+            backend.trial_in_flight = False
+            if ok:
+                backend.consecutive_failures = 0
+                if backend.state != CLOSED:
+                    backend.state = CLOSED
+                    backend.opened_at = None
+                return
+            backend.failures += 1
+            backend.consecutive_failures += 1
+            backend.last_error = str(error)[:500] if error else None
+            tripped = (
+                backend.state == HALF_OPEN
+                or backend.consecutive_failures >= self.max_failures
+                or (len(backend.samples) >= MIN_RATE_SAMPLES
+                    and backend.failure_rate() >= self.max_failure_rate)
+            )
+            if tripped and backend.state != OPEN:
+                backend.state = OPEN
+                backend.opened_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            return {name: backend.to_dict() for name, backend in self._backends.items()}
+
+
+monitor = ProxyMonitor()
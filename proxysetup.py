@@ -1,12 +1,18 @@
 import os
-import re
+import asyncio
 import logging
+import weakref
+from progress import report_progress
+from proxy_monitor import monitor as proxy_monitor, BRIGHT_DATA, OXYLABS
+from robots import is_allowed as robots_allows
+from resource_blocking import apply_resource_profile
+import usage_ledger
+from rate_limiter import throttle
 from playwright.async_api import async_playwright, TimeoutError, Error
 import httpx
 import traceback
-from typing import List, Tuple
+from typing import Tuple
 import time
-import random
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -17,14 +23,11 @@ PROXY_SERVER = os.getenv("PROXY_SERVER")
 PROXY_USERNAME = os.getenv("PROXY_USERNAME")
 PROXY_PASSWORD = os.getenv("PROXY_PASSWORD")
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 async def safe_goto_and_wait(page, url,isbri_data,product_wrapper, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -42,7 +45,7 @@ async def safe_goto_and_wait(page, url,isbri_data,product_wrapper, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -50,81 +53,383 @@ async def safe_goto_and_wait(page, url,isbri_data,product_wrapper, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
 
 
+########################################  browser pool ####################################################################
+
+# Warm Oxylabs browsers kept per launch config (per Playwright driver)
+BROWSER_POOL_ENABLED = os.getenv("BROWSER_POOL_ENABLED", "1") == "1"
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# Contexts a pooled browser serves at once before another browser is launched
+BROWSER_POOL_CONTEXTS = int(os.getenv("BROWSER_POOL_CONTEXTS", "4"))
+# Pages a browser serves before it is replaced, to cap memory growth
+BROWSER_RECYCLE_PAGES = int(os.getenv("BROWSER_RECYCLE_PAGES", "50"))
+BROWSER_POOL_IDLE_SECONDS = int(os.getenv("BROWSER_POOL_IDLE_SECONDS", "300"))
+
+# Bright Data remote browser sessions: one per domain, reused across pages
+# and replaced once they reach this age (seconds) or sit idle this long
+BRIGHT_DATA_SESSION_MAX_AGE = int(os.getenv("BRIGHT_DATA_SESSION_MAX_AGE", "900"))
+BRIGHT_DATA_SESSION_IDLE_SECONDS = int(os.getenv("BRIGHT_DATA_SESSION_IDLE_SECONDS", "60"))
+BRIGHT_DATA_SESSION_CONTEXTS = int(os.getenv("BRIGHT_DATA_SESSION_CONTEXTS", "4"))
+
+
+class PooledBrowser:
+    def __init__(self, key, browser):
+        self.key = key
+        self.browser = browser
+        self.leases = 0
+        self.pages_served = 0
+        self.retired = False
+        self.created_at = time.monotonic()
+        self.idle_since = self.created_at
+        browser.on("disconnected", lambda _: self._crashed())
+
+    def _crashed(self):
+        if not self.retired:
+            logging.warning(f"Pooled browser for {self.key[0]} disconnected; dropping it")
+        self.retired = True
+
+    def usable(self):
+        return not self.retired and self.browser.is_connected()
+
+
+class BrowserLease:
+    """
+    A fresh context on a pooled browser, handed to scrapers in place of the
+    browser itself. close() closes the context and returns the browser to
+    the pool, so existing `await browser.close()` calls keep working and
+    may safely run more than once.
+    """
+
+    def __init__(self, pool, entry, context):
+        self._pool = pool
+        self._entry = entry
+        self.context = context
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._entry.browser, name)
+
+    async def new_context(self, **kwargs):
+        return self.context
+
+    async def new_page(self):
+        return await self.context.new_page()
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            await self.context.close()
+        except Exception as e:
+            logging.debug(f"Error closing pooled context: {e}")
+        await self._pool.release(self._entry)
+
+
+class BrowserPool:
+    """
+    Bounded set of warm browsers per key, leased out one context at a time.
+    Also used for Bright Data CDP sessions, where a "browser" is a remote
+    session and max_age bounds how long one session is kept.
+    """
+
+    def __init__(self, size=BROWSER_POOL_SIZE, contexts_per_browser=BROWSER_POOL_CONTEXTS,
+                 recycle_pages=BROWSER_RECYCLE_PAGES, idle_seconds=BROWSER_POOL_IDLE_SECONDS,
+                 max_age=None):
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.recycle_pages = recycle_pages
+        self.idle_seconds = idle_seconds
+        self.max_age = max_age
+        self._browsers = {}   # key -> [PooledBrowser]
+        self._launching = {}  # key -> launches reserved but not yet published
+        self._changed = asyncio.Condition()
+        self.launches = 0
+
+    async def lease(self, key, launch, context_options=None):
+        """
+        Context on a warm browser for `key`, launching one with `launch()` if
+        needed. A browser found disconnected when the context is opened is
+        replaced once, so a dropped remote session reconnects transparently.
+        """
+        for attempt in range(2):
+            entry = await self._acquire(key, launch)
+            try:
+                context = await entry.browser.new_context(**(context_options or {}))
+            except Exception:
+                reconnect = attempt == 0 and not entry.browser.is_connected()
+                entry.retired = True
+                await self.release(entry)
+                if reconnect:
+                    logging.info(f"{key[0]} browser disconnected; reconnecting")
+                    continue
+                raise
+            return BrowserLease(self, entry, context)
+
+    async def _acquire(self, key, launch):
+        async with self._changed:
+            while True:
+                stale = self._sweep()
+                entries = self._browsers.setdefault(key, [])
+                live = [e for e in entries if e.usable()]
+                free = [e for e in live if e.leases < self.contexts_per_browser]
+                if free:
+                    entry = min(free, key=lambda e: e.leases)
+                    entry.leases += 1
+                    break
+                # retired browsers still draining their leases do not count against the bound
+                if len(live) + self._launching.get(key, 0) < self.size:
+                    # reserve the slot, then launch outside the lock: a launch takes
+                    # seconds and must not hold up other keys or release()
+                    self._launching[key] = self._launching.get(key, 0) + 1
+                    entry = None
+                    break
+                await self._changed.wait()
+        await _close_browsers(stale)
+        if entry is not None:
+            return entry
+
+        try:
+            browser = await launch()
+        except BaseException:
+            async with self._changed:
+                self._launching[key] -= 1
+                self._changed.notify_all()
+            raise
+        async with self._changed:
+            self._launching[key] -= 1
+            entry = PooledBrowser(key, browser)
+            entry.leases += 1
+            self.launches += 1
+            self._browsers.setdefault(key, []).append(entry)
+            self._changed.notify_all()
+        return entry
+
+    async def release(self, entry):
+        async with self._changed:
+            entry.leases -= 1
+            entry.pages_served += 1
+            entry.idle_since = time.monotonic()
+            if entry.pages_served >= self.recycle_pages:
+                entry.retired = True
+            stale = self._sweep()
+            self._changed.notify_all()
+        await _close_browsers(stale)
+
+    def _sweep(self):
+        """
+        Retire long-idle and over-age browsers under every key, drop them from
+        the pool once nobody uses them and return their browsers for closing.
+        Every key is swept, so browsers under keys never leased again are
+        closed too.
+        """
+        now = time.monotonic()
+        stale = []
+        for key in list(self._browsers):
+            keep = []
+            for entry in self._browsers[key]:
+                if entry.leases == 0 and now - entry.idle_since > self.idle_seconds:
+                    entry.retired = True
+                if self.max_age and now - entry.created_at > self.max_age:
+                    entry.retired = True
+                if entry.leases == 0 and not entry.usable():
+                    stale.append(entry.browser)
+                elif entry.usable() or entry.leases:
+                    keep.append(entry)
+            if keep or self._launching.get(key):
+                self._browsers[key] = keep
+            else:
+                del self._browsers[key]
+                self._launching.pop(key, None)
+        return stale
+
+    def stats(self):
+        return {
+            "launches": self.launches,
+            "browsers": [{"proxy": key[0], "key": key[1], "leases": e.leases,
+                          "pages_served": e.pages_served, "connected": e.usable(),
+                          "age_seconds": round(time.monotonic() - e.created_at)}
+                         for key, entries in self._browsers.items() for e in entries],
+        }
+
+
+async def _close_browsers(browsers):
+    for browser in browsers:
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+
+# One pool per Playwright driver: browsers belong to the driver that launched them
+_pools = weakref.WeakKeyDictionary()
+_cdp_sessions = weakref.WeakKeyDictionary()
+
+
+def get_browser_pool(p):
+    if p not in _pools:
+        _pools[p] = BrowserPool()
+    return _pools[p]
+
+
+def get_cdp_sessions(p):
+    """Bright Data sessions for this driver: one per domain, aged out and reconnected on drop."""
+    if p not in _cdp_sessions:
+        _cdp_sessions[p] = BrowserPool(
+            size=1, contexts_per_browser=BRIGHT_DATA_SESSION_CONTEXTS,
+            recycle_pages=BROWSER_RECYCLE_PAGES, idle_seconds=BRIGHT_DATA_SESSION_IDLE_SECONDS,
+            max_age=BRIGHT_DATA_SESSION_MAX_AGE,
+        )
+    return _cdp_sessions[p]
+
+
+def browser_pool_stats():
+    return {
+        "oxylabs": [pool.stats() for pool in list(_pools.values())],
+        "bright_data_sessions": [pool.stats() for pool in list(_cdp_sessions.values())],
+    }
+
+
 ########################################  get browser with proxy ####################################################################
       
 
-async def get_browser_with_proxy_strategy(p, url: str,product_wrapper: str):
+async def preferred_proxies(url):
+    """
+    The proxy backends for url in the order to try them: Bright Data first if
+    the host's robots.txt (cached per host) allows the URL, Oxylabs first if it
+    disallows it.
+    """
+    if await robots_allows(url):
+        return [BRIGHT_DATA, OXYLABS]
+    return [OXYLABS, BRIGHT_DATA]
+
+
+async def open_proxied_browser(p, url: str, goto, launch_args=(), context_options=None, headless=True,
+                               before_goto=None, proxies=None):
     """
     Dynamically checks robots.txt and selects proxy accordingly
     Always uses proxies - never scrapes directly
+
+    `goto(page, url, isbri_data)` navigates and waits for the scraper's
+    content. Proxies whose circuit is open in the proxy monitor are skipped,
+    and every attempt's connect and navigation time is recorded there. The
+    context gets the retailer's resource-blocking profile before navigating.
+    before_goto(page), if given, runs on each new page before navigation,
+    e.g. to attach response listeners. proxies, if given, pins the backends
+    tried (in that order) instead of choosing them by robots.txt.
     """
     parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
 
+    # charge this handler's later image downloads to the retailer
+    usage_ledger.bind_site(url)
+
+    # try proxies in order, leaving out any the monitor currently considers down
+    preferred = list(proxies) if proxies else await preferred_proxies(url)
+    proxies_to_try = proxy_monitor.order(preferred)
+    # with every circuit open, order() hands back all of them and each is tried anyway
+    all_open = not any(proxy_monitor.available(backend) for backend in preferred)
+    if proxies_to_try != preferred:
+        logging.info(f"Skipping proxies with an open circuit: {sorted(set(preferred) - set(proxies_to_try))}")
 
     last_error = None
-    for proxy_config in proxies_to_try:
+    for backend in proxies_to_try:
         browser = None
+        # wait for the retailer's rate limit before taking a browser, so the
+        # wait shows up in neither the pool's lease time nor the latencies
+        await throttle(url)
+        # claim a half-open backend's single trial only now that it is actually tried
+        if not proxy_monitor.allow(backend) and not all_open:
+            logging.info(f"Skipping {backend}: its circuit trial is already taken")
+            continue
+        start = time.perf_counter()
+        connect_ms = None
+        arrived = []   # when the page's document response came back through the proxy
         try:
             isbri_data = False
-            if proxy_config == PROXY_URL:
+            if backend == BRIGHT_DATA:
                 logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
+                if BROWSER_POOL_ENABLED:
+                    # reuse this domain's remote session instead of opening one per page
+                    browser = await get_cdp_sessions(p).lease(
+                        (BRIGHT_DATA, parsed_url.host), lambda: p.chromium.connect_over_cdp(PROXY_URL),
+                        context_options)
+                else:
+                    browser = await p.chromium.connect_over_cdp(PROXY_URL)
                 isbri_data = True
             else:
                 logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
+
+                def launch():
+                    return p.chromium.launch(
+                        proxy={
+                            "server": PROXY_SERVER,
+                            "username": PROXY_USERNAME,
+                            "password": PROXY_PASSWORD
+                        },
+                        headless=headless,
+                        args=[
+                            '--disable-blink-features=AutomationControlled',
+                            '--disable-web-security',
+                            *launch_args
+                        ]
+                    )
+
+                if BROWSER_POOL_ENABLED:
+                    # browser is a BrowserLease: closing it hands the browser back
+                    key = (OXYLABS, (headless, tuple(launch_args)))
+                    browser = await get_browser_pool(p).lease(key, launch, context_options)
+                else:
+                    browser = await launch()
+
+            context = await browser.new_context(**(context_options or {}))
             await context.add_init_script("""
                 Object.defineProperty(navigator, 'webdriver', {
                     get: () => undefined
                 })
             """)
+            blocker = await apply_resource_profile(context, url)
+            usage_ledger.ledger.track_context(context, backend, url)
             page = await context.new_page()
+
+            def on_response(response):
+                if response.request.is_navigation_request() and response.frame == page.main_frame:
+                    arrived.append(time.perf_counter())
+
+            page.on("response", on_response)
+            if before_goto:
+                before_goto(page)
+            connect_ms = (time.perf_counter() - start) * 1000
             
-            await safe_goto_and_wait(page, url,isbri_data,product_wrapper)
+            await goto(page, url, isbri_data)
+            page.remove_listener("response", on_response)
+            nav_ms = (time.perf_counter() - start) * 1000 - connect_ms
+            proxy_monitor.record(backend, True, connect_ms, nav_ms)
+            usage_ledger.ledger.record_navigation(backend, url, nav_ms)
+            blocker.finish(nav_ms)
+            report_progress("page_loaded", url=url)
             return browser, page
 
         except Exception as e:
             last_error = e
+            if arrived:
+                # the proxy delivered the page; the scraper's selector wait is what failed,
+                # which says nothing about the proxy and must not open its circuit
+                proxy_monitor.record(backend, True, connect_ms, (arrived[0] - start) * 1000 - connect_ms)
+            else:
+                proxy_monitor.record(backend, False, connect_ms, error=e)
+            usage_ledger.ledger.record_navigation(backend, url, (time.perf_counter() - start) * 1000, ok=False)
             error_trace = traceback.format_exc()
             logging.error(f"Proxy attempt failed:\n{error_trace}")
             if browser:
-                await browser.close()
+                try:
+                    await browser.close()
+                except Exception:
+                    pass  # Don't raise new exception during cleanup
             continue
 
     error_msg = (f"Failed to load {url} using all proxy options. "
@@ -134,44 +439,9 @@ async def get_browser_with_proxy_strategy(p, url: str,product_wrapper: str):
     raise RuntimeError(error_msg)
 
 
+async def get_browser_with_proxy_strategy(p, url: str,product_wrapper: str):
+    """Open a proxied page on url and wait for product_wrapper to appear."""
+    async def goto(page, url, isbri_data):
+        await safe_goto_and_wait(page, url, isbri_data, product_wrapper)
 
-
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
-    except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
-
-
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
+    return await open_proxied_browser(p, url, goto)
@@ -0,0 +1,70 @@
+"""
+Per-domain politeness for every navigation the scrapers make.
+
+Each retailer domain gets a token bucket refilled at its `rate_per_minute`
+registry setting (up to `burst` tokens). throttle(url) takes a token, waiting
+with asyncio.sleep only when the domain is ahead of its rate, so the time a
+handler spends extracting a page or downloading images counts towards the
+gap instead of being added on top of it, and other coroutines keep running
+while one waits.
+
+Buckets are per process and shared by all event loops in it.
+"""
+import time
+import asyncio
+import threading
+
+from scraper_registry import resolve, DEFAULT_SETTINGS, normalize_host
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, burst=1):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self.acquired = 0
+
+    def reserve(self):
+        """Take a token and return how long the caller must wait before using it."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        self.acquired += 1
+        # a negative balance is a reservation on future refill
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        self.waited += wait
+        return wait
+
+
+_buckets = {}
+_lock = threading.Lock()
+
+
+def _bucket_for(url):
+    entry = resolve(url)
+    key = entry.name if entry else normalize_host(url)
+    with _lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            settings = entry.settings if entry else DEFAULT_SETTINGS
+            bucket = _buckets[key] = TokenBucket(settings["rate_per_minute"], settings["burst"])
+        return bucket
+
+
+async def throttle(url):
+    """Wait until the url's retailer may receive another request."""
+    bucket = _bucket_for(url)
+    with _lock:
+        wait = bucket.reserve()
+    if wait > 0:
+        await asyncio.sleep(wait)
+
+
+def rate_stats():
+    with _lock:
+        return {key: {"rate_per_minute": round(b.rate * 60, 2), "burst": b.burst,
+                      "requests": b.acquired, "seconds_waited": round(b.waited, 1)}
+                for key, b in _buckets.items()}
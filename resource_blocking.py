@@ -0,0 +1,144 @@
+"""
+Request interception for listing pages.
+
+Every context opened through proxysetup gets its retailer's profile (the
+`resource_profile` registry setting): requests for resource types and URL
+patterns the extractors never read are aborted before they reach the proxy.
+The default, listing_images, keeps images: many handlers read a tile's image
+URL from its <img> src, which lazy loaders only fill in once the image loads.
+Retailers whose tiles carry the URL without loading it can opt into
+"listing", which drops images as well.
+
+To report what blocking saves, one page in RESOURCE_BLOCKING_BASELINE_EVERY
+per retailer is loaded without it; bytes and navigation time of those
+baseline pages are compared with the blocked ones.
+"""
+import os
+import re
+import threading
+
+from scraper_registry import resolve
+from usage_ledger import response_size
+
+RESOURCE_BLOCKING_ENABLED = os.getenv("RESOURCE_BLOCKING_ENABLED", "1") == "1"
+# Every Nth page of a retailer loads unblocked to measure the savings (0 = never)
+RESOURCE_BLOCKING_BASELINE_EVERY = int(os.getenv("RESOURCE_BLOCKING_BASELINE_EVERY", "25"))
+
+_TRACKERS = [
+    r"google-analytics\.com", r"googletagmanager\.com", r"doubleclick\.net",
+    r"googleadservices\.com", r"connect\.facebook\.net", r"facebook\.com/tr",
+    r"hotjar\.com", r"clarity\.ms", r"segment\.(io|com)", r"bat\.bing\.com",
+    r"tiktok\.com", r"pinterest\.com/ct", r"snapchat\.com", r"criteo\.(com|net)",
+    r"newrelic\.com", r"nr-data\.net", r"quantummetric\.com", r"fullstory\.com",
+    r"klaviyo\.com", r"yotpo\.com", r"trustpilot\.com", r"optimizely\.com",
+]
+
+PROFILES = {
+    "none": {"types": [], "patterns": []},
+    # listing pages whose tiles carry image URLs without loading them
+    "listing": {"types": ["image", "media", "font"], "patterns": _TRACKERS},
+    # default: tiles whose markup only fills image URLs once the image loads
+    "listing_images": {"types": ["media", "font"], "patterns": _TRACKERS},
+}
+
+
+def _profile_for(url):
+    entry = resolve(url)
+    profile = entry.settings.get("resource_profile", "listing_images") if entry else "listing_images"
+    name = entry.name if entry else "unknown"
+    if isinstance(profile, dict):
+        return name, profile
+    return name, PROFILES.get(profile, PROFILES["listing_images"])
+
+
+class BlockingStats:
+    """Running totals for one retailer."""
+
+    def __init__(self):
+        self.pages = {"blocked": 0, "baseline": 0}
+        self.bytes = {"blocked": 0, "baseline": 0}
+        self.nav_ms = {"blocked": 0.0, "baseline": 0.0}
+        self.aborted = {}    # resource type -> count
+        self.seen = 0
+
+    def report(self):
+        blocked, baseline = self.pages["blocked"], self.pages["baseline"]
+        report = {
+            "pages": dict(self.pages),
+            "aborted_requests": dict(self.aborted),
+            "avg_bytes_per_page": {m: round(self.bytes[m] / n) if n else None for m, n in self.pages.items()},
+            "avg_navigation_ms": {m: round(self.nav_ms[m] / n) if n else None for m, n in self.pages.items()},
+            "bytes_saved": None,
+            "seconds_saved": None,
+        }
+        if blocked and baseline:
+            per_page_bytes = self.bytes["baseline"] / baseline - self.bytes["blocked"] / blocked
+            per_page_ms = self.nav_ms["baseline"] / baseline - self.nav_ms["blocked"] / blocked
+            report["bytes_saved"] = round(per_page_bytes * blocked)
+            report["seconds_saved"] = round(per_page_ms * blocked / 1000, 1)
+        return report
+
+
+_stats = {}
+_lock = threading.Lock()
+
+
+class PageBlocker:
+    """Routes installed on one context; finish() records the page's navigation time."""
+
+    def __init__(self, retailer, mode, profile):
+        self.retailer = retailer
+        self.mode = mode
+        self.types = set(profile.get("types", []))
+        self.patterns = [re.compile(p) for p in profile.get("patterns", [])]
+        self.bytes = 0
+
+    def _stats(self):
+        return _stats.setdefault(self.retailer, BlockingStats())
+
+    def should_block(self, request):
+        if self.mode != "blocked" or request.resource_type == "document":
+            return False
+        return request.resource_type in self.types or any(p.search(request.url) for p in self.patterns)
+
+    async def handle_route(self, route):
+        request = route.request
+        if self.should_block(request):
+            with _lock:
+                aborted = self._stats().aborted
+                aborted[request.resource_type] = aborted.get(request.resource_type, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def on_response(self, response):
+        size = await response_size(response)
+        with _lock:
+            self.bytes += size
+            self._stats().bytes[self.mode] += size
+
+    def finish(self, nav_ms):
+        with _lock:
+            stats = self._stats()
+            stats.pages[self.mode] += 1
+            stats.nav_ms[self.mode] += nav_ms
+
+
+async def apply_resource_profile(context, url):
+    """Install the retailer's blocking profile on a fresh context and return its PageBlocker."""
+    retailer, profile = _profile_for(url)
+    with _lock:
+        stats = _stats.setdefault(retailer, BlockingStats())
+        stats.seen += 1
+        baseline = RESOURCE_BLOCKING_BASELINE_EVERY and stats.seen % RESOURCE_BLOCKING_BASELINE_EVERY == 1
+    enabled = RESOURCE_BLOCKING_ENABLED and (profile.get("types") or profile.get("patterns"))
+    blocker = PageBlocker(retailer, "blocked" if enabled and not baseline else "baseline", profile)
+    if blocker.mode == "blocked":
+        await context.route("**/*", blocker.handle_route)
+    context.on("response", blocker.on_response)
+    return blocker
+
+
+def blocking_report():
+    with _lock:
+        return {retailer: stats.report() for retailer, stats in _stats.items()}
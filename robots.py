@@ -0,0 +1,174 @@
+"""
+Shared robots.txt handling for every scraper.
+
+Rules are fetched once per host and kept for ROBOTS_TTL seconds. Each file is
+compiled once into a matcher for our user-agent group that follows the usual
+robots.txt semantics: the longest matching Allow/Disallow pattern wins, Allow
+wins a tie, `*` matches any run of characters and a trailing `$` anchors the
+pattern to the end of the URL.
+
+A host's robots.txt is fetched once however many scrapes miss the cache at
+the same time: the first fetches, the rest wait for its result.
+"""
+import os
+import re
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import httpx
+
+# User-agent token whose group applies to our crawlers; "*" uses the default group
+ROBOTS_USER_AGENT = os.getenv("ROBOTS_USER_AGENT", "*")
+ROBOTS_TTL = int(os.getenv("ROBOTS_TTL", "3600"))
+# Unreachable robots.txt counts as "allow all", but is retried sooner
+ROBOTS_ERROR_TTL = int(os.getenv("ROBOTS_ERROR_TTL", "300"))
+
+
+def _compile(pattern):
+    anchored = pattern.endswith("$")
+    if anchored:
+        pattern = pattern[:-1]
+    regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+    return re.compile(regex + (r"\Z" if anchored else ""))
+
+
+class RobotsRules:
+    """Compiled Allow/Disallow rules of one robots.txt group."""
+
+    def __init__(self, rules=(), sitemaps=()):
+        # (pattern length, allow, regex); longest first so the first match decides
+        self.rules = sorted(
+            ((len(pattern), allow, _compile(pattern)) for allow, pattern in rules if pattern),
+            key=lambda rule: (-rule[0], not rule[1]),
+        )
+        self.sitemaps = list(sitemaps)
+
+    def is_allowed(self, url):
+        parts = urlsplit(url)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        for _, allow, regex in self.rules:
+            if regex.match(path):
+                return allow
+        return True
+
+
+def parse_robots_txt(text, user_agent=ROBOTS_USER_AGENT):
+    """Parse robots.txt and keep the group that applies to user_agent (else `*`)."""
+    groups = {}          # agent -> [(allow, pattern)]
+    sitemaps = []
+    agents = []
+    in_rules = False
+    for raw in text.splitlines():
+        line = raw.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        field, value = (part.strip() for part in line.split(":", 1))
+        field = field.lower()
+        if field == "user-agent":
+            # a user-agent line after rules starts a new group
+            if in_rules:
+                agents, in_rules = [], False
+            agents.append(value.lower())
+            groups.setdefault(value.lower(), [])
+        elif field in ("allow", "disallow"):
+            in_rules = True
+            for agent in agents:
+                groups[agent].append((field == "allow", value))
+        elif field == "sitemap":
+            sitemaps.append(value)
+
+    token = user_agent.lower()
+    specific = [agent for agent in groups if agent != "*" and agent in token]
+    if specific:
+        # the most specific (longest) matching agent name wins
+        chosen = groups[max(specific, key=len)]
+    else:
+        chosen = groups.get("*", [])
+    return RobotsRules(chosen, sitemaps)
+
+
+class RobotsCache:
+    """Per-host robots.txt rules with a TTL and hit/miss counters."""
+
+    def __init__(self, ttl=ROBOTS_TTL, error_ttl=ROBOTS_ERROR_TTL, user_agent=ROBOTS_USER_AGENT):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.user_agent = user_agent
+        self._rules = {}     # base url -> (RobotsRules, expires_at)
+        # base url -> Future of the fetch in flight; concurrent futures, as
+        # scrapes on different event loops share the cache
+        self._fetching = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    async def get_rules(self, base_url):
+        while True:
+            with self._lock:
+                cached = self._rules.get(base_url)
+                if cached and cached[1] > time.time():
+                    self.hits += 1
+                    return cached[0]
+                fetching = self._fetching.get(base_url)
+                if fetching is None:
+                    self.misses += 1
+                    fetching = self._fetching[base_url] = Future()
+                    break
+                self.hits += 1
+            # shielded: a cancelled waiter must not cancel the fetch for the others
+            rules = await asyncio.shield(asyncio.wrap_future(fetching))
+            if rules is not None:
+                return rules
+            # the fetch was cancelled; take over or wait for the next one
+
+        rules = None
+        try:
+            rules = await self._fetch(base_url)
+            return rules
+        finally:
+            with self._lock:
+                del self._fetching[base_url]
+            fetching.set_result(rules)
+
+    async def _fetch(self, base_url):
+        rules, ttl = RobotsRules(), self.ttl
+        try:
+            async with httpx.AsyncClient(follow_redirects=True) as client:
+                resp = await client.get(f"{base_url}/robots.txt", timeout=10)
+            if resp.status_code == 200:
+                rules = parse_robots_txt(resp.text, self.user_agent)
+        except Exception as e:
+            logging.warning(f"Couldn't fetch robots.txt: {e}")
+            ttl = self.error_ttl
+            with self._lock:
+                self.errors += 1
+        with self._lock:
+            self._rules[base_url] = (rules, time.time() + ttl)
+        return rules
+
+    async def is_allowed(self, url):
+        parts = urlsplit(url)
+        rules = await self.get_rules(f"{parts.scheme}://{parts.netloc}")
+        return rules.is_allowed(url)
+
+    def stats(self):
+        with self._lock:
+            return {"hosts": len(self._rules), "hits": self.hits, "misses": self.misses,
+                    "errors": self.errors}
+
+
+robots_cache = RobotsCache()
+
+
+async def is_allowed(url):
+    """Whether robots.txt lets our user agent fetch url (cached per host)."""
+    return await robots_cache.is_allowed(url)
+
+
+async def get_rules(base_url):
+    return await robots_cache.get_rules(base_url)
@@ -0,0 +1,322 @@
+"""
+Recurring crawl scheduler.
+
+Crawl definitions live in crawl_schedules.json:
+
+    {"schedules": [
+        {"id": "jared-rings", "url": "https://www.jared.com/...", "max_pages": 5,
+         "cadence": "daily", "window": {"start": "01:00", "end": "05:00"}}
+    ]}
+
+cadence is "hourly", "daily", "weekly" or a number of hours. Each schedule
+gets a stable slot inside its window (hashed from its id) so schedules that
+share a window do not all fire at once, and launches are further spaced by
+SCHEDULER_MIN_GAP_SECONDS. Due runs go through the scrape job pool, at most
+SCHEDULER_MAX_CONCURRENCY at a time, and only while check_monthly_limit()
+allows scraping.
+
+    python scheduler.py run          # run the scheduler in the foreground
+    python scheduler.py list         # show schedules and their next run
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import logging
+import argparse
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from database import insert_crawl_run
+from jobs import submit_job, DONE, FINISHED
+from limit_checker import check_monthly_limit
+from scraper_registry import load_registry, resolve
+from utils import LOG_DIR, log_event
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEDULES_FILE = os.getenv("SCHEDULES_FILE", os.path.join(BASE_DIR, "crawl_schedules.json"))
+STATE_FILE = os.path.join(LOG_DIR, "schedule_state.json")
+
+# Scheduled scrapes running at once, on top of whatever users start by hand
+SCHEDULER_MAX_CONCURRENCY = int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "2"))
+# Minimum spacing between two scheduled launches, to avoid proxy/DB bursts
+SCHEDULER_MIN_GAP_SECONDS = int(os.getenv("SCHEDULER_MIN_GAP_SECONDS", "120"))
+SCHEDULER_TICK_SECONDS = int(os.getenv("SCHEDULER_TICK_SECONDS", "30"))
+# Finished runs kept in memory for /schedules/runs
+MAX_RUN_HISTORY = 500
+
+CADENCE_HOURS = {"hourly": 1, "daily": 24, "weekly": 168}
+FULL_DAY = {"start": "00:00", "end": "23:59"}
+
+
+def _parse_hhmm(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+class CrawlSchedule:
+    """One recurring crawl definition."""
+
+    def __init__(self, id, url, max_pages=1, cadence="daily", window=None, enabled=True):
+        self.id = id
+        self.url = url.strip()
+        self.max_pages = int(max_pages)
+        self.cadence = cadence
+        self.window = window or dict(FULL_DAY)
+        self.enabled = enabled
+        self.interval = timedelta(hours=float(CADENCE_HOURS.get(cadence, cadence)))
+        self.window_start = _parse_hhmm(self.window["start"])
+        self.window_end = _parse_hhmm(self.window["end"])
+        if self.interval <= timedelta(0):
+            raise ValueError(f"Schedule {id}: cadence must be positive")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            id=data["id"],
+            url=data["url"],
+            max_pages=data.get("max_pages", data.get("maxPages", 1)),
+            cadence=data.get("cadence", "daily"),
+            window=data.get("window"),
+            enabled=data.get("enabled", True),
+        )
+
+    def to_dict(self):
+        return {"id": self.id, "url": self.url, "max_pages": self.max_pages,
+                "cadence": self.cadence, "window": self.window, "enabled": self.enabled}
+
+    def _window_minutes(self):
+        # windows may wrap midnight, e.g. 22:00-04:00
+        return (self.window_end - self.window_start) % (24 * 60) or 24 * 60
+
+    def in_window(self, moment):
+        minute = moment.hour * 60 + moment.minute
+        return (minute - self.window_start) % (24 * 60) < self._window_minutes()
+
+    def slot(self, day):
+        """This schedule's fixed launch time inside the window on the given day."""
+        offset = zlib.crc32(self.id.encode("utf-8")) % self._window_minutes()
+        midnight = datetime.combine(day, datetime.min.time())
+        return midnight + timedelta(minutes=self.window_start + offset)
+
+    def next_run(self, last_run, now):
+        """When this schedule is next due, given its last launch (or None)."""
+        if last_run is None:
+            window = timedelta(minutes=self._window_minutes())
+            for days in (-1, 0, 1):
+                slot = self.slot(now.date() + timedelta(days=days))
+                # due now if today's slot has passed but its window is still open
+                if slot >= now or (self.in_window(now) and now - slot < window):
+                    return slot
+        candidate = last_run + self.interval
+        if self.in_window(candidate):
+            return candidate
+        # outside the window: wait for the window's slot on or after that day
+        slot = self.slot(candidate.date())
+        return slot if slot >= candidate else self.slot(candidate.date() + timedelta(days=1))
+
+
+class CrawlScheduler:
+    """Launches due schedules as scrape jobs and records how each run went."""
+
+    def __init__(self, schedules_file=SCHEDULES_FILE, state_file=STATE_FILE,
+                 max_concurrency=SCHEDULER_MAX_CONCURRENCY, min_gap=SCHEDULER_MIN_GAP_SECONDS,
+                 tick=SCHEDULER_TICK_SECONDS):
+        self.schedules_file = schedules_file
+        self.state_file = state_file
+        self.max_concurrency = max_concurrency
+        self.min_gap = min_gap
+        self.tick = tick
+        self.runs = deque(maxlen=MAX_RUN_HISTORY)
+        self._running = {}   # schedule id -> ScrapeJob
+        self._last_launch = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.schedules = self._load_schedules()
+        self.state = self._load_state()
+
+    def _load_schedules(self):
+        if not os.path.exists(self.schedules_file):
+            return {}
+        with open(self.schedules_file, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return {s["id"]: CrawlSchedule.from_dict(s) for s in data.get("schedules", [])}
+
+    def _save_schedules(self):
+        tmp = self.schedules_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"schedules": [s.to_dict() for s in self.schedules.values()]}, f, indent=2)
+        os.replace(tmp, self.schedules_file)
+
+    def _load_state(self):
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def _save_state(self):
+        tmp = self.state_file + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def _last_run(self, schedule_id):
+        stamp = self.state.get(schedule_id, {}).get("last_run")
+        return datetime.fromisoformat(stamp) if stamp else None
+
+    def upsert(self, data):
+        schedule = CrawlSchedule.from_dict(data)
+        if resolve(schedule.url) is None:
+            raise ValueError(f"Unknown website: {schedule.url}")
+        with self._lock:
+            self.schedules[schedule.id] = schedule
+            self._save_schedules()
+        return schedule
+
+    def remove(self, schedule_id):
+        with self._lock:
+            if self.schedules.pop(schedule_id, None) is None:
+                return False
+            self.state.pop(schedule_id, None)
+            self._save_schedules()
+            self._save_state()
+        return True
+
+    def list(self, now=None):
+        now = now or datetime.now()
+        with self._lock:
+            return [{
+                **s.to_dict(),
+                "last_run": self.state.get(s.id, {}).get("last_run"),
+                "next_run": s.next_run(self._last_run(s.id), now).isoformat(timespec="minutes"),
+                "running": s.id in self._running,
+            } for s in self.schedules.values()]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="crawl-scheduler", daemon=True)
+        self._thread.start()
+        log_event(f"Crawl scheduler started with {len(self.schedules)} schedule(s)")
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logging.error(f"Crawl scheduler tick failed: {e}")
+            self._stop.wait(self.tick)
+
+    def run_pending(self, now=None):
+        """Record finished runs, then launch at most one due schedule."""
+        now = now or datetime.now()
+        with self._lock:
+            self._collect_finished()
+            if len(self._running) >= self.max_concurrency:
+                return None
+            if time.time() - self._last_launch < self.min_gap:
+                return None
+            due = [s for s in self.schedules.values()
+                   if s.enabled and s.id not in self._running
+                   and s.next_run(self._last_run(s.id), now) <= now]
+        if not due:
+            return None
+        if not check_monthly_limit():
+            logging.info("Monthly limit reached; scheduled crawls are paused")
+            return None
+
+        # the most overdue first, so one busy window cannot starve the others
+        schedule = min(due, key=lambda s: s.next_run(self._last_run(s.id), now))
+        scraper = resolve(schedule.url)
+        if scraper is None:
+            logging.error(f"Schedule {schedule.id}: unknown website {schedule.url}")
+            return None
+        job = submit_job(scraper, schedule.url, schedule.max_pages)
+        with self._lock:
+            self._running[schedule.id] = job
+            self._last_launch = time.time()
+            self.state.setdefault(schedule.id, {})["last_run"] = now.isoformat(timespec="seconds")
+            self._save_state()
+        log_event(f"Scheduled crawl {schedule.id} started as job {job.id}")
+        return job
+
+    def _collect_finished(self):
+        for schedule_id, job in list(self._running.items()):
+            if job.status not in FINISHED:
+                continue
+            del self._running[schedule_id]
+            run = {
+                "schedule_id": schedule_id,
+                "job_id": job.id,
+                "url": job.url,
+                "started_at": datetime.fromtimestamp(job.started_at or job.created_at),
+                "finished_at": datetime.fromtimestamp(job.finished_at),
+                "duration_seconds": round(job.finished_at - (job.started_at or job.created_at), 2),
+                "products": job.products_found or job.rows_inserted,
+                "status": job.status,
+                "error": job.error,
+            }
+            self.runs.append(run)
+            state = self.state.setdefault(schedule_id, {})
+            state["last_status"] = job.status
+            state["last_duration_seconds"] = run["duration_seconds"]
+            state["last_products"] = run["products"]
+            if job.status == DONE:
+                state["last_success"] = run["finished_at"].isoformat(timespec="seconds")
+            self._save_state()
+            insert_crawl_run(run)
+            log_event(f"Scheduled crawl {schedule_id} {job.status} in {run['duration_seconds']}s, "
+                      f"{run['products']} products")
+
+    def recent_runs(self, schedule_id=None):
+        with self._lock:
+            runs = [r for r in self.runs if schedule_id is None or r["schedule_id"] == schedule_id]
+        return [{**r, "started_at": r["started_at"].isoformat(timespec="seconds"),
+                 "finished_at": r["finished_at"].isoformat(timespec="seconds")}
+                for r in reversed(runs)]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Process-wide scheduler (not started; call .start() to run it)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = CrawlScheduler()
+    return _scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run recurring category crawls.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="launch due crawls until interrupted")
+    sub.add_parser("list", help="print schedules and their next run")
+    args = parser.parse_args()
+
+    load_registry()
+    scheduler = get_scheduler()
+    if args.command == "list":
+        print(json.dumps(scheduler.list(), indent=2))
+        return
+    scheduler.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import asynccontextmanager
+from playwright.async_api import async_playwright
+
+# Set SCRAPER_SHARED_LOOP=0 to go back to one asyncio.run() (and one
+# Playwright driver) per scrape.
+SHARED_LOOP_ENABLED = os.getenv("SCRAPER_SHARED_LOOP", "1") == "1"
+
+_loop = None
+_thread = None
+_start_lock = threading.Lock()
+
+# Playwright driver owned by the shared loop; only touched from that loop
+_playwright = None
+_playwright_cm = None
+_playwright_lock = None
+
+
+def get_loop():
+    """Return the long-lived scraper event loop, starting its thread on first use."""
+    global _loop, _thread
+    if _loop is not None:
+        return _loop
+    with _start_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            _thread = threading.Thread(target=_run, name="scraper-loop", daemon=True)
+            _thread.start()
+            ready.wait()
+            _loop = loop
+            logging.info("Scraper event loop started")
+    return _loop
+
+
+def _in_scraper_loop():
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+async def _run_in_context(coro, values):
+    # Tasks on the shared loop do not inherit the submitting thread's context,
+    # so carry context variables (e.g. the progress listener) across by hand.
+    for var, value in values:
+        var.set(value)
+    return await coro
+
+
+def submit(coro):
+    """Schedule a coroutine on the scraper loop; returns a concurrent.futures.Future."""
+    values = list(contextvars.copy_context().items())
+    return asyncio.run_coroutine_threadsafe(_run_in_context(coro, values), get_loop())
+
+
+def run_scraper(coro, timeout=None):
+    """Run a handler coroutine to completion from synchronous code and return its result."""
+    if not SHARED_LOOP_ENABLED:
+        return asyncio.run(coro)
+    return submit(coro).result(timeout)
+
+
+async def _get_playwright():
+    global _playwright, _playwright_cm, _playwright_lock
+    if _playwright_lock is None:
+        _playwright_lock = asyncio.Lock()
+    async with _playwright_lock:
+        if _playwright is None:
+            _playwright_cm = async_playwright()
+            _playwright = await _playwright_cm.start()
+            logging.info("Shared Playwright driver started")
+    return _playwright
+
+
+async def restart_playwright():
+    """Drop the shared driver (e.g. after it crashed); the next scrape starts a new one."""
+    global _playwright, _playwright_cm
+    if _playwright is not None:
+        try:
+            await _playwright.stop()
+        except Exception as e:
+            logging.warning(f"Error stopping Playwright driver: {e}")
+    _playwright = None
+    _playwright_cm = None
+
+
+@asynccontextmanager
+async def shared_playwright():
+    """
+    Drop-in replacement for `async with async_playwright() as p`.
+    On the shared scraper loop it yields the loop's long-lived driver, so no
+    Node process is spawned per scrape or per page; anywhere else (scripts,
+    asyncio.run) it falls back to a driver scoped to the block.
+    """
+    if not _in_scraper_loop():
+        async with async_playwright() as p:
+            yield p
+        return
+
+    p = await _get_playwright()
+    try:
+        yield p
+    except Exception as e:
+        # the driver process itself went away; start a fresh one next time
+        if "Connection closed" in str(e):
+            await restart_playwright()
+        raise
+
+
+def shutdown():
+    """Stop the shared driver and the loop thread."""
+    global _loop, _thread
+    if _loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(restart_playwright(), _loop).result(30)
+    except Exception as e:
+        logging.warning(f"Error during scraper loop shutdown: {e}")
+    _loop.call_soon_threadsafe(_loop.stop)
+    _thread.join(timeout=10)
+    _loop = None
+    _thread = None
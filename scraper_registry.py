@@ -0,0 +1,177 @@
+import os
+import re
+import ast
+import logging
+import importlib
+import threading
+from urllib.parse import urlparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRAPERS_DIR = os.path.join(BASE_DIR, "scrapers")
+
+# Settings every retailer gets unless its RETAILER block overrides them
+DEFAULT_SETTINGS = {
+    "concurrency": 1,        # max crawls of this retailer running at once
+    "pagination": "query",   # how the handler walks pages: query, path, click, scroll
+    "timeout": 180,          # navigation timeout in seconds
+    "resource_profile": "listing_images",  # requests aborted while loading: listing_images, listing, none
+    "rate_per_minute": 20,   # page navigations per minute across all crawls of this retailer
+    "burst": 1,              # navigations allowed back to back before the rate applies
+    "page_concurrency": 3,   # listing pages one crawl loads at once (handlers using paginator)
+    "fetch_mode": "auto",    # listing pages via http, browser, or auto (http, browser when needed)
+    "sitemap_products": None,  # regexes of product URLs to queue from the sitemaps (None: no discovery)
+    "sitemap_filter": None,  # regex child sitemaps must match to be read (None: all)
+}
+
+
+class ScraperEntry:
+    """A registered retailer: the domains it serves, its handler and its settings."""
+
+    def __init__(self, name, module_name, handler_name, domains, settings):
+        self.name = name
+        self.module_name = module_name
+        self.handler_name = handler_name
+        self.domains = domains
+        self.settings = settings
+        self.handler = None
+        self._lock = threading.Lock()
+
+    def load_handler(self):
+        """Import the scraper module on first use and return its handler coroutine function."""
+        if self.handler is None:
+            with self._lock:
+                if self.handler is None:
+                    module = importlib.import_module(f"scrapers.{self.module_name}")
+                    self.handler = getattr(module, self.handler_name)
+                    logging.info(f"Loaded scraper module scrapers.{self.module_name}")
+        return self.handler
+
+    def __repr__(self):
+        return f"<ScraperEntry {self.name} {self.domains}>"
+
+
+# host -> ScraperEntry, filled by load_registry()
+_by_host = {}
+_entries = {}
+
+
+def normalize_host(url_or_host):
+    """Return the bare lowercase host of a URL or host string (no port, no trailing dot)."""
+    value = (url_or_host or "").strip()
+    if "://" in value:
+        host = urlparse(value).hostname or ""
+    else:
+        host = value.split("/", 1)[0].split(":", 1)[0]
+    return host.lower().rstrip(".")
+
+
+def register(meta, module_name, handler=None):
+    """Register one retailer from the RETAILER metadata a scraper module declares."""
+    name = meta.get("name", module_name)
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update(meta.get("settings", {}))
+    domains = [normalize_host(d) for d in meta["domains"]]
+
+    entry = ScraperEntry(name, module_name, meta["handler"], domains, settings)
+    entry.handler = handler
+    for domain in domains:
+        existing = _by_host.get(domain)
+        if existing is not None and existing.module_name != module_name:
+            logging.warning(f"Domain {domain} already registered by {existing.module_name}, overriding with {module_name}")
+        _by_host[domain] = entry
+    _entries[name] = entry
+    return entry
+
+
+def _scraper_module_names():
+    return sorted(
+        f[:-3] for f in os.listdir(SCRAPERS_DIR)
+        if f.endswith(".py") and not f.startswith("_")
+    )
+
+
+_RETAILER_BLOCK = re.compile(r"^RETAILER\s*=\s*(\{.*?^\})", re.M | re.S)
+
+
+def read_retailer_meta(module_name):
+    """
+    Read a scraper module's RETAILER block straight from its source, without
+    importing it (importing pulls in playwright, openpyxl, PIL and database).
+    Only the block itself is parsed; the full module is parsed as a fallback.
+    """
+    path = os.path.join(SCRAPERS_DIR, f"{module_name}.py")
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    match = _RETAILER_BLOCK.search(source)
+    if match:
+        try:
+            return ast.literal_eval(match.group(1))
+        except (ValueError, SyntaxError):
+            pass
+    if "RETAILER" not in source:
+        return None
+    tree = ast.parse(source, filename=path)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "RETAILER" for target in node.targets
+        ):
+            return ast.literal_eval(node.value)
+    return None
+
+
+def load_registry(lazy=None):
+    """
+    Register every scrapers/*.py module that declares RETAILER.
+    In lazy mode (the default) modules are only imported when their domain is
+    first requested; set SCRAPER_EAGER_IMPORT=1 or pass lazy=False to import
+    them all up front.
+    """
+    if lazy is None:
+        lazy = os.getenv("SCRAPER_EAGER_IMPORT", "0") != "1"
+    _by_host.clear()
+    _entries.clear()
+    for module_name in _scraper_module_names():
+        if lazy:
+            meta = read_retailer_meta(module_name)
+            handler = None
+        else:
+            module = importlib.import_module(f"scrapers.{module_name}")
+            meta = getattr(module, "RETAILER", None)
+            handler = getattr(module, meta["handler"]) if meta else None
+        if not meta:
+            continue
+        register(meta, module_name, handler)
+    logging.info(f"Scraper registry loaded ({'lazy' if lazy else 'eager'}): "
+                 f"{len(_entries)} retailers, {len(_by_host)} domains")
+    return _entries
+
+
+def resolve(url):
+    """
+    Find the scraper for a URL.
+    Tries the exact host first, then each parent domain (so 'www.bash.com'
+    resolves to the 'bash.com' entry). Cost is bounded by the number of labels
+    in the host, not by the number of registered retailers.
+    """
+    host = normalize_host(url)
+    while host:
+        entry = _by_host.get(host)
+        if entry is not None:
+            return entry
+        if "." not in host:
+            break
+        host = host.split(".", 1)[1]
+        if "." not in host:
+            # never match on a bare TLD such as 'com' or 'au'
+            break
+    return None
+
+
+def get_settings(url):
+    """Per-retailer settings for a URL, or the defaults for unknown hosts."""
+    entry = resolve(url)
+    return entry.settings if entry else dict(DEFAULT_SETTINGS)
+
+
+def all_entries():
+    return list(_entries.values())
@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -13,9 +10,15 @@ from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
+from infinite_scroll import scroll_until_loaded, item_count, wait_for_more_items
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 
 
@@ -48,7 +51,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -61,28 +64,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector("div.qd-manwhmain", state="attached", timeout=30000)
             print("[Success] Product listing loaded.")
@@ -90,11 +77,26 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
+
+async def get_browser_with_proxy_strategy(p, url: str):
+    """Open a proxied page on url via the shared proxy strategy."""
+    async def goto(page, url, isbri_data):
+        await safe_goto_and_wait(page, url)
+
+    return await open_proxied_browser(p, url, goto,
+                                      before_goto=lambda page: page.set_default_timeout(1200000))
+
 # Main scraper function
+RETAILER = {
+    "domains": ["ajaffe.com"],
+    "handler": "handle_ajaffe",
+}
+
+
 async def handle_ajaffe(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -119,34 +121,30 @@ async def handle_ajaffe(url, max_pages=None):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                context = await browser.new_context()
-                page = await context.new_page()
-                page.set_default_timeout(1200000)
-
-                await safe_goto_and_wait(page, url)
+            async with shared_playwright() as p:
+                browser, page = await get_browser_with_proxy_strategy(p, url)
                 log_event(f"Successfully loaded: {url}")
                 if load_more_clicks > 1:
                     for click_num in range(1, load_more_clicks):
                         try:
-                            await scroll_to_bottom(page)
+                            await scroll_until_loaded(page, max_scrolls=50)
                             load_more_button = await page.wait_for_selector(
                                 "a.loadmore",
                                 timeout=10000
                             )
+                            shown = await item_count(page, "div.col-lg-4.col-md-4")
                             await load_more_button.click()
                             log_event(f"Clicked 'Load more' link ({click_num}/{load_more_clicks - 1})")
                             print(f"Clicked 'Load more' link ({click_num}/{load_more_clicks - 1})")
-                            await page.wait_for_load_state("networkidle")
-                            await asyncio.sleep(random.uniform(1, 3))  # Random delay
+                            if not await wait_for_more_items(page, "div.col-lg-4.col-md-4", shown):
+                                break
                         except Exception as e:
                             log_event(f"Error clicking 'Load more' link (attempt {click_num}): {str(e)}")
                             break  # Stop if we can't click the link anymore
 
 
                 # Scroll to load all items
-                await scroll_to_bottom(page)
+                await scroll_until_loaded(page, max_scrolls=50)
                 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -162,6 +160,7 @@ async def handle_ajaffe(url, max_pages=None):
                     break
 
                 logging.info(f"New products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 print(f"New products found: {len(products)}")
                 records = []
                 image_tasks = []
@@ -246,6 +245,7 @@ async def handle_ajaffe(url, max_pages=None):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
                 load_more_clicks += 1
                 all_records.extend(records)
                 wb.save(file_path)
@@ -261,19 +261,16 @@ async def handle_ajaffe(url, max_pages=None):
 
      # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
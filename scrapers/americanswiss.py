@@ -1,13 +1,15 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
+from infinite_scroll import scroll_until_loaded
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
@@ -16,14 +18,14 @@ from urllib.parse import urljoin
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
 import httpx
 # Load environment variables from .env file
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
 
@@ -75,7 +77,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -88,38 +90,13 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
 
-
-async def scroll_page(page):
-    """Scroll down to load lazy-loaded products."""
-    prev_product_count = 0
-    for _ in range(50):  # Adjust scroll attempts as needed
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(2)  # Wait for lazy-loaded content to render
-
-        # Wait for at least one product card to appear (if not already)
-        await page.wait_for_selector('[data-testid="card"]', timeout=15000)
-
-        # Count current number of product cards
-        current_product_count = await page.locator('[data-testid="card"]').count()
-
-        if current_product_count == prev_product_count:
-            break  # Stop if no new products were loaded
-        prev_product_count = current_product_count
-        
-        
 ########################################  safe_goto_and_wait ####################################################################
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -137,7 +114,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -145,7 +122,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -155,123 +132,8 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
       
 
 async def get_browser_with_proxy_strategy(p, url: str):
-    
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
-
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
-
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
-
-
-
-
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
-    except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
-
-
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
-    
-            
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait)
 
 
 async def handle_americanswiss(start_url, max_pages):
@@ -310,13 +172,13 @@ async def handle_americanswiss(start_url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
             
                 
                 browser, page = await get_browser_with_proxy_strategy(p, current_url)
                 log_event(f"Successfully loaded: {current_url}")
 
-                await scroll_page(page)
+                await scroll_until_loaded(page, '[data-testid="card"]', max_scrolls=50)
 
                 page_title = await page.title()
                 product_container = await page.query_selector("#product-cards")
@@ -478,6 +340,7 @@ async def handle_americanswiss(start_url, max_pages):
 
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
 
@@ -501,25 +364,19 @@ async def handle_americanswiss(start_url, max_pages):
                 await page.close()
             if browser:
                 await browser.close()
-            
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
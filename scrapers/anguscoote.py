@@ -1,19 +1,21 @@
 import os
 import re
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 import httpx
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
+from infinite_scroll import scroll_until_loaded
 # Load environment variables from .env file
 
 
@@ -46,7 +48,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -59,24 +61,17 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-async def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    await asyncio.sleep(random.uniform(min_sec, max_sec))
-
-async def scroll_and_wait(page):
-    """Scroll down to load lazy-loaded products."""
-    previous_height = await page.evaluate("document.body.scrollHeight")
-    await page.evaluate("window.scrollBy(0, document.body.scrollHeight);")
-    await asyncio.sleep(2)  # Allow time for content to load
-    new_height = await page.evaluate("document.body.scrollHeight")
-    return new_height > previous_height  # Returns True if more content is loaded
-    
-
 def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     separator = '&' if '?' in base_url else '?'
     return f"{base_url}{separator}p={page_count}"      
 
 
+RETAILER = {
+    "domains": ["www.anguscoote.com.au"],
+    "handler": "handle_anguscoote",
+}
+
+
 async def handle_anguscoote(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -112,21 +107,19 @@ async def handle_anguscoote(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = "div.ps-category-items"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url,product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load content
-                scroll_attempts = 0
-                while scroll_attempts < 3 and await scroll_and_wait(page):
-                    scroll_attempts += 1
-                    await random_delay(1, 2)
+                await scroll_until_loaded(page, "div.ps-category-item", max_scrolls=3)
 
                 # Process products on current page
                 product_wrapper = await page.query_selector("div.ps-category-items")
                 products = await product_wrapper.query_selector_all("div.ps-category-item") if product_wrapper else []
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -239,6 +232,7 @@ async def handle_anguscoote(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -258,26 +252,20 @@ async def handle_anguscoote(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
@@ -3,8 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
 import time
 from datetime import datetime
 from io import BytesIO
@@ -13,9 +11,13 @@ from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 
@@ -69,7 +71,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         filename = f"{safe_product_name}_{unique_id}.{extension}"
         filepath = os.path.join(image_folder, filename)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with tracked_client(timeout=30.0) as client:
             response = await client.get(clean_url)
             response.raise_for_status()
             
@@ -89,6 +91,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         return "N/A"
 
 # Main scraper function
+RETAILER = {
+    "domains": ["www.anitako.com"],
+    "handler": "handle_anitako",
+}
+
+
 async def handle_anitako(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -120,20 +128,13 @@ async def handle_anitako(url, max_pages):
             else:
                 current_url = f"{url}?page={page_count}"
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = ".collection-grid__wrapper"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url,product_wrapper )
                 log_event(f"Successfully loaded: {current_url}")
             
                 # Scroll to load all items
-                prev_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    count = await page.locator('div#CollectionSection').count()
-                    if count == prev_count:
-                        break
-                    prev_count = count
+                await scroll_until_loaded(page, 'div#CollectionSection')
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -142,6 +143,7 @@ async def handle_anitako(url, max_pages):
                 product_wrapper = await page.query_selector("div#CollectionSection")
                 products = await product_wrapper.query_selector_all("div.grid__item") if product_wrapper else []
                 logging.info(f"Total products scraped:{page_count} :{len(products)}")
+                report_progress("products_extracted", count=len(products))
                 records = []
                 image_tasks = []
 
@@ -280,6 +282,7 @@ async def handle_anitako(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 wb.save(file_path)
@@ -290,25 +293,21 @@ async def handle_anitako(url, max_pages):
         finally:
             if page: await page.close()
             if browser: await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
 
         page_count += 1
 
      # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
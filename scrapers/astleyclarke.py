@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +11,13 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 # Load environment
@@ -63,7 +64,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -76,15 +77,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector(".products", state="attached", timeout=30000)
             print("[Success] Product cards loaded.")
@@ -92,11 +90,17 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
 # Main scraper function
+RETAILER = {
+    "domains": ["www.astleyclarke.com"],
+    "handler": "handle_astleyclarke",
+}
+
+
 async def handle_astleyclarke(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -125,7 +129,7 @@ async def handle_astleyclarke(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, "ol.products.list.items.product-items")
                 log_event(f"Successfully loaded: {current_url}")
                 
@@ -136,6 +140,7 @@ async def handle_astleyclarke(url, max_pages):
                 product_wrapper = await page.query_selector("ol.products.list.items.product-items")
                 products = await product_wrapper.query_selector_all("li.item.product.product-item") if product_wrapper else []
                 logging.info(f"Total products scraped:{page_count} :{len(products)}")
+                report_progress("products_extracted", count=len(products))
                 records = []
                 image_tasks = []
                 print(f"Total products scraped: {len(products)}")
@@ -263,6 +268,7 @@ async def handle_astleyclarke(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)    
                 wb.save(file_path)
@@ -273,14 +279,11 @@ async def handle_astleyclarke(url, max_pages):
         finally:
             if page: await page.close()
             if browser: await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
 
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
@@ -2,18 +2,20 @@ import os
 import re
 import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 from openpyxl.drawing.image import Image as XLImage
@@ -44,7 +46,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -57,6 +59,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.beaverbrooks.co.uk"],
+    "handler": "handle_beaverbrooks",
+}
+
+
 async def handle_beaverbrooks(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -90,23 +98,17 @@ async def handle_beaverbrooks(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = ".products--xdQkZ"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    current_product_count = await page.locator('.product--AbtlR').count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, '.product--AbtlR')
 
                 product_wrapper = await page.query_selector("div.products--xdQkZ")
                 products = await product_wrapper.query_selector_all("div.product--AbtlR") if product_wrapper else []
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -264,6 +266,7 @@ async def handle_beaverbrooks(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -278,23 +281,19 @@ async def handle_beaverbrooks(url, max_pages):
                 await page.close()
             if browser:
                 await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
         page_count += 1
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -3,16 +3,17 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 from proxysetup import get_browser_with_proxy_strategy
 # Load .env variables
 load_dotenv()
@@ -42,6 +43,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.benbridge.com"],
+    "handler": "handle_benbridge",
+}
+
+
 async def handle_benbridge(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -71,7 +78,7 @@ async def handle_benbridge(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 # Create a new browser instance for each page
                 
                 product_wrapper = '.col-sm-12.col-lg-9'
@@ -182,12 +189,13 @@ async def handle_benbridge(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8], record[9])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
 
         if not all_products:
-            return None, None, None
+            return None, None
         # Save Excel
         filename = f'handle_benbridge_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
@@ -201,7 +209,5 @@ async def handle_benbridge(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
@@ -2,20 +2,23 @@ import os
 import re
 import uuid
 import logging
-import random
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
+from infinite_scroll import scroll_until_loaded
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db, create_table
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 from urllib.parse import urlparse, urlunparse
 
 load_dotenv()
@@ -53,7 +56,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -67,35 +70,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-async def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    await asyncio.sleep(random.uniform(min_sec, max_sec))
-
-async def scroll_and_wait(page, max_attempts=10, wait_time=1):
-    """Scroll down and wait for new content to load dynamically."""
-    last_height = await page.evaluate("document.body.scrollHeight")
-
-    for attempt in range(max_attempts):
-        logging.info(f"Scroll attempt {attempt + 1}/{max_attempts}")
-        
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-
-        try:
-            await page.wait_for_selector(".product-item", state="attached", timeout=3000)
-        except:
-            logging.info("No new content detected.")
-        
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            logging.info("No more new content. Stopping scroll.")
-            break
-        
-        last_height = new_height
-        await asyncio.sleep(wait_time)
-
-    logging.info("Finished scrolling.")
-    return True
-
 ########################################  safe_goto_and_wait ####################################################################
 
 
@@ -103,6 +77,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -120,7 +95,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -128,7 +103,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -138,120 +113,8 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
       
 
 async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
-
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
-
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
-
-
-
-
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
-    except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
-
-
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait)
 
 
 def build_url_with_loadmore(base_url: str, page_count: int) -> str:
@@ -270,6 +133,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
 
 
 
+RETAILER = {
+    "domains": ["www.bevilles.com.au"],
+    "handler": "handle_bevilles",
+}
+
+
 async def handle_bevilles(url, max_pages):
     """Async version of Bevilles scraper"""
     ip_address = get_public_ip()
@@ -308,15 +177,16 @@ async def handle_bevilles(url, max_pages):
 
         logging.info(f"Navigating to {current_url}")
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 browser, page = await get_browser_with_proxy_strategy(p, current_url)
                 log_event(f"Successfully loaded: {current_url}")
 
-                await scroll_and_wait(page, max_attempts=8)
+                await scroll_until_loaded(page, ".product-item", max_scrolls=8)
 
                 page_title = await page.title()
                 products = await page.query_selector_all(".ss__result")
                 logging.info(f"Total products scraped on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 products = products[prev_prod_count:]
                 records = []
                 image_tasks = []
@@ -486,6 +356,7 @@ async def handle_bevilles(url, max_pages):
 
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
 
@@ -505,19 +376,14 @@ async def handle_bevilles(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-
     if not all_records:
-        return None, None, None
+        return None, None
     # Final save and database operations
     wb.save(file_path)
     logging.info(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
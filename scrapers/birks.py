@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -13,9 +10,14 @@ from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 import urllib
@@ -60,7 +62,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         "Referer": "https://www.birks.com/",
     }
 
-    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
+    async with tracked_client(timeout=10.0, headers=headers) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -92,28 +94,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
 #     logging.error(f"Failed to download {product_name} after {retries} attempts.")
 #     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector(".product-grid", state="attached", timeout=30000)
             print("[Success] Product listing loaded.")
@@ -121,11 +107,17 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
 # Main scraper function
+RETAILER = {
+    "domains": ["www.birks.com"],
+    "handler": "handle_birks",
+}
+
+
 async def handle_birks(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -150,13 +142,13 @@ async def handle_birks(url, max_pages=None):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.product-grid'
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
                 log_event(f"Successfully loaded: {url}")
 
                 # Scroll to load all items
-                await scroll_to_bottom(page)
+                await scroll_until_loaded(page, max_scrolls=50)
                 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -174,6 +166,7 @@ async def handle_birks(url, max_pages=None):
                     break
 
                 logging.info(f"New products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 print(f"New products found: {len(products)}")
                 records = []
                 image_tasks = []
@@ -268,6 +261,7 @@ async def handle_birks(url, max_pages=None):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
                 load_more_clicks += 1
                 all_records.extend(records)
                 wb.save(file_path)
@@ -280,14 +274,12 @@ async def handle_birks(url, max_pages=None):
             if browser: await browser.close()
 
     if not all_records:
-        return None, None, None    # Final save and database operations
+        return None, None    # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +11,15 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 
 # Load environment
@@ -56,7 +59,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -69,15 +72,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector("ul.product-grid", state="attached", timeout=30000)
             print("[Success] Product cards loaded.")
@@ -85,10 +85,19 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
+
+async def get_browser_with_proxy_strategy(p, url: str):
+    """Open a proxied page on url via the shared proxy strategy."""
+    async def goto(page, url, isbri_data):
+        await safe_goto_and_wait(page, url)
+
+    return await open_proxied_browser(p, url, goto,
+                                      before_goto=lambda page: page.set_default_timeout(120000))
+
 # Main scraper function
 async def handle_bonnie(url, max_pages):
     ip_address = get_public_ip()
@@ -114,28 +123,15 @@ async def handle_bonnie(url, max_pages):
     while current_url and (page_count <= max_pages):
         logging.info(f"Processing page {page_count}: {current_url}")
         browser = None
-        context = None
         if page_count > 1:
             current_url = f"{url}?page={page_count}"
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                context = await browser.new_context()
-                page = await context.new_page()
-                page.set_default_timeout(120000)
-
-                await safe_goto_and_wait(page, current_url)
+            async with shared_playwright() as p:
+                browser, page = await get_browser_with_proxy_strategy(p, current_url)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all items
-                prev_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    count = await page.locator('ul.product-grid').count()
-                    if count == prev_count:
-                        break
-                    prev_count = count
+                await scroll_until_loaded(page, 'ul.product-grid')
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -144,6 +140,7 @@ async def handle_bonnie(url, max_pages):
                 product_wrapper = await page.query_selector("ul.product-grid")
                 products = await product_wrapper.query_selector_all("li.grid__item") if product_wrapper else []
                 logging.info(f"Total products scraped:{page_count} :{len(products)}")
+                report_progress("products_extracted", count=len(products))
                 records = []
                 image_tasks = []
                 print(f"Total products on page {page_count}: {len(products)}")
@@ -201,6 +198,7 @@ async def handle_bonnie(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 wb.save(file_path)
@@ -211,16 +209,13 @@ async def handle_bonnie(url, max_pages):
         finally:
             if page: await page.close()
             if browser: await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
 
         page_count += 1
 
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
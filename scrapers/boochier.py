@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +11,13 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 import re
@@ -51,7 +52,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.png"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -64,28 +65,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector(".col-lg-12", state="attached", timeout=30000)
             print("[Success] Product listing loaded.")
@@ -93,7 +78,7 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
@@ -105,6 +90,12 @@ def build_url_with_loadmore(base_url: str, load_more_clicks: int) -> str:
     return f"{base_url}{separator}page={load_more_clicks}"   
 
 
+RETAILER = {
+    "domains": ["boochier.com"],
+    "handler": "handle_boochier",
+}
+
+
 async def handle_boochier(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -130,7 +121,7 @@ async def handle_boochier(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.col-lg-12'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
@@ -154,6 +145,7 @@ async def handle_boochier(url, max_pages):
                     break
 
                 logging.info(f"New products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 print(f"New products found: {len(products)}")
                 records = []
                 image_tasks = []
@@ -288,6 +280,7 @@ async def handle_boochier(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
                 
                 all_records.extend(records)
                 wb.save(file_path)
@@ -300,14 +293,12 @@ async def handle_boochier(url, max_pages):
             if browser: await browser.close()
 
     if not all_records:
-        return None, None, None    # Final save and database operations
+        return None, None    # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -1,13 +1,13 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from flask import Flask
@@ -16,6 +16,7 @@ from proxysetup import get_browser_with_proxy_strategy
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import aiohttp
 from io import BytesIO
@@ -69,7 +70,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)  # High-res version
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 # Try high-res version first
@@ -100,10 +101,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     return "N/A"
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 async def scroll_and_wait(page):
     """Scroll down to load lazy-loaded products."""
     previous_height = await page.evaluate("document.body.scrollHeight")
@@ -113,6 +110,12 @@ async def scroll_and_wait(page):
 
 
 
+RETAILER = {
+    "domains": ["www.boodles.com"],
+    "handler": "handle_boodles",
+}
+
+
 async def handle_boodles(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -145,26 +148,20 @@ async def handle_boodles(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 
                 product_wrapper="#product-grid"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url ,product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    current_product_count = await page.locator('div[data-collection-item]').count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, 'div[data-collection-item]')
 
                 product_wrapper = await page.wait_for_selector("div#product-grid", timeout=5000)
                 products = await product_wrapper.query_selector_all("div[data-collection-item]") if product_wrapper else []
 
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -304,6 +301,7 @@ async def handle_boodles(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -321,25 +319,20 @@ async def handle_boodles(url, max_pages):
             if browser:
                 await browser.close()
             
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
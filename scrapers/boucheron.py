@@ -1,13 +1,13 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
@@ -16,6 +16,7 @@ from collections import OrderedDict
 from utils import get_public_ip, log_event
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
@@ -65,7 +66,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.webp"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(
+    async with tracked_client(
         timeout=10.0,
         follow_redirects=True,
         headers={
@@ -117,11 +118,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         return "N/A"
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
-
 def build_url_with_loadmore(base_url: str, page_number: int) -> str:
     parsed_url = urlparse(base_url)
     existing_params = OrderedDict(parse_qsl(parsed_url.query))
@@ -138,6 +134,12 @@ def build_url_with_loadmore(base_url: str, page_number: int) -> str:
     return new_url
             
 
+RETAILER = {
+    "domains": ["www.boucheron.com"],
+    "handler": "handle_boucheron",
+}
+
+
 async def handle_boucheron(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -170,25 +172,19 @@ async def handle_boucheron(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 
                 product_wrapper=".products.wrapper"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url ,product_wrapper)
 
                 # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))  # Random delay between scrolls
-                    current_product_count = await page.locator('.product-item').count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, '.product-item')
 
 
                 product_wrapper = await page.query_selector('#productSection')
                 products = await product_wrapper.query_selector_all('.product-item') 
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
 
                 page_title = await page.title()
@@ -267,6 +263,7 @@ async def handle_boucheron(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -286,9 +283,6 @@ async def handle_boucheron(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
 
@@ -296,10 +290,8 @@ async def handle_boucheron(url, max_pages):
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
@@ -3,18 +3,19 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
 from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 
@@ -58,7 +59,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(
+    async with tracked_client(
         timeout=10.0,
         follow_redirects=True,
         headers={
@@ -100,26 +101,17 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         logging.error(f"Failed to download {product_name} after {retries} attempts")
         return "N/A"
     
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 # Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
 
 
             
 # Main scraper function
+RETAILER = {
+    "domains": ["www.brilliantearth.com"],
+    "handler": "handle_brilliantearth",
+}
+
+
 async def handle_brilliantearth(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -145,13 +137,13 @@ async def handle_brilliantearth(url, max_pages=None):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.listing-grid'
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
                 log_event(f"Successfully loaded: {url}")
 
                 # Scroll to load all items
-                await scroll_to_bottom(page)
+                await scroll_until_loaded(page, max_scrolls=50)
                 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -171,6 +163,7 @@ async def handle_brilliantearth(url, max_pages=None):
                     break
 
                 logging.info(f"New products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 print(f"New products found: {len(products)}")
                 records = []
                 image_tasks = []
@@ -283,6 +276,7 @@ async def handle_brilliantearth(url, max_pages=None):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
                 load_more_clicks += 1
                 all_records.extend(records)
                 wb.save(file_path)
@@ -295,15 +289,13 @@ async def handle_brilliantearth(url, max_pages=None):
             if browser: await browser.close()
 
     if not all_records:
-        return None, None, None    # Final save and database operations
+        return None, None    # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
 
@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,11 @@ from proxysetup import get_browser_with_proxy_strategy
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 
 # Load .env variables
 load_dotenv()
@@ -53,6 +54,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.buccellati.com"],
+    "handler": "handle_buccellati",
+}
+
+
 async def handle_buccellati(url, max_pages):
     
     ip_address = get_public_ip()
@@ -79,7 +86,7 @@ async def handle_buccellati(url, max_pages):
     image_tasks = []
 
     async with httpx.AsyncClient() as session:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             product_wrapper = 'li.item.product.product-item'
             browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
             
@@ -209,6 +216,7 @@ async def handle_buccellati(url, max_pages):
                                     break
                         except Exception as e:
                             logging.error(f"Error inserting image: {str(e)}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
             except Exception as e:
                 logging.error(f"Critical error: {str(e)}")
@@ -225,7 +233,5 @@ async def handle_buccellati(url, max_pages):
             insert_into_db(records)
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
\ No newline at end of file
+        return filename, file_path
\ No newline at end of file
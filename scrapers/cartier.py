@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -13,9 +10,12 @@ from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
@@ -54,7 +54,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         "Referer": "https://www.cartier.com/",  # Important to simulate a browser visit
     }
 
-    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
+    async with tracked_client(timeout=10.0, headers=headers) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -67,23 +67,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     """
     Builds paginated URL while preserving existing parameters
@@ -117,6 +100,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     ))     
 
 # Main scraper function
+RETAILER = {
+    "domains": ["www.cartier.com"],
+    "handler": "handle_cartier",
+}
+
+
 async def handle_cartier(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -145,13 +134,13 @@ async def handle_cartier(url, max_pages=None):
         #     url = f"{url}?page={load_more_clicks}"
         current_url = build_url_with_loadmore(url, page_count)
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.product-grid'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all items
-                await scroll_to_bottom(page)
+                await scroll_until_loaded(page, max_scrolls=50)
                 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -163,6 +152,7 @@ async def handle_cartier(url, max_pages=None):
                 products = products[prev_prod_cout:] 
                 prev_prod_cout += len(products)
                 logging.info(f"New products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 print(f"New products found: {len(products)}")
                 records = []
                 image_tasks = []
@@ -267,6 +257,7 @@ async def handle_cartier(url, max_pages=None):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
                 load_more_clicks += 1
                 page_count += 1
                 all_records.extend(records)
@@ -283,19 +274,16 @@ async def handle_cartier(url, max_pages=None):
     page_count += 1        
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
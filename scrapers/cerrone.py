@@ -3,9 +3,7 @@ import re
 import os
 import uuid
 import logging
-import base64
 import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +12,14 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 import json
@@ -50,7 +53,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -79,15 +82,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
                 return "N/A"
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector(".products", state="attached", timeout=30000)
             print("[Success] Product cards loaded.")
@@ -95,7 +95,7 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
@@ -115,6 +115,12 @@ def get_next_page_url(current_url, next_page_number):
     return new_url
 
 # Main scraper function
+RETAILER = {
+    "domains": ["cerrone.com.au"],
+    "handler": "handle_cerrone",
+}
+
+
 async def handle_cerrone(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -146,21 +152,14 @@ async def handle_cerrone(url, max_pages):
             else:
                 current_url = f"{url}/page/{page_count}/"
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 
                 product_wrapper = ".product-grid-container"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url,product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all items
-                prev_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    count = await page.locator('.products').count()
-                    if count == prev_count:
-                        break
-                    prev_count = count
+                await scroll_until_loaded(page, '.products')
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -169,6 +168,7 @@ async def handle_cerrone(url, max_pages):
                 product_wrapper = await page.query_selector("ul#product-grid")
                 products = await product_wrapper.query_selector_all("li.grid__item") if product_wrapper else []
                 logging.info(f"Total products scraped:{page_count} :{len(products)}")
+                report_progress("products_extracted", count=len(products))
                 records = []
                 image_tasks = []
                 
@@ -288,6 +288,7 @@ async def handle_cerrone(url, max_pages):
                                 logging.error(f"Error embedding image: {e}")
                     except asyncio.TimeoutError:
                         logging.warning(f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 wb.save(file_path)
@@ -298,25 +299,21 @@ async def handle_cerrone(url, max_pages):
         finally:
             if page: await page.close()
             if browser: await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
 
         page_count += 1
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
 
@@ -1,13 +1,15 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
+from proxy_monitor import OXYLABS
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
@@ -17,10 +19,10 @@ from openpyxl.drawing.image import Image as ExcelImage  # For Excel image insert
 import aiofiles
 from utils import get_public_ip, log_event
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from dotenv import load_dotenv
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 import httpx
 from urllib.parse import urlparse
 from PIL import Image
@@ -130,7 +132,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         "Accept": "image/webp,image/apng,image/*,*/*;q=0.8"
     }
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(15.0, connect=30.0)) as client:
+    async with tracked_client(timeout=httpx.Timeout(15.0, connect=30.0)) as client:
         for attempt in range(1, retries + 1):
             try:
                 response = await client.get(image_url, headers=headers, follow_redirects=True)
@@ -185,10 +187,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
 
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 ########################################  safe_goto_and_wait ####################################################################
 
 
@@ -196,6 +194,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -213,7 +212,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -221,7 +220,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -233,98 +232,23 @@ async def get_browser_with_proxy_strategy(p, url: str):
     """
     Always use Oxylabs proxy (ignore robots.txt)
     """
-    parsed_url = httpx.URL(url)
-    # Oxylabs proxy config (replace with your actual Oxylabs proxy details)
-    proxy_config = {
-        "server": PROXY_SERVER,
-        "username": PROXY_USERNAME,
-        "password": PROXY_PASSWORD
-    }
-
-    try:
-        logging.info("Using Oxylabs proxy for all requests")
-
-        browser = await p.chromium.launch(
-            proxy=proxy_config,
-            headless=True,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-web-security',
-                '--no-sandbox',
-                '--disable-dev-shm-usage',
-                '--disable-http2',  # ✅ attempt to avoid HTTP2 protocol errors
-                '--ignore-certificate-errors',  # ✅ if SSL issues are involved
-                '--disable-features=IsolateOrigins,site-per-process',
-                '--log-level=0',  # ✅ lower level logging to debug more
-            ]
-        )
-
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800},
-            locale="en-US",
-        )
-
-        # Stealth: Hide navigator.webdriver
-        await context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
-
-        page = await context.new_page()
-
-        await safe_goto_and_wait(page, url, isbri_data=False)
-        return browser, page
-
-    except Exception as e:
-        error_trace = traceback.format_exc()
-        logging.error(f"Failed to launch browser with Oxylabs proxy:\n{error_trace}")
-        raise RuntimeError(f"Oxylabs proxy failed for {url}: {e}")
-
-
-
-
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
-    except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
-
-
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
+    return await open_proxied_browser(
+        p, url, safe_goto_and_wait, proxies=[OXYLABS],
+        launch_args=[
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-http2',  # ✅ attempt to avoid HTTP2 protocol errors
+            '--ignore-certificate-errors',  # ✅ if SSL issues are involved
+            '--disable-features=IsolateOrigins,site-per-process',
+            '--log-level=0',  # ✅ lower level logging to debug more
+        ],
+        context_options={
+            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+            "viewport": {"width": 1280, "height": 800},
+            "locale": "en-US",
+        },
+    )
 
 
 def build_url_with_loadmore(base_url: str, page_count: int) -> str:
@@ -347,6 +271,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
 
 
 
+RETAILER = {
+    "domains": ["www.chanel.com"],
+    "handler": "handle_chanel",
+}
+
+
 async def handle_chanel(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -381,7 +311,7 @@ async def handle_chanel(url, max_pages):
         page = None
         
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.pdp-grid__main'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url)
                 log_event(f"Successfully loaded: {current_url}")
@@ -399,6 +329,7 @@ async def handle_chanel(url, max_pages):
 
                 products = await page.query_selector_all(".product-grid__item.js-product-edito")
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -519,6 +450,7 @@ async def handle_chanel(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -538,28 +470,22 @@ async def handle_chanel(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
 
     # Final save and database operations
   
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -1,19 +1,20 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
@@ -77,7 +78,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     parsed_url = urlparse(image_url)
     clean_url = urlunparse(parsed_url._replace(query=""))
 
-    async with httpx.AsyncClient(timeout=10.0, headers=headers, follow_redirects=True) as client:
+    async with tracked_client(timeout=10.0, headers=headers, follow_redirects=True) as client:
         for attempt in range(retries):
             try:
                 # Try high-res URL first (original URL)
@@ -111,16 +112,18 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
             return "N/A"
         
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 
             
 def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     separator = '&' if '?' in base_url else '?'
     return f"{base_url}{separator}p={page_count}"   
 
+RETAILER = {
+    "domains": ["www.chaumet.com"],
+    "handler": "handle_chaumet",
+}
+
+
 async def handle_chaumet(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -153,26 +156,20 @@ async def handle_chaumet(url, max_pages):
         page = None
         try:
             
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.products.wrapper.grid.products-grid'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))  # Random delay between scrolls
-                    current_product_count = await page.locator('li.item').count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, 'li.item')
 
 
                 product_container = await page.query_selector('ol.products.items.product-items.row')
                 products = await product_container.query_selector_all('li.item') if product_container else []
 
                 logging.info(f"Total products loaded: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
 
                 page_title = await page.title()
@@ -293,6 +290,7 @@ async def handle_chaumet(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -312,21 +310,16 @@ async def handle_chaumet(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
     # Final save and database operations
     if not all_records:
-        return None, None, None    # Final save and database operations
+        return None, None    # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
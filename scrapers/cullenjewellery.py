@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,10 +10,15 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
+from structured_data import structured_products
+from api_capture import tile_fields
 from proxysetup import get_browser_with_proxy_strategy
+from infinite_scroll import scroll_until_loaded, item_count, wait_for_more_items
 
 # Load .env variables
 # load_dotenv()
@@ -75,6 +79,74 @@ def modify_image_url(image_url):
     return modified_url
 
 
+async def read_product_tile(product):
+    """Name, price and image URL of one product tile."""
+    # --- Product Name ---
+    try:
+        # Try to get the detailed product name from <h3 class="hide_caption">
+        product_name_tag = await product.query_selector('h3.hide_caption')
+
+        if product_name_tag:
+            product_name = await product_name_tag.inner_text()
+        else:
+            # Fallback to <h2> if <h3.hide_caption> is not available
+            product_name_tag = await product.query_selector('h2.svelte-1j4gv6v')
+            product_name = await product_name_tag.inner_text() if product_name_tag else "N/A"
+
+        product_name = product_name.strip()
+    except Exception as e:
+        logging.error(f"[Product Name] Error: {e}")
+        product_name = "N/A"
+
+
+    # --- Price ---
+    try:
+        price_element = await product.query_selector('h3.price')
+        if price_element:
+            price_text = await price_element.inner_text()
+            # Extract numeric value from the price string
+            price_value = ''.join(filter(lambda x: x.isdigit() or x == '.', price_text))
+            price = f"${price_value}" if price_value else "N/A"
+        else:
+            price = "N/A"
+    except Exception as e:
+        logging.error(f"[Price] Error: {e}")
+        price = "N/A"
+
+
+
+    # --- Image URL ---
+    try:
+        # Scroll into view to ensure lazy-loaded image loads
+        await product.scroll_into_view_if_needed()
+
+        # Find the image inside the hidden slider container
+        img_element = await product.query_selector('div.slider img.fillimage')
+
+        if img_element:
+            image_url = await img_element.get_attribute('src')
+
+            # Optional: Check if it's a valid image (not a placeholder)
+            if not image_url or 'placeholder' in image_url:
+                image_url = "N/A"
+        else:
+            image_url = "N/A"
+
+    except Exception as e:
+        logging.error(f"[Image URL] Error: {e}")
+        image_url = "N/A"
+
+    return product_name, price, image_url
+
+
+RETAILER = {
+    "domains": ["cullenjewellery.com"],
+    "handler": "handle_cullenjewellery",
+    # Shopify sitemaps: /sitemap.xml indexes sitemap_products_1.xml?from=...&to=...
+    "settings": {"sitemap_products": [r"/products/[^/?#]+$"], "sitemap_filter": r"sitemap_products_"},
+}
+
+
 async def handle_cullenjewellery(url, max_pages):
     
     ip_address = get_public_ip()
@@ -101,104 +173,61 @@ async def handle_cullenjewellery(url, max_pages):
     image_tasks = []
 
     async with httpx.AsyncClient() as session:
+        # collection feed or embedded product JSON, when the store has one
+        listing = await structured_products(url, max_pages)
         load_more_clicks = 1
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
-                # Create a new browser instance for each page
-                
-                product_wrapper = '.root.svelte-19w1zzs'
-                
-                browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
-
-                 # Simulate clicking 'Load More' number of times
-                for _ in range(load_more_clicks - 1):
-                    try:
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        await asyncio.sleep(1)
-
-                        button = await page.query_selector("button.load-more")
-                        if button and await button.is_visible():
-                            await button.scroll_into_view_if_needed()
-                            await asyncio.sleep(0.5)
-                            await button.click()
-                            await asyncio.sleep(2)  # Wait for new products to load
-                        else:
-                            print("No more 'Load More' button.")
+            async with shared_playwright() as p:
+                browser = None
+                if listing:
+                    # the store's product data came in structured form; no browser needed
+                    new_products = listing.products
+                    page_title = listing.title
+                else:
+                    # Create a new browser instance for each page
+
+                    product_wrapper = '.root.svelte-19w1zzs'
+
+                    browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
+
+                    # Simulate clicking 'Load More' number of times
+                    for _ in range(load_more_clicks - 1):
+                        try:
+                            await scroll_until_loaded(page, ".root.svelte-t7drm4")
+
+                            button = await page.query_selector("button.load-more")
+                            if button and await button.is_visible():
+                                await button.scroll_into_view_if_needed()
+                                shown = await item_count(page, ".root.svelte-t7drm4")
+                                await button.click()
+                                # Wait for new products to load
+                                if not await wait_for_more_items(page, ".root.svelte-t7drm4", shown):
+                                    break
+                            else:
+                                print("No more 'Load More' button.")
+                                break
+                        except Exception as e:
+                            print(f"Error: {e}")
                             break
-                    except Exception as e:
-                        print(f"Error: {e}")
-                        break
-                                    
-                all_products = await page.query_selector_all(".root.svelte-t7drm4")
 
-                total_products = len(all_products)
-                new_products = all_products[previous_count:]
-                logging.info(f"Page {load_more_clicks}: Total = {total_products}, New = {len(new_products)}")
-                previous_count = total_products
+                    all_products = await page.query_selector_all(".root.svelte-t7drm4")
 
-                print(f"Page {load_more_clicks}: Scraping {len(new_products)} new products.")
-                page_title = await page.title()
+                    total_products = len(all_products)
+                    new_products = all_products[previous_count:]
+                    logging.info(f"Page {load_more_clicks}: Total = {total_products}, New = {len(new_products)}")
+                    previous_count = total_products
+
+                    print(f"Page {load_more_clicks}: Scraping {len(new_products)} new products.")
+                    page_title = await page.title()
 
                 for idx, product in enumerate(new_products):
-                   # --- Product Name ---
-                    try:
-                        # Try to get the detailed product name from <h3 class="hide_caption">
-                        product_name_tag = await product.query_selector('h3.hide_caption')
-                        
-                        if product_name_tag:
-                            product_name = await product_name_tag.inner_text()
-                        else:
-                            # Fallback to <h2> if <h3.hide_caption> is not available
-                            product_name_tag = await product.query_selector('h2.svelte-1j4gv6v')
-                            product_name = await product_name_tag.inner_text() if product_name_tag else "N/A"
-
-                        product_name = product_name.strip()
-                    except Exception as e:
-                        logging.error(f"[Product Name] Error: {e}")
-                        product_name = "N/A"
-
-
-                    # --- Price ---
-                    try:
-                        price_element = await product.query_selector('h3.price')
-                        if price_element:
-                            price_text = await price_element.inner_text()
-                            # Extract numeric value from the price string
-                            price_value = ''.join(filter(lambda x: x.isdigit() or x == '.', price_text))
-                            price = f"${price_value}" if price_value else "N/A"
-                        else:
-                            price = "N/A"
-                    except Exception as e:
-                        logging.error(f"[Price] Error: {e}")
-                        price = "N/A"
-
-
-
-                    # --- Image URL ---
-                    try:
-                        # Scroll into view to ensure lazy-loaded image loads
-                        await product.scroll_into_view_if_needed()
-
-                        # Find the image inside the hidden slider container
-                        img_element = await product.query_selector('div.slider img.fillimage')
-
-                        if img_element:
-                            image_url = await img_element.get_attribute('src')
-                            
-                            # Optional: Check if it's a valid image (not a placeholder)
-                            if not image_url or 'placeholder' in image_url:
-                                image_url = "N/A"
-                        else:
-                            image_url = "N/A"
-
-                    except Exception as e:
-                        logging.error(f"[Image URL] Error: {e}")
-                        image_url = "N/A"
-
-
-                        
+                    if isinstance(product, dict):
+                        product_name, price, image_url, _ = tile_fields(product)
+                    else:
+                        product_name, price, image_url = await read_product_tile(product)
+
                     print(product_name)
                     print(price)
                     print(image_url)    
@@ -236,24 +265,26 @@ async def handle_cullenjewellery(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
-                await browser.close()
+                if browser:
+                    await browser.close()
+            if listing:
+                break
             load_more_clicks += 1
 
         # Save Excel
         filename = f'handle_cullenjewellery_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
         if not records:
-            return None, None, None
+            return None, None
 
         # Final save and database operations
         wb.save(file_path)
         log_event(f"Data saved to {file_path} | IP: {ip_address}")
 
-        with open(file_path, "rb") as file:
-            base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
         insert_into_db(records)
         update_product_count(len(records))
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
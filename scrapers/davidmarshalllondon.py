@@ -3,8 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
 import time
 from datetime import datetime
 from io import BytesIO
@@ -14,9 +12,13 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import json
 import mimetypes
@@ -108,7 +110,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"  # Always save as JPG
     image_full_path = os.path.join(image_folder, image_filename)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -137,20 +139,13 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 # Main scraper function
+RETAILER = {
+    "domains": ["www.davidmarshalllondon.com"],
+    "handler": "handle_davidmarshalllondon",
+}
+
+
 async def handle_davidmarshalllondon(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -174,13 +169,13 @@ async def handle_davidmarshalllondon(url, max_pages=None):
     page = None
     
     try:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             product_wrapper =  "li.product"
             browser, page = await get_browser_with_proxy_strategy(p, url,product_wrapper)
             log_event(f"Successfully loaded: {url}")
 
             # Scroll to load all items
-            await scroll_to_bottom(page)
+            await scroll_until_loaded(page, max_scrolls=50)
             
             page_title = await page.title()
             current_date = datetime.now().strftime("%Y-%m-%d")
@@ -324,6 +319,7 @@ async def handle_davidmarshalllondon(url, max_pages=None):
                             break
                 except asyncio.TimeoutError:
                     logging.warning(f"Image download timed out for row {row_num}")
+            report_progress("images_downloaded", count=len(image_tasks))
 
             all_records.extend(records)
             wb.save(file_path)
@@ -336,19 +332,16 @@ async def handle_davidmarshalllondon(url, max_pages=None):
         if browser: await browser.close()
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -3,15 +3,16 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from utils import get_public_ip
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 from proxysetup import get_browser_with_proxy_strategy
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -37,6 +38,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.davidyurman.com"],
+    "handler": "handle_davidyurman",
+}
+
+
 async def handle_davidyurman(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -69,7 +76,7 @@ async def handle_davidyurman(url, max_pages):
         total_processed = 0
 
         while page_number <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = 'div.tile-item'
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
 
@@ -219,6 +226,7 @@ async def handle_davidyurman(url, max_pages):
                             if record[0] == unique_id:
                                 records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8])
                                 break
+                    report_progress("images_downloaded", count=len(image_tasks))
 
                     page_number += 1
                     total_processed += len(all_products)
@@ -234,7 +242,7 @@ async def handle_davidyurman(url, max_pages):
 
       
         if not records:
-            return None, None, None
+            return None, None
 
         # Save Excel file
         filename = f"davidyurman_{current_date}_{time_only}.xlsx"
@@ -248,7 +256,5 @@ async def handle_davidyurman(url, max_pages):
         update_product_count(len(records))
 
         # Return results
-        with open(file_path, "rb") as file:
-            base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
@@ -3,24 +3,27 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
 from PIL import Image as PILImage
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
+from proxy_monitor import OXYLABS
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import mimetypes
 # from proxysetup import get_browser_with_proxy_strategy
 from dotenv import load_dotenv
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
 
@@ -68,7 +71,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"  # Always save as JPG
     image_full_path = os.path.join(image_folder, image_filename)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -97,22 +100,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 # Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
         
         
 ########################################  safe_goto_and_wait ####################################################################
@@ -120,6 +108,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -137,7 +126,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -145,7 +134,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -157,52 +146,16 @@ async def get_browser_with_proxy_strategy(p, url: str):
     """
     Always use Oxylabs proxy (ignore robots.txt)
     """
-    parsed_url = httpx.URL(url)
-    # Oxylabs proxy config (replace with your actual Oxylabs proxy details)
-    proxy_config = {
-        "server": PROXY_SERVER,
-        "username": PROXY_USERNAME,
-        "password": PROXY_PASSWORD
-    }
-
-    try:
-        logging.info("Using Oxylabs proxy for all requests")
-
-        browser = await p.chromium.launch(
-            proxy=proxy_config,
-            headless=True,
-           args=[
-                '--disable-http2',
-                '--disable-blink-features=AutomationControlled',
-                '--disable-web-security'
-               
-            ]
-
-        )
-
-        context = await browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                       "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
-            viewport={"width": 1280, "height": 800},
-            locale="en-US",
-        )
-
-        # Stealth: Hide navigator.webdriver
-        await context.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
-
-        page = await context.new_page()
-
-        await safe_goto_and_wait(page, url, isbri_data=False)
-        return browser, page
-
-    except Exception as e:
-        error_trace = traceback.format_exc()
-        logging.error(f"Failed to launch browser with Oxylabs proxy:\n{error_trace}")
-        raise RuntimeError(f"Oxylabs proxy failed for {url}: {e}")
+    return await open_proxied_browser(
+        p, url, safe_goto_and_wait, proxies=[OXYLABS],
+        launch_args=['--disable-http2'],
+        context_options={
+            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+            "viewport": {"width": 1280, "height": 800},
+            "locale": "en-US",
+        },
+    )
 
 
 # async def get_browser_with_proxy_strategy(p, url: str):
@@ -293,51 +246,13 @@ async def get_browser_with_proxy_strategy(p, url: str):
 #     raise RuntimeError(error_msg)
 
 
+# Main scraper function
+RETAILER = {
+    "domains": ["www.dior.com"],
+    "handler": "handle_dior",
+}
 
 
-
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
-    try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
-    except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
-
-
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False        
-
-
-# Main scraper function
 async def handle_dior(url, max_pages=None):
     
     ip_address = get_public_ip()
@@ -361,13 +276,13 @@ async def handle_dior(url, max_pages=None):
     page = None
     
     try:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
            
             browser, page = await get_browser_with_proxy_strategy(p, url)
             log_event(f"Successfully loaded: {url}")
 
             # Scroll to load all items
-            await scroll_to_bottom(page)
+            await scroll_until_loaded(page, max_scrolls=50)
             
             page_title = await page.title()
             current_date = datetime.now().strftime("%Y-%m-%d")
@@ -468,6 +383,7 @@ async def handle_dior(url, max_pages=None):
                             break
                 except asyncio.TimeoutError:
                     logging.warning(f"Image download timed out for row {row_num}")
+            report_progress("images_downloaded", count=len(image_tasks))
 
             all_records.extend(records)
             wb.save(file_path)
@@ -480,19 +396,16 @@ async def handle_dior(url, max_pages=None):
         if browser: await browser.close()
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
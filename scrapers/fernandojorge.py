@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +11,14 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import json
 import mimetypes
@@ -108,7 +110,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"  # Always save as JPG
     image_full_path = os.path.join(image_folder, image_filename)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -137,28 +139,12 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page):
-    last_height = await page.evaluate("document.body.scrollHeight")
-    while True:
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1, 3))  # Random delay between scrolls
-        
-        # Check if we've reached the bottom
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
-
 # Reliable page.goto wrapper
 async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
             await page.wait_for_selector("div.grid", state="attached", timeout=30000)
             print("[Success] Product listing loaded.")
@@ -166,11 +152,17 @@ async def safe_goto_and_wait(page, url, retries=3):
         except (Error, TimeoutError) as e:
             logging.warning(f"Attempt {attempt + 1} failed for {url}: {e}")
             if attempt < retries - 1:
-                random_delay(1, 3)
+                await throttle(url)  # politeness wait before retrying
             else:
                 raise
 
 # Main scraper function
+RETAILER = {
+    "domains": ["fernandojorge.co.uk"],
+    "handler": "handle_fernandojorge",
+}
+
+
 async def handle_fernandojorge(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -192,11 +184,11 @@ async def handle_fernandojorge(url, max_pages=None):
     file_path = os.path.join(EXCEL_DATA_PATH, filename)
 
     try:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             # Browser setup
             product_wrapper = "div.grid"
             browser, page = await get_browser_with_proxy_strategy(p, url,product_wrapper)
-            await scroll_to_bottom(page)
+            await scroll_until_loaded(page, max_scrolls=50)
             
             # Enhanced product data extraction with more fields
             product_data = await page.evaluate("""() => {
@@ -334,6 +326,7 @@ async def handle_fernandojorge(url, max_pages=None):
                         sheet.add_image(img, f"D{row_num}")
                 except Exception as e:
                     logging.error(f"Image processing error: {str(e)}")
+            report_progress("images_downloaded", count=len(image_tasks))
 
             wb.save(file_path)
             log_event(f"Data saved to {file_path}")
@@ -344,19 +337,16 @@ async def handle_fernandojorge(url, max_pages=None):
     
     # Database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
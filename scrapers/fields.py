@@ -6,17 +6,17 @@ import asyncio
 import concurrent.futures
 from datetime import datetime
 from io import BytesIO
-from playwright.async_api import async_playwright, Page, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from flask import Flask
 import uuid
-import base64
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db, create_table
+from progress import report_progress
 from limit_checker import update_product_count
-import random
 import re
 from proxysetup import get_browser_with_proxy_strategy
 # Load environment variables
@@ -73,45 +73,11 @@ async def download_image(image_url, product_name, timestamp, image_folder, retri
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-async def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    await asyncio.sleep(random.uniform(min_sec, max_sec))
-
-async def scroll_and_wait(page: Page):
-    """Scroll down to load lazy-loaded products."""
-    previous_height = await page.evaluate("document.body.scrollHeight")
-    await page.evaluate("window.scrollBy(0, document.body.scrollHeight);")
-    await asyncio.sleep(2)  # Allow time for content to load
-    new_height = await page.evaluate("document.body.scrollHeight")
-    return new_height > previous_height  # Returns True if more content is loaded
-
-async def scroll_and_wait_advanced(page: Page, max_attempts=10, wait_time=1):
-    """Scroll down and wait for new content to load dynamically."""
-    last_height = await page.evaluate("document.body.scrollHeight")
-
-    for attempt in range(max_attempts):
-        logging.info(f"Scroll attempt {attempt + 1}/{max_attempts}")
-        
-        # Scroll down
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-
-        # Wait for either new content to load or a timeout
-        try:
-            await page.wait_for_selector(".product-item", state="attached", timeout=3000)
-        except:
-            logging.info("No new content detected.")
-        
-        # Check if new content has loaded
-        new_height = await page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            logging.info("No more new content. Stopping scroll.")
-            break  # Stop if the page height hasn't changed
-        
-        last_height = new_height
-        await asyncio.sleep(wait_time)  # Optional short delay to avoid rapid requests
-
-    logging.info("Finished scrolling.")
-    return True  # Indicate successful scrolling
+RETAILER = {
+    "domains": ["www.fields.ie"],
+    "handler": "handle_fields",
+}
+
 
 async def handle_fields(initial_url, max_pages):
     """Scrape product data by following each “View more” URL in a fresh browser,
@@ -147,7 +113,7 @@ async def handle_fields(initial_url, max_pages):
     while page_num <= max_pages and current_url:
         logging.info(f"--- Scraping page {page_num}: {current_url}")
 
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             product_wrapper = "div.tile-container"
             browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
 
@@ -259,6 +225,7 @@ async def handle_fields(initial_url, max_pages):
             img = Image(image_path)
             img.width, img.height = 100, 100
             sheet.add_image(img, f"E{row_idx}")
+    report_progress("images_downloaded", count=len(image_tasks))
 
     # — save workbook —
     now_date = datetime.now().strftime("%Y-%m-%d")
@@ -266,19 +233,16 @@ async def handle_fields(initial_url, max_pages):
     filename = f"handle_fields_{now_date}_{now_time}.xlsx"
     file_path = os.path.join(EXCEL_DATA_PATH, filename)
     if not records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(records)
     update_product_count(len(records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -1,13 +1,13 @@
 import os
 import re
-import time
 import logging
 import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 
@@ -16,6 +16,7 @@ from proxysetup import get_browser_with_proxy_strategy
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from openpyxl.drawing.image import Image
 
@@ -58,7 +59,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         "Connection": "keep-alive"
     }
 
-    async with httpx.AsyncClient(
+    async with tracked_client(
         timeout=20.0,
         follow_redirects=True,
         headers=headers,
@@ -119,10 +120,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
 
     
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 
 
 
@@ -130,6 +127,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     separator = '?' if '?' in base_url else '?'
     return f"{base_url}{separator}pageNo={page_count}"   
 
+RETAILER = {
+    "domains": ["www.forevermark.com"],
+    "handler": "handle_forevermark",
+}
+
+
 async def handle_forevermark(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -164,7 +167,7 @@ async def handle_forevermark(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.container.finder-filters'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {url}")
@@ -252,6 +255,7 @@ async def handle_forevermark(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -271,27 +275,21 @@ async def handle_forevermark(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
@@ -1,20 +1,20 @@
 import os
-import time
 import logging
-import concurrent.futures
 import asyncio
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from scraper_loop import shared_playwright
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 import uuid
-import base64
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import random
 import re
 from proxysetup import get_browser_with_proxy_strategy
-import requests
+from usage_ledger import tracked_client
+import httpx
 
 # Setup Flask
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -23,31 +23,38 @@ IMAGE_SAVE_PATH = os.path.join(BASE_DIR, 'static', 'Images')
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def download_image(image_url, product_name, timestamp, image_folder, unique_id, retries=5, timeout=30):
+async def download_image(image_url, product_name, timestamp, image_folder, unique_id, retries=5, timeout=30):
     if not image_url or image_url == "N/A":
         return "N/A"
 
     image_filename = f"{unique_id}_{timestamp}.jpg"
     image_full_path = os.path.join(image_folder, image_filename)
 
-    for attempt in range(1, retries + 1):
-        try:
-            headers = {"User-Agent": "Mozilla/5.0"}
-            response = requests.get(image_url, headers=headers, stream=True, timeout=timeout, allow_redirects=True)
-            response.raise_for_status()
+    headers = {"User-Agent": "Mozilla/5.0"}
+    async with tracked_client(headers=headers, timeout=timeout, follow_redirects=True) as client:
+        for attempt in range(1, retries + 1):
+            try:
+                response = await client.get(image_url)
+                response.raise_for_status()
 
-            with open(image_full_path, "wb") as f:
-                f.write(response.content)
+                with open(image_full_path, "wb") as f:
+                    f.write(response.content)
 
-            return image_full_path
+                return image_full_path
 
-        except requests.exceptions.RequestException as e:
-            logging.warning(f"Attempt {attempt}: Error downloading {image_url} - {e}")
-            time.sleep(5)
+            except httpx.HTTPError as e:
+                logging.warning(f"Attempt {attempt}: Error downloading {image_url} - {e}")
+                await asyncio.sleep(5)
 
     logging.error(f"Failed to download image after {retries} attempts: {image_url}")
     return None
 
+RETAILER = {
+    "domains": ["www.fredmeyerjewelers.com"],
+    "handler": "handle_fredmeyer",
+}
+
+
 async def handle_fredmeyer(url, max_pages):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     image_folder = os.path.join(IMAGE_SAVE_PATH, timestamp)
@@ -64,7 +71,7 @@ async def handle_fredmeyer(url, max_pages):
     time_only = datetime.now().strftime("%H-%M-%S")
     records = []
 
-    async with async_playwright() as p:
+    async with shared_playwright() as p:
         for page_count in range(1, max_pages + 1):
             logging.info(f"Processing page {page_count}/{max_pages}")
             product_wrapper=".grid-group-item"
@@ -106,6 +113,7 @@ async def handle_fredmeyer(url, max_pages):
 
                 products = await page.query_selector_all("div.grid-group-item")
                 logging.info(f"Found {len(products)} products on page {page_count}")
+                report_progress("products_extracted", count=len(products))
                 page_title = await page.title()
 
                 if not products:
@@ -113,50 +121,49 @@ async def handle_fredmeyer(url, max_pages):
                     continue
 
                 image_tasks = []
-                with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                    for row_num, product in enumerate(products, start=2 + len(records)):
-                        try:
-                            product_name_tag = await product.query_selector('div.prodtext a')
-                            product_name = await product_name_tag.inner_text() if product_name_tag else "N/A"
-                        except Exception as e:
-                            logging.warning(f"Error extracting product name: {e}")
-                            product_name = "N/A"
-
-                        try:
-                            price_tag = await product.query_selector('.pricediv .curprice')
-                            price = await price_tag.inner_text() if price_tag else "N/A"
-                        except Exception as e:
-                            logging.warning(f"Error extracting price: {e}")
-                            price = "N/A"
-
-                        try:
-                            base_url = "https://www.fredmeyerjewelers.com"
-                            image_tag = await product.query_selector('img.mainprodimage')
-                            image_url = await page.evaluate(
-                                '(el) => el.getAttribute("data-src") || el.getAttribute("src")', image_tag
-                            ) if image_tag else "N/A"
-
-                            if image_url and image_url.startswith("/"):
-                                image_url = base_url + image_url
-                        except Exception as e:
-                            logging.error(f"Error extracting image: {e}")
-                            image_url = "N/A"
-
-                        gold_type_match = re.search(r"\b(\d{1,2}K\s*(?:Yellow|White|Rose)?\s*Gold)\b", product_name, re.IGNORECASE)
-                        kt = gold_type_match.group(1) if gold_type_match else "N/A"
-
-                        diamond_match = re.search(r"(\d+(?:[/\-]\d+)?(?:\.\d+)?\s*ct\.?\s*(?:t\.?w\.?)?)", product_name, re.IGNORECASE)
-                        diamond_weight = diamond_match.group(1) if diamond_match else "N/A"
-
-                        unique_id = str(uuid.uuid4())
-                        image_future = executor.submit(download_image, image_url, product_name, timestamp, image_folder, unique_id)
-                        image_tasks.append((row_num, unique_id, image_future))
-
-                        records.append((unique_id, current_date, page_title, product_name, None, kt, price, diamond_weight))
-                        sheet.append([current_date, page_title, product_name, None, kt, price, diamond_weight, time_only, image_url])
+                for row_num, product in enumerate(products, start=2 + len(records)):
+                    try:
+                        product_name_tag = await product.query_selector('div.prodtext a')
+                        product_name = await product_name_tag.inner_text() if product_name_tag else "N/A"
+                    except Exception as e:
+                        logging.warning(f"Error extracting product name: {e}")
+                        product_name = "N/A"
+
+                    try:
+                        price_tag = await product.query_selector('.pricediv .curprice')
+                        price = await price_tag.inner_text() if price_tag else "N/A"
+                    except Exception as e:
+                        logging.warning(f"Error extracting price: {e}")
+                        price = "N/A"
+
+                    try:
+                        base_url = "https://www.fredmeyerjewelers.com"
+                        image_tag = await product.query_selector('img.mainprodimage')
+                        image_url = await page.evaluate(
+                            '(el) => el.getAttribute("data-src") || el.getAttribute("src")', image_tag
+                        ) if image_tag else "N/A"
+
+                        if image_url and image_url.startswith("/"):
+                            image_url = base_url + image_url
+                    except Exception as e:
+                        logging.error(f"Error extracting image: {e}")
+                        image_url = "N/A"
+
+                    gold_type_match = re.search(r"\b(\d{1,2}K\s*(?:Yellow|White|Rose)?\s*Gold)\b", product_name, re.IGNORECASE)
+                    kt = gold_type_match.group(1) if gold_type_match else "N/A"
+
+                    diamond_match = re.search(r"(\d+(?:[/\-]\d+)?(?:\.\d+)?\s*ct\.?\s*(?:t\.?w\.?)?)", product_name, re.IGNORECASE)
+                    diamond_weight = diamond_match.group(1) if diamond_match else "N/A"
+
+                    unique_id = str(uuid.uuid4())
+                    image_future = asyncio.create_task(download_image(image_url, product_name, timestamp, image_folder, unique_id))
+                    image_tasks.append((row_num, unique_id, image_future))
+
+                    records.append((unique_id, current_date, page_title, product_name, None, kt, price, diamond_weight))
+                    sheet.append([current_date, page_title, product_name, None, kt, price, diamond_weight, time_only, image_url])
 
                 for row_num, unique_id, future in image_tasks:
-                    image_path = future.result()
+                    image_path = await future
                     if image_path != "N/A":
                         img = Image(image_path)
                         img.width, img.height = 100, 100
@@ -165,6 +172,7 @@ async def handle_fredmeyer(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
             except Exception as e:
                 logging.error(f"Error in page {page_count}: {e}")
@@ -178,10 +186,8 @@ async def handle_fredmeyer(url, max_pages):
     wb.save(file_path)
     logging.info(f"Saved Excel file: {file_path}")
 
-    with open(file_path, "rb") as f:
-        base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
     insert_into_db(records)
     update_product_count(len(records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
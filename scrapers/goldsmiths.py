@@ -3,7 +3,6 @@ import time
 import logging
 import re
 import uuid
-import base64
 import asyncio
 from datetime import datetime
 from proxysetup import get_browser_with_proxy_strategy
@@ -11,11 +10,13 @@ from dotenv import load_dotenv
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 import httpx
-from playwright.async_api import async_playwright
-import random
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from openpyxl.drawing.image import Image
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 
@@ -48,7 +49,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -78,6 +79,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
 
 
 
+RETAILER = {
+    "domains": ["www.goldsmiths.co.uk"],
+    "handler": "handle_goldsmiths",
+}
+
+
 async def handle_goldsmiths(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -102,7 +109,7 @@ async def handle_goldsmiths(url, max_pages):
     page_count = 0
     success_count = 0
 
-    async with async_playwright() as p:
+    async with shared_playwright() as p:
         while page_count <= max_pages:
             
             current_url= build_url_with_loadmore(url, page_count)
@@ -116,19 +123,13 @@ async def handle_goldsmiths(url, max_pages):
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))  # Random delay between scrolls
-                    current_product_count = await page.locator('.productTile').count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, '.productTile')
 
 
                 wrapper = await page.query_selector("div.gridBlock.row")
                 products = await wrapper.query_selector_all("div.productTile") if wrapper else []
                 logging.info(f"Total products found: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -260,6 +261,7 @@ async def handle_goldsmiths(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -273,7 +275,6 @@ async def handle_goldsmiths(url, max_pages):
                     await browser.close()
                 
                 page_count += 1
-                await asyncio.sleep(random.uniform(2, 5))
                 
             except Exception as e:
                 logging.error(f"Error processing page {page_count}: {str(e)}")
@@ -284,26 +285,20 @@ async def handle_goldsmiths(url, max_pages):
                 wb.save(file_path)
                 continue
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
     # # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
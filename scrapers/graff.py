@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,10 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright
+from scraper_loop import shared_playwright
 from proxysetup import get_browser_with_proxy_strategy
 
 # Load .env variables
@@ -42,6 +42,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.graff.com"],
+    "handler": "handle_graff",
+}
+
+
 async def handle_graff(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -71,7 +77,7 @@ async def handle_graff(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 # Create a new browser instance for each page
                 product_wrapper = '.b-product-tile__inner.js-product-tile-inner'
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
@@ -170,6 +176,7 @@ async def handle_graff(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
@@ -178,19 +185,16 @@ async def handle_graff(url, max_pages):
         filename = f'handle_graff_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
         if not records:
-            return None, None, None
+            return None, None
 
         # Save the workbook
         wb.save(file_path)
         log_event(f"Data saved to {file_path}")
 
-        # Encode the file in base64
-        with open(file_path, "rb") as file:
-            base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
         # Insert data into the database and update product count
         insert_into_db(records)
         update_product_count(len(records))
 
         # Return necessary information
-        return base64_encoded, filename, file_path
\ No newline at end of file
+        return filename, file_path
\ No newline at end of file
@@ -1,22 +1,24 @@
 import asyncio
 import re
 import os
-import time
-import random
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError,Error
-import traceback
-from typing import List, Tuple
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from structured_data import structured_products
+from api_capture import tile_fields
+from rate_limiter import throttle
+from proxysetup import open_proxied_browser
+from typing import Tuple
 # Load .env variables
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
@@ -72,9 +74,6 @@ def modify_image_url(image_url):
     return modified_url + query_params
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
 ########################################  safe_goto_and_wait ####################################################################
 
 
@@ -82,6 +81,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -99,7 +99,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -107,7 +107,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -117,120 +117,119 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
       
 
 async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait)
 
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
+
+async def read_product_tile(product):
+    """Name, price, image URL and additional info entries of one product tile."""
+    additional_info = []
+
+    try:
+        name_tag = await product.query_selector("a.product-card-title")
+        product_name = await name_tag.inner_text() if name_tag else "N/A"
+    except Exception as e:
+        print(f"[Product Name] Error: {e}")
+        product_name = "N/A"
+
+    # Handle price (original and discounted)
+    price = "N/A"
+    try:
+        price_tag = await product.query_selector("span.price")
+        if price_tag:
+            original_price_tag = await price_tag.query_selector("del span.amount")
+            discounted_price_tag = await price_tag.query_selector("ins span.amount")
+
+            original_price = await original_price_tag.inner_text() if original_price_tag else None
+            discounted_price = await discounted_price_tag.inner_text() if discounted_price_tag else None
+
+            if original_price and discounted_price:
+                price = f"{original_price}|{discounted_price}"
+                additional_info.append(f"Discount: {original_price} → {discounted_price}")
+            elif discounted_price:
+                price = discounted_price
             else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
+                price = await price_tag.inner_text()
+    except Exception as e:
+        print(f"[Price] Error: {e}")
+        price = "N/A"
 
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
 
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
+    # Handle discount badges
+    try:
+        discount_badges = await product.query_selector_all(".badge.onsale")
+        for badge in discount_badges:
+            badge_text = await badge.inner_text()
+            if badge_text and "SAVE" in badge_text:
+                additional_info.append(f"Badge: {badge_text}")
+    except Exception as e:
+        print(f"[Discount Badge] Error: {e}")
 
+    # Handle product availability/stock status
+    try:
+        stock_status_tag = await product.query_selector(".stock-status")
+        if stock_status_tag:
+            stock_status = await stock_status_tag.inner_text()
+            additional_info.append(f"Stock: {stock_status}")
+    except Exception as e:
+        print(f"[Stock Status] Error: {e}")
+
+    # Handle color options if available
+    try:
+        color_options = await product.query_selector_all(".color-swatch")
+        if color_options:
+            colors = [await color.get_attribute("title") or await color.get_attribute("alt") for color in color_options]
+            colors = [c for c in colors if c]
+            if colors:
+                additional_info.append(f"Colors: {', '.join(colors)}")
+    except Exception as e:
+        print(f"[Color Options] Error: {e}")
 
+    # Handle any other product labels
+    try:
+        labels = await product.query_selector_all(".product-label")
+        if labels:
+            label_texts = [await label.inner_text() for label in labels]
+            additional_info.extend([f"Label: {text}" for text in label_texts if text])
+    except Exception as e:
+        print(f"[Product Labels] Error: {e}")
 
+    # Handle product rating if available
+    try:
+        rating_tag = await product.query_selector(".product-rating")
+        if rating_tag:
+            rating = await rating_tag.get_attribute("data-rating") or await rating_tag.inner_text()
+            additional_info.append(f"Rating: {rating}")
+    except Exception as e:
+        print(f"[Product Rating] Error: {e}")
 
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
+    # Handle image
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
+        img_tag = await product.query_selector(".product-primary-image")
+        image_url = await img_tag.get_attribute("src") if img_tag else None
+
+        if not image_url:
+            img_tag = await product.query_selector(".product-secondary-image")
+            image_url = await img_tag.get_attribute("src") if img_tag else "N/A"
+
+        if image_url and image_url.startswith("//"):
+            image_url = "https:" + image_url
+        elif not image_url:
+            image_url = "N/A"
     except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
+        print(f"[Image URL] Error: {e}")
+        image_url = "N/A"
 
+    return product_name, price, image_url, additional_info
+
+
+RETAILER = {
+    "domains": ["www.grahams.com.au"],
+    "handler": "handle_grahams",
+    # Shopify sitemaps: /sitemap.xml indexes sitemap_products_1.xml?from=...&to=...
+    "settings": {"sitemap_products": [r"/products/[^/?#]+$"], "sitemap_filter": r"sitemap_products_"},
+}
 
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
 
 async def handle_grahams(url, max_pages):
     ip_address = get_public_ip()
@@ -256,151 +255,68 @@ async def handle_grahams(url, max_pages):
     image_tasks = []
 
     async with httpx.AsyncClient() as session:
+        # collection feed or embedded product JSON, when the store has one
+        listing = await structured_products(url, max_pages)
         load_more_clicks = 1
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
-                # Create a new browser instance for each page
-                browser, page = await get_browser_with_proxy_strategy(p, url)
-                log_event(f"Successfully loaded: {url}")
-
-                # Simulate clicking 'Load More' number of times
-                for i in range(load_more_clicks):
-                    try:
-                        # Scroll to bottom of the page to trigger lazy load
-                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                        await asyncio.sleep(1)
-
-                        # Select and wait for the "Load More" button
-                        button = await page.query_selector("button.load-more")
-                        if button and await button.is_visible():
-                            await button.scroll_into_view_if_needed()
-                            await asyncio.sleep(0.5)
-                            await button.click()
-                            print(f"[Load More] Clicked load more button ({i + 1}/{load_more_clicks - 1})")
-
-                            # Wait for more products to load
-                            await page.wait_for_timeout(1500)
-
-                            # Optional: Wait for new products to appear (ensures no stale state)
-                            await page.wait_for_selector("li.column.ss__result--item", timeout=5000)
-
-                        else:
-                            print("[Load More] Button not found or not visible.")
-                            break
+            async with shared_playwright() as p:
+                browser = None
+                if listing:
+                    # the store's product data came in structured form; no browser needed
+                    all_products = new_products = listing.products
+                    page_title = listing.title
+                else:
+                    # Create a new browser instance for each page
+                    browser, page = await get_browser_with_proxy_strategy(p, url)
+                    log_event(f"Successfully loaded: {url}")
+
+                    # Simulate clicking 'Load More' number of times
+                    for i in range(load_more_clicks):
+                        try:
+                            # Scroll to bottom of the page to trigger lazy load
+                            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                            await asyncio.sleep(1)
+
+                            # Select and wait for the "Load More" button
+                            button = await page.query_selector("button.load-more")
+                            if button and await button.is_visible():
+                                await button.scroll_into_view_if_needed()
+                                await asyncio.sleep(0.5)
+                                await button.click()
+                                print(f"[Load More] Clicked load more button ({i + 1}/{load_more_clicks - 1})")
+
+                                # Wait for more products to load
+                                await page.wait_for_timeout(1500)
+
+                                # Optional: Wait for new products to appear (ensures no stale state)
+                                await page.wait_for_selector("li.column.ss__result--item", timeout=5000)
 
-                    except Exception as e:
-                        print(f"[Load More Error] {e}")
-                        break
+                            else:
+                                print("[Load More] Button not found or not visible.")
+                                break
 
-                all_products = await page.query_selector_all("li.column.ss__result.ss__result--item")
+                        except Exception as e:
+                            print(f"[Load More Error] {e}")
+                            break
 
-                total_products = len(all_products)
-                new_products = all_products[previous_count:]
-                logging.info(f"Page {load_more_clicks}: Total = {total_products}, New = {len(new_products)}")
-                previous_count += len(new_products)
+                    all_products = await page.query_selector_all("li.column.ss__result.ss__result--item")
 
-                print(f"Page {load_more_clicks}: Scraping {len(new_products)} new products.")
-                page_title = await page.title()
+                    total_products = len(all_products)
+                    new_products = all_products[previous_count:]
+                    logging.info(f"Page {load_more_clicks}: Total = {total_products}, New = {len(new_products)}")
+                    previous_count += len(new_products)
 
-                for idx, product in enumerate(new_products):
-                    additional_info = []
-                    
-                    try:
-                        name_tag = await product.query_selector("a.product-card-title")
-                        product_name = await name_tag.inner_text() if name_tag else "N/A"
-                    except Exception as e:
-                        print(f"[Product Name] Error: {e}")
-                        product_name = "N/A"
-
-                    # Handle price (original and discounted)
-                    price = "N/A"
-                    try:
-                        price_tag = await product.query_selector("span.price")
-                        if price_tag:
-                            original_price_tag = await price_tag.query_selector("del span.amount")
-                            discounted_price_tag = await price_tag.query_selector("ins span.amount")
-                            
-                            original_price = await original_price_tag.inner_text() if original_price_tag else None
-                            discounted_price = await discounted_price_tag.inner_text() if discounted_price_tag else None
-                            
-                            if original_price and discounted_price:
-                                price = f"{original_price}|{discounted_price}"
-                                additional_info.append(f"Discount: {original_price} → {discounted_price}")
-                            elif discounted_price:
-                                price = discounted_price
-                            else:
-                                price = await price_tag.inner_text()
-                    except Exception as e:
-                        print(f"[Price] Error: {e}")
-                        price = "N/A"
+                    print(f"Page {load_more_clicks}: Scraping {len(new_products)} new products.")
+                    page_title = await page.title()
 
-                    
-                    # Handle discount badges
-                    try:
-                        discount_badges = await product.query_selector_all(".badge.onsale")
-                        for badge in discount_badges:
-                            badge_text = await badge.inner_text()
-                            if badge_text and "SAVE" in badge_text:
-                                additional_info.append(f"Badge: {badge_text}")
-                    except Exception as e:
-                        print(f"[Discount Badge] Error: {e}")
-
-                    # Handle product availability/stock status
-                    try:
-                        stock_status_tag = await product.query_selector(".stock-status")
-                        if stock_status_tag:
-                            stock_status = await stock_status_tag.inner_text()
-                            additional_info.append(f"Stock: {stock_status}")
-                    except Exception as e:
-                        print(f"[Stock Status] Error: {e}")
-
-                    # Handle color options if available
-                    try:
-                        color_options = await product.query_selector_all(".color-swatch")
-                        if color_options:
-                            colors = [await color.get_attribute("title") or await color.get_attribute("alt") for color in color_options]
-                            colors = [c for c in colors if c]
-                            if colors:
-                                additional_info.append(f"Colors: {', '.join(colors)}")
-                    except Exception as e:
-                        print(f"[Color Options] Error: {e}")
-
-                    # Handle any other product labels
-                    try:
-                        labels = await product.query_selector_all(".product-label")
-                        if labels:
-                            label_texts = [await label.inner_text() for label in labels]
-                            additional_info.extend([f"Label: {text}" for text in label_texts if text])
-                    except Exception as e:
-                        print(f"[Product Labels] Error: {e}")
-
-                    # Handle product rating if available
-                    try:
-                        rating_tag = await product.query_selector(".product-rating")
-                        if rating_tag:
-                            rating = await rating_tag.get_attribute("data-rating") or await rating_tag.inner_text()
-                            additional_info.append(f"Rating: {rating}")
-                    except Exception as e:
-                        print(f"[Product Rating] Error: {e}")
-
-                    # Handle image
-                    try:
-                        img_tag = await product.query_selector(".product-primary-image")
-                        image_url = await img_tag.get_attribute("src") if img_tag else None
-
-                        if not image_url:
-                            img_tag = await product.query_selector(".product-secondary-image")
-                            image_url = await img_tag.get_attribute("src") if img_tag else "N/A"
-
-                        if image_url and image_url.startswith("//"):
-                            image_url = "https:" + image_url
-                        elif not image_url:
-                            image_url = "N/A"
-                    except Exception as e:
-                        print(f"[Image URL] Error: {e}")
-                        image_url = "N/A"
+                for idx, product in enumerate(new_products):
+                    if isinstance(product, dict):
+                        product_name, price, image_url, _ = tile_fields(product)
+                        additional_info = product["tags"]
+                    else:
+                        product_name, price, image_url, additional_info = await read_product_tile(product)
 
                     image_url = modify_image_url(image_url)
                     
@@ -475,14 +391,18 @@ async def handle_grahams(url, max_pages):
                                 record[10]  # Additional Info remains last
                             )
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
-                await browser.close()
+                if browser:
+                    await browser.close()
+            if listing:
+                break
             load_more_clicks += 1
 
         # Save Excel
 
         if not all_products:
-            return None, None, None
+            return None, None
         
         filename = f'handle_grahams_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
@@ -496,7 +416,5 @@ async def handle_grahams(url, max_pages):
 
         update_product_count(len(records))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,10 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright
+from scraper_loop import shared_playwright
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from proxysetup import get_browser_with_proxy_strategy
 load_dotenv()
@@ -65,6 +65,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     return "N/A"
 
 
+RETAILER = {
+    "domains": ["www.hannoush.com"],
+    "handler": "handle_hannoush",
+}
+
+
 async def handle_hannoush(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -91,12 +97,12 @@ async def handle_hannoush(url, max_pages):
     records = []
     image_tasks = []
 
-    async with async_playwright() as p:
+    async with shared_playwright() as p:
         product_wrapper_selector = "ul#product-grid"
         try:
             browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper_selector)
         except Exception:
-            return None, None, None
+            return None, None
 
         for scroll_index in range(max_pages):
             print(f"Scroll {scroll_index + 1}/{max_pages}")
@@ -271,6 +277,7 @@ async def handle_hannoush(url, max_pages):
                             break
                 except Exception as e:
                     logging.error(f"Error processing image for row {row}: {e}")
+            report_progress("images_downloaded", count=len(image_tasks))
 
         await browser.close()
 
@@ -286,10 +293,8 @@ async def handle_hannoush(url, max_pages):
 
         update_product_count(len(collected_products))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
 
 
 def calculate_discount(original_price, sale_price):
@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,12 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
 from html import unescape
 
 # Load .env variables
@@ -54,6 +56,21 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+
+async def get_browser_with_proxy_strategy(p, url: str):
+    """Open a proxied page on url via the shared proxy strategy."""
+    async def goto(page, url, isbri_data):
+        await page.goto(url, timeout=120000)
+
+    return await open_proxied_browser(p, url, goto)
+
+
+RETAILER = {
+    "domains": ["www.harrywinston.com"],
+    "handler": "handle_harrywinston",
+}
+
+
 async def handle_harrywinston(url, max_pages):
     
     ip_address = get_public_ip()
@@ -84,16 +101,12 @@ async def handle_harrywinston(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
-                # Create a new browser instance for each page
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                page = await browser.new_page()
-
+            async with shared_playwright() as p:
+                # Open a proxied page for each page
                 try:
-                    await page.goto(url, timeout=120000)
+                    browser, page = await get_browser_with_proxy_strategy(p, url)
                 except Exception as e:
                     logging.warning(f"Failed to load URL {url}: {e}")
-                    await browser.close()
                     continue  # move to the next iteration
 
                
@@ -215,6 +228,7 @@ async def handle_harrywinston(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
@@ -232,7 +246,5 @@ async def handle_harrywinston(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
@@ -3,20 +3,21 @@ import logging
 import aiohttp
 import asyncio
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 import uuid
-import base64
 from utils import get_public_ip
 from database import insert_into_db, create_table
+from progress import report_progress
 from limit_checker import update_product_count
-import random
 import re
 from playwright.async_api import Page
 import re
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
 from proxysetup import get_browser_with_proxy_strategy
+from infinite_scroll import scroll_until_loaded
 
 
 
@@ -28,14 +29,6 @@ IMAGE_SAVE_PATH = os.path.join(BASE_DIR, 'static', 'Images')
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-async def scroll_and_wait(page):
-    """Scroll down to load lazy-loaded products."""
-    previous_height = await page.evaluate("document.body.scrollHeight")
-    await page.evaluate("window.scrollBy(0, document.body.scrollHeight);")
-    await asyncio.sleep(2)  # Allow time for content to load
-    new_height = await page.evaluate("document.body.scrollHeight")
-    return new_height > previous_height  # Returns True if more content is loaded
-
 def modify_image_url(image_url):
     """Update Helzberg image URL to use high resolution (800x800)."""
     if not image_url or image_url == "N/A":
@@ -80,40 +73,11 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-async def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    await asyncio.sleep(random.uniform(min_sec, max_sec))
-
-async def click_load_more(page, max_pages=5, delay_range=(3, 5)):
-    """Click 'Load More' button dynamically until no more pages are available."""
-    load_more_clicks = 0
-
-    while load_more_clicks < (max_pages - 1):
-        try:
-            load_more_button = await page.query_selector(".show-more-btn")
+RETAILER = {
+    "domains": ["www.helzberg.com"],
+    "handler": "handle_helzberg",
+}
 
-            if load_more_button and await load_more_button.is_visible():
-                await page.evaluate("(btn) => btn.click()", load_more_button)
-                load_more_clicks += 1
-                logging.info(f"✅ Clicked 'Load More' button {load_more_clicks} times.")
-                
-                # Wait for new content to load
-                await random_delay(*delay_range)
-
-                # Ensure new content loaded by checking page height change
-                previous_height = await page.evaluate("document.body.scrollHeight")
-                await asyncio.sleep(2)  # Short wait before rechecking height
-                new_height = await page.evaluate("document.body.scrollHeight")
-
-                if previous_height == new_height:
-                    logging.info("⚠️ No new content loaded after clicking 'Load More'. Stopping.")
-                    break
-            else:
-                logging.info("🔹 'Load More' button not found or not visible. Stopping.")
-                break
-        except Exception as e:
-            logging.warning(f"⚠️ Error clicking 'Load More': {e}")
-            break
 
 async def handle_helzberg(url, max_pages):
     """Scrape product data from Helzberg website with enhanced product information."""
@@ -144,16 +108,14 @@ async def handle_helzberg(url, max_pages):
 
     while current_url and pages_processed < max_pages:
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = '.row.product-grid'
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 
                 pages_processed += 1
 
                 # Scroll to load lazy content
-                for _ in range(3):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(2)
+                await scroll_until_loaded(page, "div.col-6.col-sm-4", max_scrolls=3)
 
                 # Get page title
                 page_title = await page.title()
@@ -163,6 +125,7 @@ async def handle_helzberg(url, max_pages):
                 if pages_processed > 1:
                     products = await page.query_selector_all("div.col-6.col-sm-4")
                 logging.info(f"Found {len(products)} products on page {pages_processed}")
+                report_progress("products_extracted", count=len(products))
 
                 # Process products on this page
                 async with aiohttp.ClientSession() as session:
@@ -324,7 +287,6 @@ async def handle_helzberg(url, max_pages):
                     current_url = None
 
                 await browser.close()
-                await random_delay(3, 5)  # Increased delay between pages
 
         except Exception as e:
             logging.error(f"Error processing page {pages_processed + 1}: {e}")
@@ -333,7 +295,7 @@ async def handle_helzberg(url, max_pages):
             break
     
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save Excel file
     filename = f"Helzberg_{current_date}_{time_only}.xlsx"
@@ -347,7 +309,5 @@ async def handle_helzberg(url, max_pages):
     update_product_count(len(all_records))
 
     # Return results
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
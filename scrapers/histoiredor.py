@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,12 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
 
 # Load .env variables
 load_dotenv()
@@ -70,6 +72,21 @@ async def download_image(session: httpx.AsyncClient, image_url: str, product_nam
     logging.error(f"Failed to download image for {product_name} after 3 attempts.")
     return "N/A"
 
+
+async def get_browser_with_proxy_strategy(p, url: str):
+    """Open a proxied page on url via the shared proxy strategy."""
+    async def goto(page, url, isbri_data):
+        await page.goto(url, timeout=120000)
+
+    return await open_proxied_browser(p, url, goto)
+
+
+RETAILER = {
+    "domains": ["www.histoiredor.com"],
+    "handler": "handle_histoiredor",
+}
+
+
 async def handle_histoiredor(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -99,18 +116,14 @@ async def handle_histoiredor(url, max_pages):
         previous_count = 0
         current_url = url
         while current_page <= max_pages:
-            async with async_playwright() as p:
-                # Create a new browser instance for each page
+            async with shared_playwright() as p:
+                # Open a proxied page for each page
                 if current_page > 1:
                     current_url = f"{url}?start={(current_page-1)*41}&sz=41"
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                page = await browser.new_page()
-
                 try:
-                    await page.goto(current_url, timeout=120000)
+                    browser, page = await get_browser_with_proxy_strategy(p, current_url)
                 except Exception as e:
                     logging.warning(f"Failed to load URL {url}: {e}")
-                    await browser.close()
                     continue
 
                 # Handle Didomi cookie consent popup
@@ -276,12 +289,13 @@ async def handle_histoiredor(url, max_pages):
                                 record[8]
                             )
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             current_page += 1
 
         if not records:
-            return None, None, None
+            return None, None
         # Save Excel
         filename = f'handle_histoiredor_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
@@ -295,8 +309,6 @@ async def handle_histoiredor(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
 
@@ -1,13 +1,16 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from api_capture import ApiCapture, tile_fields
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from flask import Flask
@@ -15,13 +18,13 @@ from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
 import httpx
 # Load environment variables from .env file
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
 
@@ -74,7 +77,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -87,10 +90,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 ########################################  safe_goto_and_wait ####################################################################
 
 
@@ -98,6 +97,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -115,7 +115,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -123,7 +123,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -132,128 +132,109 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
 ########################################  get browser with proxy ####################################################################
       
 
-async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
+async def get_browser_with_proxy_strategy(p, url: str, before_goto=None):
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait, before_goto=before_goto)
 
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
 
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
+def build_url_with_loadmore(base_url: str, page_count: int) -> str:
+    separator = '&' if '?' in base_url else '?'
+    return f"{base_url}{separator}loadMore={page_count}"   
 
 
+async def read_product_tile(product):
+    """Name, price, image URL and additional info of one product tile."""
+    additional_info = []
 
+    # Product Name
+    try:
+        product_name = await (await product.query_selector("h2.name.product-tile-description")).inner_text()
+    except:
+        product_name = "N/A"
 
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
+    # Price handling - capture both current and original price
+    price_info = []
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
+        current_price_elem = await product.query_selector("div.price app-format-price")
+        current_price = await current_price_elem.inner_text() if current_price_elem else "N/A"
+        price_info.append(current_price.strip())
+
+        original_price_elem = await product.query_selector("div.original-price app-format-price")
+        if original_price_elem:
+            original_price = await original_price_elem.inner_text()
+            if original_price.strip() and original_price.strip() != current_price.strip():
+                price_info.append(original_price.strip())
+                discount_elem = await product.query_selector("app-amor-tags .tag-text")
+                if discount_elem:
+                    discount_text = await discount_elem.inner_text()
+                    additional_info.append(f"Discount: {discount_text}")
     except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
+        logging.warning(f"Error getting price info: {str(e)}")
+        price_info = ["N/A"]
 
+    price = " | ".join(price_info) if len(price_info) > 0 else "N/A"
 
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
+    # Image URL
+    try:
+        image_url = await (await product.query_selector("img[itemprop='image']")).get_attribute("src")
+    except:
+        image_url = "N/A"
+
+    # Additional product info
+    try:
+        # Check for variations/swatches (colors available)
+        swatches = await product.query_selector_all(".available-swatch-image")
+        if swatches and len(swatches) > 1:
+            colors = []
+            for swatch in swatches:
+                try:
+                    title = await swatch.get_attribute("title")
+                    if title:
+                        colors.append(title)
+                except:
+                    continue
+            if colors:
+                additional_info.append(f"Colors: {', '.join(colors)}")
+    except:
+        pass
+
+    try:
+        # Check for promotions
+        promotion_elem = await product.query_selector("app-signet-product-category-promotion")
+        if promotion_elem:
+            promotion_text = await promotion_elem.inner_text()
+            if promotion_text.strip():
+                additional_info.append(f"Promotion: {promotion_text.strip()}")
+    except:
+        pass
 
+    try:
+        # Check for badges or special tags
+        badge_elem = await product.query_selector("app-secondary-badges .tag-container")
+        if badge_elem:
+            badge_text = await badge_elem.inner_text()
+            if badge_text.strip():
+                additional_info.append(f"Badge: {badge_text.strip()}")
+    except:
+        pass
 
+    # Combine all additional info with pipe delimiter
+    additional_info_str = " | ".join(additional_info) if additional_info else ""
 
+    return product_name, price, image_url, additional_info_str
+
+
+RETAILER = {
+    "domains": ["www.jared.com"],
+    "handler": "handle_jared",
+}
+
+# Grid data the storefront (SAP Commerce) loads its tiles from; see api_capture
+PRODUCT_API = {
+    "patterns": [r"/(?:search|c/[^?]+)/results\b", r"/productSearch\b"],
+    "page_param": "currentPage",
+}
 
-def build_url_with_loadmore(base_url: str, page_count: int) -> str:
-    separator = '&' if '?' in base_url else '?'
-    return f"{base_url}{separator}loadMore={page_count}"   
 
 async def handle_jared(url, max_pages):
     ip_address = get_public_ip()
@@ -278,6 +259,7 @@ async def handle_jared(url, max_pages):
 
     page_count = 0
     success_count = 0
+    capture = ApiCapture(PRODUCT_API)
 
     while page_count < max_pages:
         current_url = build_url_with_loadmore(url, page_count)
@@ -287,25 +269,29 @@ async def handle_jared(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
-                browser, page = await get_browser_with_proxy_strategy(p, current_url)
-                log_event(f"Successfully loaded: {current_url}")
-
-                # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    current_product_count = await page.locator('.product-item').count()
-                    if current_product_count == prev_product_count:
+            async with shared_playwright() as p:
+                products = None
+                if capture.replayable:
+                    # later pages come straight from the product API, after the last page it served
+                    products = await capture.replay()
+                    if products == []:
+                        logging.info("Product API has no further products; stopping")
                         break
-                    prev_product_count = current_product_count
-
-                product_wrapper = await page.query_selector("div.product-scroll-wrapper")
-                products = await product_wrapper.query_selector_all("div.product-item") if product_wrapper else []
+                if products is None:
+                    browser, page = await get_browser_with_proxy_strategy(p, current_url, before_goto=capture.attach)
+                    log_event(f"Successfully loaded: {current_url}")
+
+                    # Scroll to load all products
+                    await scroll_until_loaded(page, '.product-item')
+
+                    page_title = await page.title()
+                    products = await capture.wait()
+                    if not products:
+                        product_wrapper = await page.query_selector("div.product-scroll-wrapper")
+                        products = await product_wrapper.query_selector_all("div.product-item") if product_wrapper else []
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
-                page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
                 time_only = datetime.now().strftime("%H.%M")
 
@@ -313,41 +299,10 @@ async def handle_jared(url, max_pages):
                 image_tasks = []
 
                 for row_num, product in enumerate(products, start=len(sheet["A"]) + 1):
-                    additional_info = []
-                    
-                    # Product Name
-                    try:
-                        product_name = await (await product.query_selector("h2.name.product-tile-description")).inner_text()
-                    except:
-                        product_name = "N/A"
-
-                    # Price handling - capture both current and original price
-                    price_info = []
-                    try:
-                        current_price_elem = await product.query_selector("div.price app-format-price")
-                        current_price = await current_price_elem.inner_text() if current_price_elem else "N/A"
-                        price_info.append(current_price.strip())
-                        
-                        original_price_elem = await product.query_selector("div.original-price app-format-price")
-                        if original_price_elem:
-                            original_price = await original_price_elem.inner_text()
-                            if original_price.strip() and original_price.strip() != current_price.strip():
-                                price_info.append(original_price.strip())
-                                discount_elem = await product.query_selector("app-amor-tags .tag-text")
-                                if discount_elem:
-                                    discount_text = await discount_elem.inner_text()
-                                    additional_info.append(f"Discount: {discount_text}")
-                    except Exception as e:
-                        logging.warning(f"Error getting price info: {str(e)}")
-                        price_info = ["N/A"]
-                    
-                    price = " | ".join(price_info) if len(price_info) > 0 else "N/A"
-
-                    # Image URL
-                    try:
-                        image_url = await (await product.query_selector("img[itemprop='image']")).get_attribute("src")
-                    except:
-                        image_url = "N/A"
+                    if isinstance(product, dict):
+                        product_name, price, image_url, additional_info_str = tile_fields(product)
+                    else:
+                        product_name, price, image_url, additional_info_str = await read_product_tile(product)
 
                     if product_name == "N/A" or price == "N/A" or image_url == "N/A":
                         print(f"Skipping product due to missing data: Name: {product_name}, Price: {price}, Image: {image_url}")
@@ -362,47 +317,6 @@ async def handle_jared(url, max_pages):
                     diamond_weight_match = re.search(r"\d+[-/]?\d*/?\d*\s*ct\s*tw", product_name)
                     diamond_weight = diamond_weight_match.group() if diamond_weight_match else "N/A"
 
-                    # Additional product info
-                    try:
-                        # Check for variations/swatches (colors available)
-                        swatches = await product.query_selector_all(".available-swatch-image")
-                        if swatches and len(swatches) > 1:
-                            colors = []
-                            for swatch in swatches:
-                                try:
-                                    title = await swatch.get_attribute("title")
-                                    if title:
-                                        colors.append(title)
-                                except:
-                                    continue
-                            if colors:
-                                additional_info.append(f"Colors: {', '.join(colors)}")
-                    except:
-                        pass
-
-                    try:
-                        # Check for promotions
-                        promotion_elem = await product.query_selector("app-signet-product-category-promotion")
-                        if promotion_elem:
-                            promotion_text = await promotion_elem.inner_text()
-                            if promotion_text.strip():
-                                additional_info.append(f"Promotion: {promotion_text.strip()}")
-                    except:
-                        pass
-
-                    try:
-                        # Check for badges or special tags
-                        badge_elem = await product.query_selector("app-secondary-badges .tag-container")
-                        if badge_elem:
-                            badge_text = await badge_elem.inner_text()
-                            if badge_text.strip():
-                                additional_info.append(f"Badge: {badge_text.strip()}")
-                    except:
-                        pass
-
-                    # Combine all additional info with pipe delimiter
-                    additional_info_str = " | ".join(additional_info) if additional_info else ""
-
                     unique_id = str(uuid.uuid4())
                     image_tasks.append((row_num, unique_id, asyncio.create_task(
                         download_image_async(image_url, product_name, timestamp, image_folder, unique_id)
@@ -441,6 +355,7 @@ async def handle_jared(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -458,19 +373,15 @@ async def handle_jared(url, max_pages):
             if browser:
                 await browser.close()
             
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
     
     if not all_records:
-        return None, None, None    # Final save and database operations
+        return None, None    # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
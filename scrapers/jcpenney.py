@@ -1,13 +1,14 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from rate_limiter import throttle
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from flask import Flask
@@ -15,6 +16,7 @@ from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import aiohttp
 from io import BytesIO
@@ -65,7 +67,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)  # High-res version
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 # Try high-res version first
@@ -96,10 +98,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     return "N/A"
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 async def scroll_and_wait(page):
     """Scroll down to load lazy-loaded products."""
     previous_height = await page.evaluate("document.body.scrollHeight")
@@ -111,6 +109,7 @@ async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
 
 
@@ -125,7 +124,7 @@ async def safe_goto_and_wait(page, url, retries=3):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -133,7 +132,7 @@ async def safe_goto_and_wait(page, url, retries=3):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -142,6 +141,12 @@ async def safe_goto_and_wait(page, url, retries=3):
 
 
 
+RETAILER = {
+    "domains": ["www.jcpenney.com"],
+    "handler": "handle_jcpenney",
+}
+
+
 async def handle_jcpenney(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -167,7 +172,7 @@ async def handle_jcpenney(url, max_pages):
     page_count = 1
     success_count = 0
 
-    async with async_playwright() as p:
+    async with shared_playwright() as p:
         while page_count <= max_pages:
             current_url = f"{url}&page={page_count}"
             logging.info(f"Processing page {page_count}: {current_url}")
@@ -181,18 +186,12 @@ async def handle_jcpenney(url, max_pages):
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    current_product_count = await page.locator("li[data-automation-id^='list-item']").count()
-                    if current_product_count == prev_product_count:
-                        break
-                    prev_product_count = current_product_count
+                await scroll_until_loaded(page, "li[data-automation-id^='list-item']")
 
                 product_selector = 'ul[data-automation-id="gallery-product-list"] > li[data-automation-id^="list-item-"]'
                 products = await page.locator(product_selector).all()
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -360,6 +359,7 @@ async def handle_jcpenney(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -369,7 +369,6 @@ async def handle_jcpenney(url, max_pages):
                 logging.info(f"Progress saved after page {page_count}")
 
                 page_count += 1
-                await asyncio.sleep(random.uniform(2, 5))
 
             except Exception as e:
                 logging.error(f"Error processing page {page_count}: {str(e)}")
@@ -382,15 +381,13 @@ async def handle_jcpenney(url, max_pages):
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
     
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
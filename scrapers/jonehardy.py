@@ -3,8 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
 import time
 from datetime import datetime
 from io import BytesIO
@@ -14,9 +12,13 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from proxysetup import get_browser_with_proxy_strategy
 
@@ -76,7 +78,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
         filename = f"{unique_id}_{timestamp}.jpg"
         filepath = os.path.join(image_folder, filename)
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with tracked_client(timeout=30.0) as client:
             response = await client.get(clean_url)
             response.raise_for_status()
             
@@ -103,6 +105,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
 # Main scraper function
 
 
+RETAILER = {
+    "domains": ["johnhardy.com"],
+    "handler": "handle_jonehardy",
+}
+
+
 async def handle_jonehardy(url, max_pages):
     ip_address = get_public_ip()
     logging.info(
@@ -134,20 +142,13 @@ async def handle_jonehardy(url, max_pages):
         page = None
 
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 product_wrapper = ".product-card__wrapper"
                 browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all items
-                prev_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    count = await page.locator('.main-collection__grid').count()
-                    if count == prev_count:
-                        break
-                    prev_count = count
+                await scroll_until_loaded(page, '.main-collection__grid')
 
                 page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
@@ -276,6 +277,7 @@ async def handle_jonehardy(url, max_pages):
                     except asyncio.TimeoutError:
                         logging.warning(
                             f"Image download timed out for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 wb.save(file_path)
@@ -288,24 +290,20 @@ async def handle_jonehardy(url, max_pages):
                 await page.close()
             if browser:
                 await browser.close()
-            await asyncio.sleep(random.uniform(2, 5))
 
         page_count += 1
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
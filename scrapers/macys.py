@@ -3,9 +3,7 @@ import re
 import os
 import uuid
 import logging
-import base64
 import random
-import time
 from datetime import datetime
 from io import BytesIO
 from PIL import Image
@@ -15,13 +13,18 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as XLImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from api_capture import ApiCapture, tile_fields
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 # from proxysetup import get_browser_with_proxy_strategy
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
 
@@ -72,7 +75,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -107,10 +110,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     return "N/A"
 
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
 def build_macys_pagination_url(base_url: str, page_index: int) -> str:
     if page_index == 0:
         return base_url
@@ -146,6 +145,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -163,7 +163,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -171,7 +171,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -180,124 +180,149 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
 ########################################  get browser with proxy ####################################################################
       
 
-async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
+async def get_browser_with_proxy_strategy(p, url: str, before_goto=None):
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait, before_goto=before_goto)
 
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
 
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
+async def read_product_tile(product):
+    """Name, price, image URL and additional info of one product tile."""
+    try:
+        # Correct tag selector: h3 instead of div
+        product_name_tag = product.locator("h3.product-name.medium")
+        product_name = await product_name_tag.text_content() if await product_name_tag.count() > 0 else "N/A"
+        product_name = product_name.strip() if product_name else "N/A"
+    except Exception as e:
+        print(f"Product name extraction error: {e}")
+        product_name = "N/A"
+
 
+    price_info = []
 
+    try:
+        # Current price
+        current_price_tag = product.locator("span.discount.is-tier2")
+        if await current_price_tag.count() > 0:
+            current_price_text = await current_price_tag.first.text_content()
+            if current_price_text:
+                current_price = current_price_text.strip().split()[1]  # INR 433,003.00 → 433,003.00
+                price_info.append(f"Current price: INR {current_price}")
+
+        # Original price (strikethrough)
+        original_price_tag = product.locator("span.price-strike-sm")
+        if await original_price_tag.count() > 0:
+            original_price = await original_price_tag.first.text_content()
+            if original_price:
+                price_info.append(f"Original price: INR {original_price.strip()}")
+
+        # Fallback to regular price
+        if not price_info:
+            regular_price_tag = product.locator("span.price-reg.is-tier1")
+            if await regular_price_tag.count() > 0:
+                regular_price = await regular_price_tag.first.text_content()
+                if regular_price:
+                    price_info.append(f"Regular price: INR {regular_price.strip()}")
+
+    except Exception as e:
+        logging.warning(f"Error extracting price: {e}")
+        price_info = ["N/A"]
 
+    # Final output
+    price = " | ".join(price_info) if price_info else "N/A"
 
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
+
+
+    # Image extraction with fallbacks
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
+        active_slideshow = product.locator('li.slideshow-item.active .picture-container source').first
+        if await active_slideshow.count() > 0:
+            image_url = await active_slideshow.get_attribute("srcset")
+        else:
+            image_url = "N/A"
     except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
+        image_url = "N/A"
 
+    additional_info = []
 
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
+    try:
+        # Extract discount tags like "(35% off)"
+        discount_locator = product.locator("span.sale-percent.percent-small")
+        discount_count = await discount_locator.count()
+
+        if discount_count > 0:
+            for i in range(discount_count):
+                discount_text = await discount_locator.nth(i).inner_text()
+                if discount_text and discount_text.strip():
+                    additional_info.append(discount_text.strip())
+        else:
+            additional_info.append("N/A")
+    except Exception as e:
+        print(f"Discount extraction error: {e}")
+        additional_info.append("N/A")
+
+
+    try:
+        # Extract promotional tags: "New", "Bonus Offer", etc.
+        tag_locator = product.locator("div.tile-buttons span, div.badge-wrapper span")
+        tag_count = await tag_locator.count()
+
+        if tag_count > 0:
+            for i in range(tag_count):
+                tag_text = await tag_locator.nth(i).inner_text()
+                if tag_text and tag_text.strip():
+                    additional_info.append(tag_text.strip())
+        else:
+            additional_info.append("N/A")
+    except Exception as e:
+        print(f"Tag extraction error: {e}")
+        additional_info.append("N/A")
+
+    # Extract Rating (e.g., "Rated 3.625 out of 5")
+    try:
+        rating_locator = product.locator("div.rating span[aria-label]")
+        if await rating_locator.count() > 0:
+            rating_text = await rating_locator.first.get_attribute("aria-label")
+            if rating_text:
+                additional_info.append(rating_text.strip())
+    except Exception as e:
+        print(f"Rating extraction error: {e}")
+
+    # Extract Review Count (e.g., "8 reviews")
+    try:
+        review_locator = product.locator("div.rating .rating-description span[aria-label]")
+        if await review_locator.count() > 0:
+            review_text = await review_locator.first.get_attribute("aria-label")
+            if review_text:
+                additional_info.append(review_text.strip())
+    except Exception as e:
+        print(f"Review count extraction error: {e}")
+
+    # Join all into a single string
+    additional_info_str = " | ".join(additional_info) if additional_info else "N/A"
+
+    return product_name, price, image_url, additional_info_str
+
+
+RETAILER = {
+    "domains": ["www.macys.com"],
+    "handler": "handle_macys",
+}
+
+# Grid data from Macy's discovery API; field paths follow its product objects
+PRODUCT_API = {
+    "patterns": [r"/xapi/discover/v1/page\b"],
+    "fields": {
+        "name": "product.detail.name",
+        "price": "product.pricing.price.tieredPrice.0.values.0.formattedValue",
+        "image": "product.imagery.primaryImage.filePath",
+        "url": "product.identifier.productUrl",
+        "id": "product.id",
+    },
+    "image_base": "https://slimages.macysassets.com/is/image/MCY/products/",
+    "page_param": "pageIndex",
+}
 
 
-    
 async def handle_macys(url, max_pages):
     ip_address = get_public_ip()
     
@@ -321,87 +346,45 @@ async def handle_macys(url, max_pages):
 
     page_count = 1
     success_count = 0
+    capture = ApiCapture(PRODUCT_API)
 
-    async with async_playwright() as p:
+    async with shared_playwright() as p:
         while page_count <= max_pages:
             current_url = build_macys_pagination_url(url, page_count)
             browser = None
             page = None
             try:
                 product_wrapper = ".product-thumbnail-container"
-                browser, page = await get_browser_with_proxy_strategy(p, current_url)
-                log_event(f"Successfully loaded: {current_url}")
+                products = None
+                if capture.replayable:
+                    # later pages come straight from the product API, after the last page it served
+                    products = await capture.replay()
+                    if products == []:
+                        logging.info("Product API has no further products; stopping")
+                        break
+                if products is None:
+                    browser, page = await get_browser_with_proxy_strategy(p, current_url, before_goto=capture.attach)
+                    log_event(f"Successfully loaded: {current_url}")
+
+                    page_title = await page.title()
+                    products = await capture.wait()
+                    if not products:
+                        product_container = page.locator("ul.grid-x.small-up-2").first
+                        products = await product_container.locator("li.cell.sortablegrid-product").all()
 
-                page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
                 time_only = datetime.now().strftime("%H.%M")
 
-                product_container = page.locator("ul.grid-x.small-up-2").first
-                products = await product_container.locator("li.cell.sortablegrid-product").all()
-
                 logging.info(f"Total products scraped: {len(products)}")
+                report_progress("products_extracted", count=len(products))
                 records = []
                 image_tasks = []
 
                 for row_num, product in enumerate(products, start=len(sheet["A"]) + 1):
-                    
-                    
-                    try:
-                        # Correct tag selector: h3 instead of div
-                        product_name_tag = product.locator("h3.product-name.medium")
-                        product_name = await product_name_tag.text_content() if await product_name_tag.count() > 0 else "N/A"
-                        product_name = product_name.strip() if product_name else "N/A"
-                    except Exception as e:
-                        print(f"Product name extraction error: {e}")
-                        product_name = "N/A"
-
-
-                    price_info = []
-
-                    try:
-                        # Current price
-                        current_price_tag = product.locator("span.discount.is-tier2")
-                        if await current_price_tag.count() > 0:
-                            current_price_text = await current_price_tag.first.text_content()
-                            if current_price_text:
-                                current_price = current_price_text.strip().split()[1]  # INR 433,003.00 → 433,003.00
-                                price_info.append(f"Current price: INR {current_price}")
-
-                        # Original price (strikethrough)
-                        original_price_tag = product.locator("span.price-strike-sm")
-                        if await original_price_tag.count() > 0:
-                            original_price = await original_price_tag.first.text_content()
-                            if original_price:
-                                price_info.append(f"Original price: INR {original_price.strip()}")
-
-                        # Fallback to regular price
-                        if not price_info:
-                            regular_price_tag = product.locator("span.price-reg.is-tier1")
-                            if await regular_price_tag.count() > 0:
-                                regular_price = await regular_price_tag.first.text_content()
-                                if regular_price:
-                                    price_info.append(f"Regular price: INR {regular_price.strip()}")
-
-                    except Exception as e:
-                        logging.warning(f"Error extracting price: {e}")
-                        price_info = ["N/A"]
-
-                    # Final output
-                    price = " | ".join(price_info) if price_info else "N/A"
-
-
-
-                    # Image extraction with fallbacks
-                    try:
-                        active_slideshow = product.locator('li.slideshow-item.active .picture-container source').first
-                        if await active_slideshow.count() > 0:
-                            image_url = await active_slideshow.get_attribute("srcset")
-                        else:
-                            image_url = "N/A"
-                    except Exception as e:
-                        image_url = "N/A"
-
-                   
+                    if isinstance(product, dict):
+                        product_name, price, image_url, additional_info_str = tile_fields(product)
+                    else:
+                        product_name, price, image_url, additional_info_str = await read_product_tile(product)
 
                     gold_type_match = re.search(r"\b\d{1,2}K\s*(?:White|Yellow|Rose)?\s*Gold\b|\bPlatinum\b|\bSilver\b", product_name, re.IGNORECASE)
                     kt = gold_type_match.group() if gold_type_match else "Not found"
@@ -411,63 +394,6 @@ async def handle_macys(url, max_pages):
                     diamond_weight = diamond_weight_match.group() if diamond_weight_match else "N/A"
                     
                     
-                    additional_info = []
-                    
-                    try:
-                        # Extract discount tags like "(35% off)"
-                        discount_locator = product.locator("span.sale-percent.percent-small")
-                        discount_count = await discount_locator.count()
-
-                        if discount_count > 0:
-                            for i in range(discount_count):
-                                discount_text = await discount_locator.nth(i).inner_text()
-                                if discount_text and discount_text.strip():
-                                    additional_info.append(discount_text.strip())
-                        else:
-                            additional_info.append("N/A")
-                    except Exception as e:
-                        print(f"Discount extraction error: {e}")
-                        additional_info.append("N/A")
-
-
-                    try:
-                        # Extract promotional tags: "New", "Bonus Offer", etc.
-                        tag_locator = product.locator("div.tile-buttons span, div.badge-wrapper span")
-                        tag_count = await tag_locator.count()
-
-                        if tag_count > 0:
-                            for i in range(tag_count):
-                                tag_text = await tag_locator.nth(i).inner_text()
-                                if tag_text and tag_text.strip():
-                                    additional_info.append(tag_text.strip())
-                        else:
-                            additional_info.append("N/A")
-                    except Exception as e:
-                        print(f"Tag extraction error: {e}")
-                        additional_info.append("N/A")
-
-                    # Extract Rating (e.g., "Rated 3.625 out of 5")
-                    try:
-                        rating_locator = product.locator("div.rating span[aria-label]")
-                        if await rating_locator.count() > 0:
-                            rating_text = await rating_locator.first.get_attribute("aria-label")
-                            if rating_text:
-                                additional_info.append(rating_text.strip())
-                    except Exception as e:
-                        print(f"Rating extraction error: {e}")
-
-                    # Extract Review Count (e.g., "8 reviews")
-                    try:
-                        review_locator = product.locator("div.rating .rating-description span[aria-label]")
-                        if await review_locator.count() > 0:
-                            review_text = await review_locator.first.get_attribute("aria-label")
-                            if review_text:
-                                additional_info.append(review_text.strip())
-                    except Exception as e:
-                        print(f"Review count extraction error: {e}")
-
-                    # Join all into a single string
-                    additional_info_str = " | ".join(additional_info) if additional_info else "N/A"
 
 
                     
@@ -515,6 +441,7 @@ async def handle_macys(url, max_pages):
                         logging.warning(f"Image download timed out for row {row_num}")
                     except Exception as e:
                         logging.error(f"Error processing image task for row {row_num}, unique_id {unique_id}: {e}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -532,24 +459,19 @@ async def handle_macys(url, max_pages):
                 if browser:
                     await browser.close()
                 
-                # Add delay between pages
-                await asyncio.sleep(random.uniform(2, 5))
-            
             page_count += 1
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
+    return filename, file_path
 
 
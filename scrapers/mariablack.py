@@ -3,9 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
-import random
-import time
 from datetime import datetime
 from io import BytesIO
 import httpx
@@ -14,9 +11,13 @@ from openpyxl import Workbook
 from openpyxl.drawing.image import Image as ExcelImage
 from flask import Flask
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from usage_ledger import tracked_client
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import json
 import mimetypes
@@ -108,7 +109,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"  # Always save as JPG
     image_full_path = os.path.join(image_folder, image_filename)
     
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url)
@@ -137,44 +138,13 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-# Human-like delay
-def random_delay(min_sec=1, max_sec=3):
-    time.sleep(random.uniform(min_sec, max_sec))
-
-# Scroll to bottom of page to load all products
-async def scroll_to_bottom(page, max_wait_time=60):
-    """Scrolls to the bottom of the page until no more content is loaded or timeout."""
-    import time
-    start_time = time.time()
-    
-    last_height = await page.evaluate("() => document.body.scrollHeight")
-    
-    while True:
-        # Scroll to the bottom of the page
-        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-        await asyncio.sleep(random.uniform(1.5, 3.0))  # Slightly longer wait for dynamic content
-
-        # Wait for any lazy-loaded content to appear
-        try:
-            await page.wait_for_timeout(1000)  # 1 second delay
-        except:
-            pass
-
-        # Check scroll height again
-        new_height = await page.evaluate("() => document.body.scrollHeight")
-
-        if new_height == last_height:
-            print("✅ Reached the bottom of the page.")
-            break
-
-        if time.time() - start_time > max_wait_time:
-            print("⚠️ Scroll timed out after max_wait_time.")
-            break
-
-        last_height = new_height
+# Main scraper function
+RETAILER = {
+    "domains": ["www.maria-black.com"],
+    "handler": "handle_mariablack",
+}
 
 
-# Main scraper function
 async def handle_mariablack(url, max_pages=None):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}")
@@ -196,12 +166,12 @@ async def handle_mariablack(url, max_pages=None):
     file_path = os.path.join(EXCEL_DATA_PATH, filename)
     
     try:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             browser, page = await get_browser_with_proxy_strategy(p, url, "div.listing-page")
             log_event(f"Successfully loaded: {url}")
 
             # Scroll to load all items
-            await scroll_to_bottom(page)
+            await scroll_until_loaded(page, "div[data-product-listing-result-id]", max_scrolls=50)
             
             page_title = await page.title()
             current_date = datetime.now().strftime("%Y-%m-%d")
@@ -349,6 +319,7 @@ async def handle_mariablack(url, max_pages=None):
                             break
                 except asyncio.TimeoutError:
                     logging.warning(f"Image download timed out for row {row_num}")
+            report_progress("images_downloaded", count=len(image_tasks))
 
             all_records.extend(records)
             wb.save(file_path)
@@ -361,16 +332,14 @@ async def handle_mariablack(url, max_pages=None):
         if browser: await browser.close()
 
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Final save and database operations
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
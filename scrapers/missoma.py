@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,12 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
+from usage_ledger import tracked_client
 from proxysetup import get_browser_with_proxy_strategy
 # Load .env variables
 load_dotenv()
@@ -51,7 +53,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
  
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(image_url, headers=headers)
@@ -76,6 +78,12 @@ async def safe_click_with_retry(element, max_retries=3):
             await asyncio.sleep(1 * (attempt + 1))
     return False
 
+RETAILER = {
+    "domains": ["www.missoma.com"],
+    "handler": "handle_missoma",
+}
+
+
 async def handle_missoma(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -105,7 +113,7 @@ async def handle_missoma(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 # Create a new browser instance for each page
                 browser, page = await get_browser_with_proxy_strategy(p, url, "ol.ais-InfiniteHits-list")
 
@@ -291,6 +299,7 @@ async def handle_missoma(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
@@ -308,7 +317,5 @@ async def handle_missoma(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
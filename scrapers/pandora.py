@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,14 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError,Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from proxysetup import open_proxied_browser
+from infinite_scroll import scroll_until_loaded, item_count, wait_for_more_items
+from usage_ledger import tracked_client
 
 
 import random
@@ -51,10 +55,6 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64; rv:89.0) Gecko/20100101 Firefox/89.0"
 ]
 
-async def random_delay(min_sec=1, max_sec=3):
-    """Asynchronous random delay with jitter"""
-    await asyncio.sleep(random.uniform(min_sec, max_sec))
-
 async def download_image_async(image_url, product_name, timestamp, image_folder, unique_id, retries=3):
     """Enhanced image downloader with anti-blocking features"""
     if not image_url or image_url == "N/A":
@@ -74,7 +74,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_filename = f"{unique_id}_{timestamp}.jpg"
     image_path = os.path.join(image_folder, image_filename)
 
-    async with httpx.AsyncClient(
+    async with tracked_client(
         headers=headers,
         timeout=30.0,
         follow_redirects=True,
@@ -117,6 +117,7 @@ async def safe_goto_and_wait(page, url, retries=3):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
 
             # Corrected selector
@@ -138,6 +139,36 @@ async def safe_goto_and_wait(page, url, retries=3):
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise   
 
+
+async def get_browser_with_proxy_strategy(p, url: str):
+    """Open a proxied page on url via the shared proxy strategy."""
+    async def goto(page, url, isbri_data):
+        await safe_goto_and_wait(page, url)
+
+    return await open_proxied_browser(
+        p, url, goto,
+        context_options={
+            "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                          "(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+            "viewport": {"width": 1920, "height": 1080},
+            "extra_http_headers": {
+                "Accept-Language": "en-US,en;q=0.9",
+                "Sec-Fetch-Dest": "document",
+                "Sec-Fetch-Mode": "navigate",
+                "Sec-Fetch-Site": "same-origin",
+                "Sec-Fetch-User": "?1"
+            },
+        },
+        before_goto=lambda page: page.set_default_timeout(120000),  # 2 minute timeout
+    )
+
+
+RETAILER = {
+    "domains": ["us.pandora.net"],
+    "handler": "handle_pandora",
+}
+
+
 async def handle_pandora(url, max_pages):
     
     ip_address = get_public_ip()
@@ -168,38 +199,22 @@ async def handle_pandora(url, max_pages):
     previous_count = 0
 
     while load_more_clicks <= max_pages:
-        async with async_playwright() as p:
+        async with shared_playwright() as p:
             # Create a new browser instance for each page
-            browser = await p.chromium.connect_over_cdp(PROXY_URL)
-            context = await browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
-                viewport={"width": 1920, "height": 1080},
-                extra_http_headers={
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "Sec-Fetch-Dest": "document",
-                    "Sec-Fetch-Mode": "navigate",
-                    "Sec-Fetch-Site": "same-origin",
-                    "Sec-Fetch-User": "?1"
-                }
-            )
-            page = await context.new_page()
-            page.set_default_timeout(120000)  # 2 minute timeout
-            
-            await safe_goto_and_wait(page, url)
+            browser, page = await get_browser_with_proxy_strategy(p, url)
             log_event(f"Successfully loaded: {url}")
 
             
             
             # Scroll and load handling
-            scroll_attempts = 0
-            while scroll_attempts < max_pages * 2:
-                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                await asyncio.sleep(random.uniform(1.5, 3.0))
-                scroll_attempts += 1
+            for _ in range(max_pages * 2):
+                await scroll_until_loaded(page, "div.css-rklm6r")
                 try:
                     await page.wait_for_selector('button[data-auto="btnPLPShowMore"]:not(:disabled)', timeout=5000)
+                    shown = await item_count(page, "div.css-rklm6r")
                     await page.click('button[data-auto="btnPLPShowMore"]')
-                    await asyncio.sleep(2)
+                    if not await wait_for_more_items(page, "div.css-rklm6r", shown):
+                        break
                 except (TimeoutError, Error):
                     break
 
@@ -274,6 +289,7 @@ async def handle_pandora(url, max_pages):
                     if record[0] == unique_id:
                         records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7])
                         break
+            report_progress("images_downloaded", count=len(image_tasks))
 
             await browser.close()
         load_more_clicks += 1
@@ -291,7 +307,5 @@ async def handle_pandora(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
@@ -3,7 +3,6 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
@@ -11,9 +10,11 @@ from flask import Flask
 from dotenv import load_dotenv
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 from proxysetup import get_browser_with_proxy_strategy
 # Load .env variables
 load_dotenv()
@@ -44,6 +45,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["smilingrocks.com"],
+    "handler": "handle_smilingrocks",
+}
+
+
 async def handle_smilingrocks(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -73,7 +80,7 @@ async def handle_smilingrocks(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 # Create a new browser instance for each page
                 product_wrapper = "div.plp__grid"
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
@@ -221,12 +228,13 @@ async def handle_smilingrocks(url, max_pages):
                             records[i] = (record[0], record[1], record[2], record[3], image_path, 
                                          record[5], record[6], record[7], record[8])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
 
         if not records:
-            return None, None, None
+            return None, None
         # Save Excel
         filename = f'handle_smilingrocks_{datetime.now().strftime("%Y-%m-%d_%H.%M")}.xlsx'
         file_path = os.path.join(EXCEL_DATA_PATH, filename)
@@ -240,7 +248,5 @@ async def handle_smilingrocks(url, max_pages):
 
         update_product_count(len(seen_ids))
 
-        with open(file_path, "rb") as f:
-            base64_encoded = base64.b64encode(f.read()).decode("utf-8")
 
-        return base64_encoded, filename, file_path
+        return filename, file_path
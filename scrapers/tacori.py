@@ -3,16 +3,17 @@ import re
 import os
 import uuid
 import logging
-import base64
 from datetime import datetime
 from xml.dom.minidom import Document
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from utils import get_public_ip, log_event
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 import httpx
-from playwright.async_api import async_playwright, TimeoutError
+from playwright.async_api import TimeoutError
+from scraper_loop import shared_playwright
 from proxysetup import get_browser_with_proxy_strategy
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -37,6 +38,12 @@ async def download_image(session, image_url, product_name, timestamp, image_fold
     logging.error(f"Failed to download {product_name} after 3 attempts.")
     return "N/A"
 
+RETAILER = {
+    "domains": ["www.tacori.com"],
+    "handler": "handle_tacori",
+}
+
+
 async def handle_tacori(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Starting scrape for {url} from IP: {ip_address}")
@@ -66,7 +73,7 @@ async def handle_tacori(url, max_pages):
         previous_count = 0
 
         while load_more_clicks <= max_pages:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 # Create a new browser instance for each page
                 product_wrapper = '.LayoutDefault-children'
                 browser, page = await get_browser_with_proxy_strategy(p, url, product_wrapper)
@@ -214,6 +221,7 @@ async def handle_tacori(url, max_pages):
                         if record[0] == unique_id:
                             records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8])
                             break
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 await browser.close()
             load_more_clicks += 1
@@ -224,22 +232,19 @@ async def handle_tacori(url, max_pages):
         
     
         if not records:
-            return None, None, None
+            return None, None
 
         # Save the workbook
         wb.save(file_path)
         log_event(f"Data saved to {file_path}")
 
-        # Encode the file in base64
-        with open(file_path, "rb") as file:
-            base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
         # Insert data into the database and update product count
         insert_into_db(records)
         update_product_count(len(records))
 
         # Return necessary information
-        return base64_encoded, filename, file_path
+        return filename, file_path
 
 
        
\ No newline at end of file
@@ -1,23 +1,24 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from usage_ledger import tracked_client
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 import httpx
 from proxysetup import get_browser_with_proxy_strategy
+from paginator import fetch_pages
 from typing import List, Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
@@ -67,7 +68,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -80,10 +81,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 
 ########################################  safe_goto_and_wait ####################################################################
 
@@ -94,6 +91,12 @@ def build_url_with_loadmore(base_url: str, page_count: int) -> str:
     return f"{base_url}{separator}page={page_count}"   
          
 ########################################  Main Function Call ####################################################################
+RETAILER = {
+    "domains": ["www.tiffany.com"],
+    "handler": "handle_tiffany",
+}
+
+
 async def handle_tiffany(url, max_pages):
     ip_address = get_public_ip()
     logging.info(f"Scraping started for: {url} from IP: {ip_address}, max_pages: {max_pages}")
@@ -113,200 +116,183 @@ async def handle_tiffany(url, max_pages):
     filename = f"handle_tiffany_{datetime.now().strftime('%Y-%m-%d_%H.%M')}.xlsx"
     file_path = os.path.join(EXCEL_DATA_PATH, filename)
 
-    page_count = 1
-    success_count = 0
-
-    async with async_playwright() as p:
-        while page_count <= max_pages:
-            current_url = build_url_with_loadmore(url, page_count)
-            # logging.info(f"Processing page {page_count}: {current_url}")
-            browser = None
-            page = None
-            
-            try:
-                
-                product_wrapper = ".wrapper"
-                browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
-                log_event(f"Successfully loaded: {current_url}")
-                
-
-
-                product_wrapper = await page.query_selector("div.browse-grid")
-                products = await product_wrapper.query_selector_all("div.layout_1x1") if product_wrapper else []
-                logging.info(f"Total products found on page {page_count}: {len(products)}")
-
-                page_title = await page.title()
-                current_date = datetime.now().strftime("%Y-%m-%d")
-                time_only = datetime.now().strftime("%H.%M")
-
-                records = []
-                image_tasks = []
-
-                for row_num, product in enumerate(products, start=len(sheet["A"]) + 1):
-                    try:
-                        name_container = await product.query_selector("p.product-tile__details_name")
-                        if name_container:
-                            span_elements = await name_container.query_selector_all("span.product-tile__details_name__split")
-                            parts = [await span.text_content() for span in span_elements]
-                            product_name = " ".join(part.strip() for part in parts if part).strip()
-                        else:
-                            product_name = "N/A"
-                    except:
+    async def fetch_page(page_number, current_url):
+        """Load one listing page; return its tile count and (record, sheet row) pairs, image paths filled in."""
+        browser = None
+        page = None
+        try:
+            product_wrapper = ".wrapper"
+            browser, page = await get_browser_with_proxy_strategy(p, current_url, product_wrapper)
+            log_event(f"Successfully loaded: {current_url}")
+
+            product_wrapper = await page.query_selector("div.browse-grid")
+            products = await product_wrapper.query_selector_all("div.layout_1x1") if product_wrapper else []
+            logging.info(f"Total products found on page {page_number}: {len(products)}")
+            report_progress("products_extracted", count=len(products))
+
+            page_title = await page.title()
+            current_date = datetime.now().strftime("%Y-%m-%d")
+            time_only = datetime.now().strftime("%H.%M")
+
+            rows = []
+            image_tasks = []
+
+            for product in products:
+                try:
+                    name_container = await product.query_selector("p.product-tile__details_name")
+                    if name_container:
+                        span_elements = await name_container.query_selector_all("span.product-tile__details_name__split")
+                        parts = [await span.text_content() for span in span_elements]
+                        product_name = " ".join(part.strip() for part in parts if part).strip()
+                    else:
                         product_name = "N/A"
+                except:
+                    product_name = "N/A"
 
 
-                    try:
-                        price_tag = await product.query_selector('p.product-tile__details_price')
-                        price = await price_tag.text_content() if price_tag else "N/A"
-                    except Exception as e:
-                        print(f"Error fetching price: {e}")
-                        price = "N/A"
+                try:
+                    price_tag = await product.query_selector('p.product-tile__details_price')
+                    price = await price_tag.text_content() if price_tag else "N/A"
+                except Exception as e:
+                    print(f"Error fetching price: {e}")
+                    price = "N/A"
 
 
-                    try:
-                        img_el = await product.query_selector("div.tiffany-picture img")
-                        image_url = "N/A"
+                try:
+                    img_el = await product.query_selector("div.tiffany-picture img")
+                    image_url = "N/A"
 
-                        if img_el:
-                            # Prefer data-srcset (higher-res, often used in lazy loading)
-                            data_srcset = await img_el.get_attribute("data-srcset")
-                            if data_srcset:
-                                options = [url.strip().split()[0] for url in data_srcset.split(",")]
+                    if img_el:
+                        # Prefer data-srcset (higher-res, often used in lazy loading)
+                        data_srcset = await img_el.get_attribute("data-srcset")
+                        if data_srcset:
+                            options = [url.strip().split()[0] for url in data_srcset.split(",")]
+                            if options:
+                                image_url = options[0]
+                        else:
+                            # Fallback to srcset
+                            srcset = await img_el.get_attribute("srcset")
+                            if srcset:
+                                options = [url.strip().split()[0] for url in srcset.split(",")]
                                 if options:
                                     image_url = options[0]
                             else:
-                                # Fallback to srcset
-                                srcset = await img_el.get_attribute("srcset")
-                                if srcset:
-                                    options = [url.strip().split()[0] for url in srcset.split(",")]
-                                    if options:
-                                        image_url = options[0]
-                                else:
-                                    # Fallback to src
-                                    image_url = await img_el.get_attribute("src")
-
-                        # Ensure image_url has a proper scheme
-                        if image_url and image_url.startswith("//"):
-                            image_url = "https:" + image_url
-                        elif image_url and image_url.startswith("/"):
-                            image_url = "https://www.tiffany.com" + image_url
-                        elif image_url and not image_url.startswith("http"):
-                            image_url = "https://www.tiffany.com/" + image_url.lstrip("/")
-
-                    except Exception as e:
-                        print(f"Image extraction error: {e}")
-                        image_url = "N/A"
+                                # Fallback to src
+                                image_url = await img_el.get_attribute("src")
+
+                    # Ensure image_url has a proper scheme
+                    if image_url and image_url.startswith("//"):
+                        image_url = "https:" + image_url
+                    elif image_url and image_url.startswith("/"):
+                        image_url = "https://www.tiffany.com" + image_url
+                    elif image_url and not image_url.startswith("http"):
+                        image_url = "https://www.tiffany.com/" + image_url.lstrip("/")
+
+                except Exception as e:
+                    print(f"Image extraction error: {e}")
+                    image_url = "N/A"
   
-                    # print(image_url)
+                # print(image_url)
    
-                    additional_info = []
+                additional_info = []
 
-                    try:
-                        # Select both "New" tags and any future promotional tags
-                        tag_els = await product.query_selector_all("div.tile-buttons span")
+                try:
+                    # Select both "New" tags and any future promotional tags
+                    tag_els = await product.query_selector_all("div.tile-buttons span")
                         
-                        if tag_els:
-                            for tag_el in tag_els:
-                                tag_text = await tag_el.inner_text()
-                                if tag_text and tag_text.strip():
-                                    additional_info.append(tag_text.strip())
-                        else:
-                            additional_info.append("N/A")
-
-                    except Exception as e:
-                        print(f"Tag extraction error: {e}")
+                    if tag_els:
+                        for tag_el in tag_els:
+                            tag_text = await tag_el.inner_text()
+                            if tag_text and tag_text.strip():
+                                additional_info.append(tag_text.strip())
+                    else:
                         additional_info.append("N/A")
 
-                    additional_info_str = " | ".join(additional_info)
+                except Exception as e:
+                    print(f"Tag extraction error: {e}")
+                    additional_info.append("N/A")
+
+                additional_info_str = " | ".join(additional_info)
 
 
                     
                     
-                    if product_name == "N/A" or price == "N/A" or image_url == "N/A":
-                        print(f"Skipping product due to missing data: Name: {product_name}, Price: {price}, Image: {image_url}")
-                        continue    
+                if product_name == "N/A" or price == "N/A" or image_url == "N/A":
+                    print(f"Skipping product due to missing data: Name: {product_name}, Price: {price}, Image: {image_url}")
+                    continue    
                     
                     
 
-                    gold_type_match = re.search(r"\b\d{1,2}K\s*(?:White|Yellow|Rose)?\s*Gold\b|\bPlatinum\b|\bSilver\b", product_name, re.IGNORECASE)
-                    kt = gold_type_match.group() if gold_type_match else "Not found"
-
-
-                    diamond_weight_match = re.search(r"\d+(?:[-/]\d+)?(?:\s+\d+/\d+)?\s*ct\s+tw", product_name, re.IGNORECASE)
-                    diamond_weight = diamond_weight_match.group() if diamond_weight_match else "N/A"
-
-
-                    unique_id = str(uuid.uuid4())
-                    image_tasks.append((row_num, unique_id, asyncio.create_task(
-                        download_image_async(image_url, product_name, timestamp, image_folder, unique_id)
-                    )))
-
-                    records.append((unique_id, current_date, page_title, product_name, None, kt, price, diamond_weight,additional_info_str))
-                    sheet.append([current_date, page_title, product_name, None, kt, price, diamond_weight, time_only, image_url,additional_info_str])
-
-                # Process images and update records
-                for row_num, unique_id, task in image_tasks:
-                    try:
-                        image_path = await asyncio.wait_for(task, timeout=60)
-                        if image_path != "N/A":
-                            try:
-                                img = Image(image_path)
-                                img.width, img.height = 100, 100
-                                sheet.add_image(img, f"D{row_num}")
-                            except Exception as img_error:
-                                logging.error(f"Error adding image to Excel: {img_error}")
-                                image_path = "N/A"
-                        
-                        for i, record in enumerate(records):
-                            if record[0] == unique_id:
-                                records[i] = (record[0], record[1], record[2], record[3], image_path, record[5], record[6], record[7], record[8])
-                                break
-                    except asyncio.TimeoutError:
-                        logging.warning(f"Timeout downloading image for row {row_num}")
-
-                all_records.extend(records)
-                success_count += 1
-
-                # Save progress after each page
-                wb.save(file_path)
-                logging.info(f"Progress saved after page {page_count}")
-                if page:
-                    await page.close()
-                if browser:
-                    await browser.close()
-                
-                page_count += 1
-                await asyncio.sleep(random.uniform(2, 5))
-                
-            except Exception as e:
-                logging.error(f"Error processing page {page_count}: {str(e)}")
-                if page:
-                    await page.close()
-                if browser:
-                    await browser.close()
-                wb.save(file_path)
-                continue
-            
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
-        page_count += 1
+                gold_type_match = re.search(r"\b\d{1,2}K\s*(?:White|Yellow|Rose)?\s*Gold\b|\bPlatinum\b|\bSilver\b", product_name, re.IGNORECASE)
+                kt = gold_type_match.group() if gold_type_match else "Not found"
+
+
+                diamond_weight_match = re.search(r"\d+(?:[-/]\d+)?(?:\s+\d+/\d+)?\s*ct\s+tw", product_name, re.IGNORECASE)
+                diamond_weight = diamond_weight_match.group() if diamond_weight_match else "N/A"
+
+
+                unique_id = str(uuid.uuid4())
+                image_tasks.append(asyncio.create_task(
+                    download_image_async(image_url, product_name, timestamp, image_folder, unique_id)
+                ))
+
+                rows.append((
+                    (unique_id, current_date, page_title, product_name, None, kt, price, diamond_weight, additional_info_str),
+                    [current_date, page_title, product_name, None, kt, price, diamond_weight, time_only, image_url, additional_info_str],
+                ))
+
+            # Wait for the images and put their paths into the records
+            results = []
+            for (record, sheet_row), task in zip(rows, image_tasks):
+                try:
+                    image_path = await asyncio.wait_for(task, timeout=60)
+                except asyncio.TimeoutError:
+                    logging.warning(f"Timeout downloading image for {record[3]}")
+                    image_path = "N/A"
+                results.append((record[:4] + (image_path,) + record[5:], sheet_row))
+            report_progress("images_downloaded", count=len(image_tasks))
+            # the crawl ends on a page without tiles, not one whose tiles were all skipped
+            return len(products), results
+        finally:
+            if page:
+                await page.close()
+            if browser:
+                await browser.close()
+
+    def on_page(page_number, results):
+        # pages arrive in order, so rows land in the sheet in page order
+        for record, sheet_row in results:
+            sheet.append(sheet_row)
+            image_path = record[4]
+            if image_path != "N/A":
+                try:
+                    img = Image(image_path)
+                    img.width, img.height = 100, 100
+                    sheet.add_image(img, f"D{sheet.max_row}")
+                except Exception as img_error:
+                    logging.error(f"Error adding image to Excel: {img_error}")
+                    record = record[:4] + ("N/A",) + record[5:]
+            all_records.append(record)
+
+        # Save progress after each page
+        wb.save(file_path)
+        logging.info(f"Progress saved after page {page_number}")
+
+    async with shared_playwright() as p:
+        await fetch_pages(lambda page_number: build_url_with_loadmore(url, page_number), max_pages, fetch_page, on_page)
 
     # # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
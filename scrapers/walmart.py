@@ -1,18 +1,22 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from api_capture import ApiCapture, tile_fields
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
@@ -21,8 +25,7 @@ from urllib.parse import urlencode, urlparse, parse_qs, urlunparse
 from dotenv import load_dotenv
 # Load environment variables from .env file
 # from proxysetup import get_browser_with_proxy_strategy
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
 PROXY_SERVER = os.getenv("PROXY_SERVER")
@@ -73,7 +76,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 response = await client.get(modified_url)
@@ -86,10 +89,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     logging.error(f"Failed to download {product_name} after {retries} attempts.")
     return "N/A"
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
 
 
 ########################################  safe_goto_and_wait ####################################################################
@@ -99,6 +98,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -116,7 +116,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -124,7 +124,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -133,126 +133,90 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
 ########################################  get browser with proxy ####################################################################
       
 
-async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=False,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
-
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
+async def get_browser_with_proxy_strategy(p, url: str, before_goto=None):
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait, headless=False, before_goto=before_goto)
 
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
 
+def build_url_with_loadmore(base_url: str, page_count: int) -> str:
+    separator = '&' if '&' in base_url else '&'
+    return f"{base_url}{separator}page={page_count}"   
 
 
+async def read_product_tile(product):
+    """Name, price, image URL and additional info of one product tile."""
+    try:
+        product_name = await (await product.query_selector("span.w_iUH7")).inner_text()
+    except:
+        product_name = "N/A"
 
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
+        price_container = await product.query_selector("div[data-automation-id='product-price']")
+        if price_container:
+            price_value = (await price_container.inner_text()).strip()
+        else:
+            price_value = "N/A"
     except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
+        print(f"Error extracting price: {e}")
+        price_value = "N/A"
 
 
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
 
+    try:
+        image_elem = await product.query_selector("img")
+        if image_elem:
+            image_url = await image_elem.get_attribute("src")
+            if not image_url:
+                # Fallback to srcset
+                srcset = await image_elem.get_attribute("srcset")
+                if srcset:
+                    image_url = srcset.split(" ")[0]  # get the first image URL
+        else:
+            image_url = "N/A"
+    except:
+        image_url = "N/A"
+
+    additional_info = []
+
+    # Extract brand name
+    try:
+        brand_el = await product.query_selector("div.mb1.mt2.b.f6.black.mr1.lh-solid")
+        if brand_el:
+            brand_text = await brand_el.inner_text()
+            additional_info.append(f"Brand: {brand_text.strip()}")
+        else:
+            additional_info.append("Brand: N/A")
+    except Exception:
+        additional_info.append("Brand: N/A")
 
-def build_url_with_loadmore(base_url: str, page_count: int) -> str:
-    separator = '&' if '&' in base_url else '&'
-    return f"{base_url}{separator}page={page_count}"   
+
+    try:
+        # Get the visible string like "4.5 out of 5 Stars. 576 reviews"
+        rating_span = await product.query_selector("span.w_iUH7")
+        if rating_span:
+            rating_text = await rating_span.inner_text()
+            additional_info.append(rating_text.strip())
+        else:
+            additional_info.append("Rating N/A")
+    except Exception:
+        additional_info.append("Rating N/A")
+
+    additional_info_str = " | ".join(additional_info)    
+
+    return product_name, price_value, image_url, additional_info_str
+
+
+RETAILER = {
+    "domains": ["www.walmart.com"],
+    "handler": "handle_walmart",
+}
+
+# Search/browse results the page requests from Walmart's GraphQL gateway; the
+# page number is inside the query variables, so every page is captured, not replayed
+PRODUCT_API = {
+    "patterns": [r"/orchestra/snb/graphql/(?:Search|Browse)\b"],
+    "fields": {"price": "priceInfo.linePrice", "image": "imageInfo.thumbnailUrl"},
+}
 
 
 async def handle_walmart(url, max_pages):
@@ -278,6 +242,7 @@ async def handle_walmart(url, max_pages):
 
     page_count = 1
     success_count = 0
+    capture = ApiCapture(PRODUCT_API)
 
     while page_count <= max_pages:
         current_url = build_url_with_loadmore(url, page_count)
@@ -287,28 +252,24 @@ async def handle_walmart(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
+            async with shared_playwright() as p:
                 
-                browser, page = await get_browser_with_proxy_strategy(p, current_url)
+                browser, page = await get_browser_with_proxy_strategy(p, current_url, before_goto=capture.attach)
                 log_event(f"Successfully loaded: {current_url}")
 
                 # Scroll to load all products
-                prev_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))
-                    current_count = await page.locator('[data-testid="item-stack"] > div').count()
-                    if current_count == prev_count:
-                        break
-                    prev_count = current_count
+                await scroll_until_loaded(page, '[data-testid="item-stack"] > div')
 
+                products = await capture.wait()
+                if not products:
                     # Correct selector for the product wrapper
                     product_wrapper = await page.query_selector('div[data-testid="item-stack"]')
 
                     # Correct selector for individual product blocks (class names separated with dots)
                     products = await product_wrapper.query_selector_all("div.mb0.ph0-xl.pt0-xl.bb.b--near-white.w-25.pb3-m.ph1") if product_wrapper else []
 
-                    logging.info(f"Total products found on page {page_count}: {len(products)}")
+                logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
 
                 page_title = await page.title()
@@ -319,65 +280,13 @@ async def handle_walmart(url, max_pages):
                 image_tasks = []
 
                 for row_num, product in enumerate(products, start=len(sheet["A"]) + 1):
-                    try:
-                        product_name = await (await product.query_selector("span.w_iUH7")).inner_text()
-                    except:
-                        product_name = "N/A"
-                    
-                    try:
-                        price_container = await product.query_selector("div[data-automation-id='product-price']")
-                        if price_container:
-                            price_value = (await price_container.inner_text()).strip()
-                        else:
-                            price_value = "N/A"
-                    except Exception as e:
-                        print(f"Error extracting price: {e}")
-                        price_value = "N/A"
+                    if isinstance(product, dict):
+                        product_name, price_value, image_url, additional_info_str = tile_fields(product)
+                    else:
+                        product_name, price_value, image_url, additional_info_str = await read_product_tile(product)
 
 
 
-                    try:
-                        image_elem = await product.query_selector("img")
-                        if image_elem:
-                            image_url = await image_elem.get_attribute("src")
-                            if not image_url:
-                                # Fallback to srcset
-                                srcset = await image_elem.get_attribute("srcset")
-                                if srcset:
-                                    image_url = srcset.split(" ")[0]  # get the first image URL
-                        else:
-                            image_url = "N/A"
-                    except:
-                        image_url = "N/A"
-                        
-                    additional_info = []
-                    
-                    # Extract brand name
-                    try:
-                        brand_el = await product.query_selector("div.mb1.mt2.b.f6.black.mr1.lh-solid")
-                        if brand_el:
-                            brand_text = await brand_el.inner_text()
-                            additional_info.append(f"Brand: {brand_text.strip()}")
-                        else:
-                            additional_info.append("Brand: N/A")
-                    except Exception:
-                        additional_info.append("Brand: N/A")
-
-
-                    try:
-                        # Get the visible string like "4.5 out of 5 Stars. 576 reviews"
-                        rating_span = await product.query_selector("span.w_iUH7")
-                        if rating_span:
-                            rating_text = await rating_span.inner_text()
-                            additional_info.append(rating_text.strip())
-                        else:
-                            additional_info.append("Rating N/A")
-                    except Exception:
-                        additional_info.append("Rating N/A")
-
-                    additional_info_str = " | ".join(additional_info)    
-
-
                     gold_type_match = re.search(r"\b\d+K\s+\w+\s+\w+\b", product_name)
                     kt = gold_type_match.group() if gold_type_match else "Not found"
 
@@ -411,6 +320,7 @@ async def handle_walmart(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -430,27 +340,21 @@ async def handle_walmart(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
\ No newline at end of file
+    return filename, file_path
\ No newline at end of file
@@ -1,26 +1,29 @@
 import os
 import re
-import time
 import logging
-import random
 import uuid
 import asyncio
-import base64
 from datetime import datetime
-from playwright.async_api import async_playwright, TimeoutError, Error
+from playwright.async_api import TimeoutError, Error
+from scraper_loop import shared_playwright
+from infinite_scroll import scroll_until_loaded
+from api_capture import ApiCapture, tile_fields
+from rate_limiter import throttle
+from usage_ledger import tracked_client
+from proxysetup import open_proxied_browser
 from openpyxl import Workbook
 from openpyxl.drawing.image import Image
 from PIL import Image as PILImage
 from utils import get_public_ip, log_event, sanitize_filename
 from dotenv import load_dotenv
 from database import insert_into_db
+from progress import report_progress
 from limit_checker import update_product_count
 from io import BytesIO
 from openpyxl.drawing.image import Image as XLImage
 import httpx
 # Load environment variables from .env file
-import traceback
-from typing import List, Tuple
+from typing import Tuple
 
 load_dotenv()
 PROXY_URL = os.getenv("PROXY_URL")
@@ -75,7 +78,7 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     image_full_path = os.path.join(image_folder, image_filename)
     modified_url = modify_image_url(image_url)  # High-res version
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
+    async with tracked_client(timeout=10.0) as client:
         for attempt in range(retries):
             try:
                 # Try high-res version first
@@ -106,11 +109,6 @@ async def download_image_async(image_url, product_name, timestamp, image_folder,
     return "N/A"
 
 
-def random_delay(min_sec=1, max_sec=3):
-    """Introduce a random delay to mimic human-like behavior."""
-    time.sleep(random.uniform(min_sec, max_sec))
-
-
             
 ########################################  safe_goto_and_wait ####################################################################
 
@@ -119,6 +117,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
     for attempt in range(retries):
         try:
             print(f"[Attempt {attempt + 1}] Navigating to: {url}")
+            report_progress("navigating", url=url, attempt=attempt + 1)
             
             if isbri_data:
                 await page.goto(url, timeout=180_000, wait_until="domcontentloaded")
@@ -136,7 +135,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.error(f"Error navigating to {url} on attempt {attempt + 1}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -144,7 +143,7 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
             logging.warning(f"TimeoutError on attempt {attempt + 1} navigating to {url}: {e}")
             if attempt < retries - 1:
                 logging.info("Retrying after waiting a bit...")
-                random_delay(1, 3)  # Add a delay before retrying
+                await throttle(url)  # politeness wait before retrying
             else:
                 logging.error(f"Failed to navigate to {url} after {retries} attempts.")
                 raise
@@ -153,130 +152,100 @@ async def safe_goto_and_wait(page, url,isbri_data, retries=2):
 ########################################  get browser with proxy ####################################################################
       
 
-async def get_browser_with_proxy_strategy(p, url: str):
-    """
-    Dynamically checks robots.txt and selects proxy accordingly
-    Always uses proxies - never scrapes directly
-    """
-    parsed_url = httpx.URL(url)
-    base_url = f"{parsed_url.scheme}://{parsed_url.host}"
-    
-    # 1. Fetch and parse robots.txt
-    disallowed_patterns = await get_robots_txt_rules(base_url)
-    
-    # 2. Check if URL matches any disallowed pattern
-    is_disallowed = check_url_against_rules(str(parsed_url), disallowed_patterns)
-    
-    # 3. Try proxies in order (bri-data first if allowed, oxylabs if disallowed)
-    proxies_to_try = [
-        PROXY_URL if not is_disallowed else {
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        },
-        {  # Fallback to the other proxy
-            "server": PROXY_SERVER,
-            "username": PROXY_USERNAME,
-            "password": PROXY_PASSWORD
-        } if not is_disallowed else PROXY_URL
-    ]
-
-    last_error = None
-    for proxy_config in proxies_to_try:
-        browser = None
-        try:
-            isbri_data = False
-            if proxy_config == PROXY_URL:
-                logging.info("Attempting with bri-data proxy (allowed by robots.txt)")
-                browser = await p.chromium.connect_over_cdp(PROXY_URL)
-                isbri_data = True
-            else:
-                logging.info("Attempting with oxylabs proxy (required by robots.txt)")
-                browser = await p.chromium.launch(
-                    proxy=proxy_config,
-                    headless=True,
-                    args=[
-                        '--disable-blink-features=AutomationControlled',
-                        '--disable-web-security'
-                    ]
-                )
-
-            context = await browser.new_context()
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                })
-            """)
-            page = await context.new_page()
-            
-            await safe_goto_and_wait(page, url,isbri_data)
-            return browser, page
+async def get_browser_with_proxy_strategy(p, url: str, before_goto=None):
+    """Open a proxied page on url via the shared proxy strategy."""
+    return await open_proxied_browser(p, url, safe_goto_and_wait, before_goto=before_goto)
 
-        except Exception as e:
-            last_error = e
-            error_trace = traceback.format_exc()
-            logging.error(f"Proxy attempt failed:\n{error_trace}")
-            if browser:
-                await browser.close()
-            continue
 
-    error_msg = (f"Failed to load {url} using all proxy options. "
-                f"Last error: {str(last_error)}\n"
-                f"URL may be disallowed by robots.txt or proxies failed.")
-    logging.error(error_msg)
-    raise RuntimeError(error_msg)
+def build_url_with_loadmore(base_url: str, page_count: int) -> str:
+    separator = '&' if '?' in base_url else '?'
+    return f"{base_url}{separator}loadMore={page_count}"            
 
 
+async def read_product_tile(product):
+    """Name, price, image URL and additional info of one product tile."""
+    try:
+        product_name = await (await product.query_selector("h2.name.product-tile-description")).inner_text()
+    except:
+        product_name = "N/A"
 
 
-async def get_robots_txt_rules(base_url: str) -> List[str]:
-    """Dynamically fetch and parse robots.txt rules"""
-    robots_url = f"{base_url}/robots.txt"
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(robots_url, timeout=10)
-            if resp.status_code == 200:
-                return [
-                    line.split(":", 1)[1].strip()
-                    for line in resp.text.splitlines()
-                    if line.lower().startswith("disallow:")
-                ]
+        # Extract current price (the offer price if available)
+        price_el = await product.query_selector("div.price")
+        current_price_text = await price_el.inner_text() if price_el else ""
+        # print(f"Current Price Text: {current_price_text}")  # Debugging
+        current_price = current_price_text.strip().split()[0] if current_price_text else ""  # ensures we get only "$1014.30"
+
+        # Extract discount if available (e.g., "30% off")
+        discount_el = await product.query_selector("span.tag-text")
+        discount_text = await discount_el.inner_text() if discount_el else ""
+        # print(f"Discount Text: {discount_text}")  # Debugging
+        discount = discount_text.replace(" off", "").strip() if discount_text else ""  # just "30%"
+
+        # Extract original price with $ (if offer price is not available)
+        original_price_el = await product.query_selector("div.original-price")
+        original_price_text = await original_price_el.inner_text() if original_price_el else ""
+        # print(f"Original Price Text: {original_price_text}")  # Debugging
+        original_price = original_price_text.strip().replace("Was", "").strip().split()[0] if original_price_text else ""  # "$1449.00"
+
+        # Build the final formatted price
+        if current_price:  # If there is a current price
+            if discount:
+                price = f"{current_price} offer of {discount} {original_price}"
+            else:
+                price = current_price  # No discount, just current price
+        elif original_price:  # If there is no current price but original price is available
+            price = original_price
+        else:
+            price = "N/A"  # If neither price is available
+
     except Exception as e:
-        logging.warning(f"Couldn't fetch robots.txt: {e}")
-    return []
+        price = "N/A"
+        print(f"Error: {e}")  # Log the error for debugging
 
 
-def check_url_against_rules(url: str, disallowed_patterns: List[str]) -> bool:
-    """Check if URL matches any robots.txt disallowed pattern"""
-    for pattern in disallowed_patterns:
-        try:
-            # Handle wildcard patterns
-            if "*" in pattern:
-                regex_pattern = pattern.replace("*", ".*")
-                if re.search(regex_pattern, url):
-                    return True
-            # Handle path patterns
-            elif url.startswith(f"{pattern}"):
-                return True
-            # Handle query parameters
-            elif ("?" in url) and any(
-                f"{param}=" in url 
-                for param in pattern.split("=")[0].split("*")[-1:]
-                if "=" in pattern
-            ):
-                return True
-        except Exception as e:
-            logging.warning(f"Error checking pattern {pattern}: {e}")
-    return False
 
 
 
 
-def build_url_with_loadmore(base_url: str, page_count: int) -> str:
-    separator = '&' if '?' in base_url else '?'
-    return f"{base_url}{separator}loadMore={page_count}"            
+
+    try:
+        image_url = await (await product.query_selector("img[itemprop='image']")).get_attribute("src")
+    except:
+        image_url = "N/A"
+
+    additional_info = []
+
+    try:
+        tag_els = await product.query_selector_all("span.product-tag.groupby-tablet-product-tags")
+        if tag_els:
+            for tag_el in tag_els:
+                tag_text = await tag_el.inner_text()
+                if tag_text:
+                    additional_info.append(tag_text.strip())
+        else:
+            additional_info.append("N/A")
+
+    except Exception as e:
+        additional_info.append("N/A")
+
+    additional_info_str = " | ".join(additional_info)
+
+    return product_name, price, image_url, additional_info_str
+
 
 ########################################  Main Function Call ####################################################################
+RETAILER = {
+    "domains": ["www.zales.com"],
+    "handler": "handle_zales",
+}
+
+# Grid data the storefront (SAP Commerce) loads its tiles from; see api_capture
+PRODUCT_API = {
+    "patterns": [r"/(?:search|c/[^?]+)/results\b", r"/productSearch\b"],
+    "page_param": "currentPage",
+}
 
 
 async def handle_zales(url, max_pages):
@@ -302,6 +271,7 @@ async def handle_zales(url, max_pages):
 
     page_count = 0
     success_count = 0
+    capture = ApiCapture(PRODUCT_API)
 
     while page_count < max_pages:
         current_url = build_url_with_loadmore(url, page_count)
@@ -311,26 +281,29 @@ async def handle_zales(url, max_pages):
         browser = None
         page = None
         try:
-            async with async_playwright() as p:
-                browser, page = await get_browser_with_proxy_strategy(p, current_url)
-                log_event(f"Successfully loaded: {current_url}")
-
-                # Scroll to load all products
-                prev_product_count = 0
-                for _ in range(10):
-                    await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-                    await asyncio.sleep(random.uniform(1, 2))  # Random delay between scrolls
-                    current_product_count = await page.locator('.product-item').count()
-                    if current_product_count == prev_product_count:
+            async with shared_playwright() as p:
+                products = None
+                if capture.replayable:
+                    # later pages come straight from the product API, after the last page it served
+                    products = await capture.replay()
+                    if products == []:
+                        logging.info("Product API has no further products; stopping")
                         break
-                    prev_product_count = current_product_count
-
-
-                product_wrapper = await page.query_selector("div.product-scroll-wrapper")
-                products = await product_wrapper.query_selector_all("div.product-item") if product_wrapper else []
+                if products is None:
+                    browser, page = await get_browser_with_proxy_strategy(p, current_url, before_goto=capture.attach)
+                    log_event(f"Successfully loaded: {current_url}")
+
+                    # Scroll to load all products
+                    await scroll_until_loaded(page, '.product-item')
+
+                    page_title = await page.title()
+                    products = await capture.wait()
+                    if not products:
+                        product_wrapper = await page.query_selector("div.product-scroll-wrapper")
+                        products = await product_wrapper.query_selector_all("div.product-item") if product_wrapper else []
                 logging.info(f"Total products found on page {page_count}: {len(products)}")
+                report_progress("products_extracted", count=len(products))
 
-                page_title = await page.title()
                 current_date = datetime.now().strftime("%Y-%m-%d")
                 time_only = datetime.now().strftime("%H.%M")
 
@@ -338,74 +311,11 @@ async def handle_zales(url, max_pages):
                 image_tasks = []
 
                 for row_num, product in enumerate(products, start=len(sheet["A"]) + 1):
-                    try:
-                        product_name = await (await product.query_selector("h2.name.product-tile-description")).inner_text()
-                    except:
-                        product_name = "N/A"
-
-                    
-                    try:
-                        # Extract current price (the offer price if available)
-                        price_el = await product.query_selector("div.price")
-                        current_price_text = await price_el.inner_text() if price_el else ""
-                        # print(f"Current Price Text: {current_price_text}")  # Debugging
-                        current_price = current_price_text.strip().split()[0] if current_price_text else ""  # ensures we get only "$1014.30"
-
-                        # Extract discount if available (e.g., "30% off")
-                        discount_el = await product.query_selector("span.tag-text")
-                        discount_text = await discount_el.inner_text() if discount_el else ""
-                        # print(f"Discount Text: {discount_text}")  # Debugging
-                        discount = discount_text.replace(" off", "").strip() if discount_text else ""  # just "30%"
-
-                        # Extract original price with $ (if offer price is not available)
-                        original_price_el = await product.query_selector("div.original-price")
-                        original_price_text = await original_price_el.inner_text() if original_price_el else ""
-                        # print(f"Original Price Text: {original_price_text}")  # Debugging
-                        original_price = original_price_text.strip().replace("Was", "").strip().split()[0] if original_price_text else ""  # "$1449.00"
+                    if isinstance(product, dict):
+                        product_name, price, image_url, additional_info_str = tile_fields(product)
+                    else:
+                        product_name, price, image_url, additional_info_str = await read_product_tile(product)
 
-                        # Build the final formatted price
-                        if current_price:  # If there is a current price
-                            if discount:
-                                price = f"{current_price} offer of {discount} {original_price}"
-                            else:
-                                price = current_price  # No discount, just current price
-                        elif original_price:  # If there is no current price but original price is available
-                            price = original_price
-                        else:
-                            price = "N/A"  # If neither price is available
-
-                    except Exception as e:
-                        price = "N/A"
-                        print(f"Error: {e}")  # Log the error for debugging
-
-
-
-
-
-
-
-                    try:
-                        image_url = await (await product.query_selector("img[itemprop='image']")).get_attribute("src")
-                    except:
-                        image_url = "N/A"
-                        
-                    additional_info = []
-
-                    try:
-                        tag_els = await product.query_selector_all("span.product-tag.groupby-tablet-product-tags")
-                        if tag_els:
-                            for tag_el in tag_els:
-                                tag_text = await tag_el.inner_text()
-                                if tag_text:
-                                    additional_info.append(tag_text.strip())
-                        else:
-                            additional_info.append("N/A")
-
-                    except Exception as e:
-                        additional_info.append("N/A")
-
-                    additional_info_str = " | ".join(additional_info)
-                    
                     if product_name == "N/A" or price == "N/A" or image_url == "N/A":
                         print(f"Skipping product due to missing data: Name: {product_name}, Price: {price}, Image: {image_url}")
                         continue 
@@ -444,6 +354,7 @@ async def handle_zales(url, max_pages):
                                 break
                     except asyncio.TimeoutError:
                         logging.warning(f"Timeout downloading image for row {row_num}")
+                report_progress("images_downloaded", count=len(image_tasks))
 
                 all_records.extend(records)
                 success_count += 1
@@ -463,27 +374,21 @@ async def handle_zales(url, max_pages):
             if browser:
                 await browser.close()
             
-            # Add delay between pages
-            await asyncio.sleep(random.uniform(2, 5))
-            
         page_count += 1
 
 
     # Final save and database operations
     if not all_records:
-        return None, None, None
+        return None, None
 
     # Save the workbook
     wb.save(file_path)
     log_event(f"Data saved to {file_path}")
 
-    # Encode the file in base64
-    with open(file_path, "rb") as file:
-        base64_encoded = base64.b64encode(file.read()).decode("utf-8")
 
     # Insert data into the database and update product count
     insert_into_db(all_records)
     update_product_count(len(all_records))
 
     # Return necessary information
-    return base64_encoded, filename, file_path
+    return filename, file_path
@@ -0,0 +1,358 @@
+"""
+Product discovery from retailers' sitemaps.
+
+Paging through listing grids with a large max_pages is slow and still misses
+products. discover() instead reads the sitemaps a retailer declares in its
+robots.txt (/sitemap.xml when it declares none), follows nested sitemap
+indexes and gzipped files, and queues every product URL on the crawl queue
+for a crawl node to read (see product_pages.py).
+
+Sitemaps are streamed: the response is decompressed and fed to an XML pull
+parser chunk by chunk, and each <url> element is dropped once read, so memory
+stays flat however large the file. Two registry settings drive it:
+
+    "settings": {
+        "sitemap_products": [r"/products/[^/]+$"],   # product URLs to queue (regexes)
+        "sitemap_filter": r"sitemap_products_",      # child sitemaps to read (default: all)
+    }
+
+The <lastmod> of every queued URL is kept in logs/sitemap_state.db, and a URL
+is only queued again once its lastmod moves past the stored one. URLs without
+a lastmod are queued the first time they are seen. A crawl node forgets the
+stored lastmod when the product task fails, so the next run queues it again.
+
+    python sitemaps.py discover https://cullenjewellery.com --limit 1000
+    python sitemaps.py discover https://cullenjewellery.com --dry-run
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import asyncio
+import logging
+import argparse
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+from xml.etree.ElementTree import XMLPullParser, ParseError
+
+import httpx
+
+import usage_ledger
+from crawl_queue import get_crawl_queue, dedupe_key
+from http_fetch import http_client
+from limit_checker import check_monthly_limit
+from proxy_monitor import OXYLABS
+from rate_limiter import throttle
+from robots import get_rules
+from scraper_registry import load_registry, resolve, DEFAULT_SETTINGS
+from utils import LOG_DIR
+
+SITEMAP_STATE_FILE = os.getenv("SITEMAP_STATE_FILE", os.path.join(LOG_DIR, "sitemap_state.db"))
+# Nesting of sitemap indexes followed below the robots-declared sitemaps
+SITEMAP_MAX_DEPTH = int(os.getenv("SITEMAP_MAX_DEPTH", "3"))
+# Sitemap files read per discovery run
+SITEMAP_MAX_FILES = int(os.getenv("SITEMAP_MAX_FILES", "500"))
+# Uncompressed bytes read from one file; the sitemap protocol caps files at 50MB
+SITEMAP_MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(50 * 1024 * 1024)))
+# URLs checked against the lastmod state and queued per batch
+SITEMAP_BATCH_SIZE = 500
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_lastmod(value):
+    """W3C datetime (date, or date and time with offset) as a UTC ISO string; None if unreadable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec="seconds")
+
+
+class SitemapEntry:
+    def __init__(self, kind, loc, lastmod):
+        self.kind = kind          # "url", or "sitemap" for an index entry
+        self.loc = loc
+        self.lastmod = lastmod
+
+
+class _SitemapReader:
+    """Incremental parser: feed it raw (possibly gzipped) bytes, take entries as they complete."""
+
+    def __init__(self):
+        self.parser = XMLPullParser(events=("start", "end"))
+        self.root = None
+        self.inflate = None
+        self.first = True
+        self.size = 0
+
+    def feed(self, chunk):
+        if self.first:
+            self.first = False
+            if chunk[:2] == _GZIP_MAGIC:
+                self.inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self.inflate:
+            chunk = self.inflate.decompress(chunk)
+        self.size += len(chunk)
+        if self.size > SITEMAP_MAX_BYTES:
+            raise ValueError(f"sitemap larger than {SITEMAP_MAX_BYTES} bytes")
+        self.parser.feed(chunk)
+        return self._entries()
+
+    def close(self):
+        if self.inflate:
+            self.parser.feed(self.inflate.flush())
+        self.parser.close()
+        return self._entries()
+
+    def _entries(self):
+        entries = []
+        for event, elem in self.parser.read_events():
+            if event == "start":
+                if self.root is None:
+                    self.root = elem
+                continue
+            kind = _local(elem.tag)
+            if kind not in ("url", "sitemap") or elem is self.root:
+                continue
+            fields = {_local(child.tag): (child.text or "").strip() for child in elem}
+            if fields.get("loc"):
+                entries.append(SitemapEntry(kind, fields["loc"], parse_lastmod(fields.get("lastmod"))))
+            # entries are children of the root; dropping them keeps memory flat
+            self.root.clear()
+        return entries
+
+
+async def read_sitemap(url):
+    """Yield the entries of one sitemap file as the response streams in."""
+    await throttle(url)
+    reader = _SitemapReader()
+    received = 0
+    async with http_client().stream("GET", url) as response:
+        if response.status_code >= 400:
+            raise httpx.HTTPStatusError(f"HTTP {response.status_code}", request=response.request,
+                                        response=response)
+        async for chunk in response.aiter_bytes():
+            received += len(chunk)
+            for entry in reader.feed(chunk):
+                yield entry
+    for entry in reader.close():
+        yield entry
+    usage_ledger.ledger.record_request(OXYLABS, url, received)
+
+
+class DiscoveryStats:
+    def __init__(self):
+        self.sitemaps = 0
+        self.failed_sitemaps = 0
+        self.urls = 0
+        self.products = 0
+        self.changed = 0
+        self.queued = 0
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+async def iter_sitemap_urls(sitemap_urls, child_filter=None, stats=None, max_files=SITEMAP_MAX_FILES):
+    """
+    Yield (loc, lastmod) of every <url> reachable from sitemap_urls, following
+    index entries breadth-first up to SITEMAP_MAX_DEPTH levels down. Index
+    entries that do not match child_filter are skipped.
+    """
+    stats = stats or DiscoveryStats()
+    pending = deque((url, 0) for url in sitemap_urls)
+    seen = set(sitemap_urls)
+    while pending and stats.sitemaps + stats.failed_sitemaps < max_files:
+        url, depth = pending.popleft()
+        try:
+            async for entry in read_sitemap(url):
+                if entry.kind == "url":
+                    stats.urls += 1
+                    yield entry.loc, entry.lastmod
+                elif depth < SITEMAP_MAX_DEPTH and entry.loc not in seen:
+                    if child_filter and not re.search(child_filter, entry.loc):
+                        continue
+                    seen.add(entry.loc)
+                    pending.append((entry.loc, depth + 1))
+            stats.sitemaps += 1
+        except (httpx.HTTPError, ParseError, ValueError, zlib.error) as e:
+            stats.failed_sitemaps += 1
+            logging.warning(f"Could not read sitemap {url}: {e}")
+    if pending:
+        logging.warning(f"Stopped after {max_files} sitemap files; {len(pending)} not read")
+
+
+class SitemapState:
+    """Last queued lastmod of every discovered URL, kept across runs."""
+
+    def __init__(self, path=SITEMAP_STATE_FILE):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sitemap_urls (
+                dedupe_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                lastmod TEXT,
+                queued_at REAL NOT NULL
+            )
+        """)
+
+    def changed(self, entries):
+        """The (url, lastmod) pairs that are new or whose lastmod moved past the stored one."""
+        keys = {dedupe_key(url): (url, lastmod) for url, lastmod in entries}
+        if not keys:
+            return []
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT dedupe_key, lastmod FROM sitemap_urls WHERE dedupe_key IN ({','.join('?' * len(keys))})",
+                list(keys),
+            ).fetchall()
+        known = dict(rows)
+        changed = []
+        for key, (url, lastmod) in keys.items():
+            if key not in known:
+                changed.append((url, lastmod))
+            elif lastmod and (known[key] is None or lastmod > known[key]):
+                changed.append((url, lastmod))
+        return changed
+
+    def record(self, entries):
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT INTO sitemap_urls (dedupe_key, url, lastmod, queued_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(dedupe_key) DO UPDATE SET url = excluded.url, lastmod = excluded.lastmod, "
+                "queued_at = excluded.queued_at",
+                [(dedupe_key(url), url, lastmod, now) for url, lastmod in entries],
+            )
+            self.conn.execute("COMMIT")
+
+    def forget(self, url):
+        """Drop url's stored lastmod, so the next discovery queues it again."""
+        with self._lock:
+            self.conn.execute("DELETE FROM sitemap_urls WHERE dedupe_key = ?", (dedupe_key(url),))
+
+
+_patterns = {}
+
+
+def _product_patterns(settings):
+    raw = settings.get("sitemap_products") or []
+    key = tuple(raw)
+    if key not in _patterns:
+        _patterns[key] = [re.compile(p) for p in raw]
+    return _patterns[key]
+
+
+def is_product_url(url):
+    """Whether url matches its retailer's sitemap_products patterns."""
+    entry = resolve(url)
+    if entry is None:
+        return False
+    return any(p.search(url) for p in _product_patterns(entry.settings))
+
+
+def _enqueue(queue, entries):
+    for url, _ in entries:
+        queue.enqueue(url, 1)
+
+
+async def discover(site_url, queue=None, state=None, limit=None, dry_run=False):
+    """
+    Queue the changed product URLs in the sitemaps of the retailer serving
+    site_url. limit caps how many are queued; dry_run only counts them.
+    Returns DiscoveryStats.
+    """
+    entry = resolve(site_url)
+    settings = entry.settings if entry else DEFAULT_SETTINGS
+    patterns = _product_patterns(settings)
+    if not patterns:
+        raise ValueError(f"No sitemap_products patterns configured for {site_url}")
+    queue = queue or (None if dry_run else get_crawl_queue())
+    state = state or SitemapState()
+
+    parts = urlsplit(site_url)
+    base_url = f"{parts.scheme}://{parts.netloc}"
+    rules = await get_rules(base_url)
+    sitemap_urls = rules.sitemaps or [f"{base_url}/sitemap.xml"]
+    logging.info(f"Discovering products of {base_url} from {len(sitemap_urls)} sitemap(s)")
+
+    stats = DiscoveryStats()
+    start = time.perf_counter()
+    batch = []
+
+    async def flush():
+        changed = state.changed(batch)
+        if limit is not None:
+            changed = changed[:max(0, limit - stats.queued)]
+        stats.changed += len(changed)
+        if changed and not dry_run:
+            # queue backends are blocking (SQLite/MSSQL)
+            await asyncio.to_thread(_enqueue, queue, changed)
+            state.record(changed)
+        stats.queued += len(changed)
+        batch.clear()
+
+    urls = iter_sitemap_urls(sitemap_urls, settings.get("sitemap_filter"), stats)
+    try:
+        async for url, lastmod in urls:
+            if not any(p.search(url) for p in patterns):
+                continue
+            stats.products += 1
+            batch.append((url, lastmod))
+            if len(batch) >= SITEMAP_BATCH_SIZE:
+                await flush()
+                if limit is not None and stats.queued >= limit:
+                    break
+        if batch:
+            await flush()
+    finally:
+        # stop the sitemap stream still open when the limit was reached
+        await urls.aclose()
+
+    stats.seconds = round(time.perf_counter() - start, 2)
+    logging.info(f"Sitemap discovery for {base_url}: {stats.to_dict()}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Queue changed product URLs from retailers' sitemaps.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("discover", help="read a retailer's sitemaps and queue its changed products")
+    run.add_argument("url", help="any URL of the retailer, e.g. its home page")
+    run.add_argument("--limit", type=int, default=None, help="queue at most this many URLs")
+    run.add_argument("--dry-run", action="store_true", help="count changed products without queueing them")
+    args = parser.parse_args()
+
+    if not args.dry_run and not check_monthly_limit():
+        sys.exit("Monthly limit reached. Scraping is disabled.")
+
+    load_registry()
+    stats = asyncio.run(discover(args.url, limit=args.limit, dry_run=args.dry_run))
+    print(json.dumps(stats.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
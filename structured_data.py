@@ -0,0 +1,285 @@
+"""
+Product data that storefronts embed as structured data, read without a browser.
+
+Many listing pages carry their complete product data in machine-readable
+form: schema.org JSON-LD (<script type="application/ld+json">) for search
+engines, Next.js's __NEXT_DATA__ blob for their own front end, and on Shopify
+the collection feed at /collections/<handle>/products.json. structured_products
+GETs the listing URL once over HTTP, detects which of these it offers and
+returns product dicts in the same shape as api_capture (name, price, image,
+url, id, tags), so handlers read them with tile_fields and skip the DOM.
+
+Shopify collection feeds are paged (SHOPIFY_PAGE_SIZE products per feed page,
+up to max_pages feed pages). Data embedded in the HTML covers one listing
+page; further pages are read only when the handler says how to build their
+URLs (page_url), otherwise the handler's own pagination is left to do it.
+
+structured_products returns None when the page offers nothing usable or
+cannot be fetched without a browser; the handler then scrapes as before.
+"""
+import os
+import re
+import json
+import time
+import logging
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+import usage_ledger
+from api_capture import parse_products
+from http_fetch import http_client, is_challenge
+from proxy_monitor import OXYLABS
+from rate_limiter import throttle
+
+SHOPIFY_PAGE_SIZE = int(os.getenv("SHOPIFY_PAGE_SIZE", "250"))
+
+JSON_LD = "json-ld"
+NEXT_DATA = "next-data"
+SHOPIFY = "shopify"
+
+CURRENCY_SYMBOLS = {"USD": "$", "AUD": "$", "NZD": "$", "CAD": "$", "GBP": "£", "EUR": "€", "INR": "₹"}
+
+_SHOPIFY_MARKERS = ("cdn.shopify.com", "Shopify.shop", "shopify-section")
+_SHOPIFY_CURRENCY = re.compile(r'Shopify\.currency\s*=\s*\{\s*"active"\s*:\s*"(\w+)"')
+_COLLECTION = re.compile(r"^(/(?:[a-z]{2}(?:-[a-z]{2})?/)?collections/[^/]+)")
+
+
+class StructuredListing:
+    def __init__(self, products, title, source):
+        self.products = products
+        self.title = title
+        self.source = source
+
+
+def _price(value, currency=None):
+    if value in (None, ""):
+        return None
+    try:
+        amount = float(str(value).replace(",", ""))
+    except ValueError:
+        return str(value).strip() or None
+    symbol = CURRENCY_SYMBOLS.get(currency, f"{currency} " if currency else "")
+    return f"{symbol}{amount:,.2f}"
+
+
+def _types(obj):
+    kind = obj.get("@type")
+    return set(kind) if isinstance(kind, list) else {kind}
+
+
+def _ld_nodes(value):
+    """Every object in a JSON-LD document, including @graph members and list items."""
+    if isinstance(value, list):
+        for item in value:
+            yield from _ld_nodes(item)
+    elif isinstance(value, dict):
+        yield value
+        for key in ("@graph", "itemListElement", "item", "mainEntity"):
+            if key in value:
+                yield from _ld_nodes(value[key])
+
+
+def _ld_product(obj, base_url):
+    offers = obj.get("offers") or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    spec = offers.get("priceSpecification") or {}
+    if isinstance(spec, list):
+        spec = spec[0] if spec else {}
+    price = offers.get("price", offers.get("lowPrice", spec.get("price")))
+    currency = offers.get("priceCurrency") or spec.get("priceCurrency")
+
+    image = obj.get("image")
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get("url") or image.get("contentUrl")
+
+    tags = []
+    availability = offers.get("availability")
+    if availability:
+        tags.append(f"Stock: {availability.rsplit('/', 1)[-1]}")
+    brand = obj.get("brand")
+    if isinstance(brand, dict):
+        brand = brand.get("name")
+    if brand:
+        tags.append(f"Brand: {brand}")
+
+    return {
+        "name": obj.get("name"),
+        "price": _price(price, currency),
+        "image": urljoin(base_url, image) if isinstance(image, str) else None,
+        "url": urljoin(base_url, obj["url"]) if isinstance(obj.get("url"), str) else None,
+        "id": obj.get("sku") or obj.get("productID") or obj.get("@id"),
+        "tags": tags,
+    }
+
+
+def products_from_json_ld(soup, base_url):
+    products = {}
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            document = json.loads(script.string or "")
+        except json.JSONDecodeError:
+            continue
+        for node in _ld_nodes(document):
+            if _types(node) & {"Product", "ProductGroup"} and node.get("name"):
+                product = _ld_product(node, base_url)
+                products.setdefault(product["id"] or product["url"] or product["name"], product)
+    return list(products.values())
+
+
+def products_from_next_data(soup, base_url):
+    script = soup.find("script", id="__NEXT_DATA__")
+    if not script:
+        return []
+    try:
+        payload = json.loads(script.string or "")
+    except json.JSONDecodeError:
+        return []
+    return parse_products(payload.get("props", payload), {}, base_url)
+
+
+def _shopify_product(obj, base_url, currency):
+    variants = obj.get("variants") or [{}]
+    prices = [v.get("price") for v in variants if v.get("price") not in (None, "")]
+    price = min(prices, key=lambda p: float(p)) if prices else None
+    images = obj.get("images") or []
+    tags = obj.get("tags") or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(",") if t.strip()]
+    if obj.get("vendor"):
+        tags = [f"Brand: {obj['vendor']}"] + tags
+    return {
+        "name": obj.get("title"),
+        "price": _price(price, currency),
+        "image": images[0].get("src") if images else None,
+        "url": urljoin(base_url, f"/products/{obj['handle']}") if obj.get("handle") else None,
+        "id": obj.get("id"),
+        "tags": tags,
+    }
+
+
+def shopify_feed_url(url):
+    """The products.json feed of a Shopify collection URL, or None for other pages."""
+    parts = urlsplit(url)
+    match = _COLLECTION.match(parts.path)
+    if not match:
+        return None
+    return urlunsplit((parts.scheme, parts.netloc, f"{match.group(1)}/products.json", "", ""))
+
+
+async def _get(url):
+    """GET url through the proxy; None if it failed or was answered with a bot challenge."""
+    await throttle(url)
+    start = time.perf_counter()
+    try:
+        response = await http_client().get(url)
+    except httpx.HTTPError as e:
+        logging.info(f"Structured data fetch of {url} failed: {e}")
+        return None
+    usage_ledger.bind_site(url)
+    usage_ledger.ledger.record_request(OXYLABS, url, len(response.content))
+    usage_ledger.ledger.record_navigation(OXYLABS, url, (time.perf_counter() - start) * 1000,
+                                          ok=response.status_code < 400)
+    if is_challenge(response) or response.status_code >= 400:
+        logging.info(f"Structured data fetch of {url} not usable (HTTP {response.status_code})")
+        return None
+    return response
+
+
+async def _shopify_products(feed_url, max_pages, base_url, currency):
+    products = []
+    for page_number in range(1, max_pages + 1):
+        response = await _get(f"{feed_url}?limit={SHOPIFY_PAGE_SIZE}&page={page_number}")
+        if response is None:
+            return products or None
+        try:
+            feed = response.json().get("products") or []
+        except (json.JSONDecodeError, AttributeError):
+            return products or None
+        products.extend(p for p in (_shopify_product(obj, base_url, currency) for obj in feed) if p["name"])
+        if len(feed) < SHOPIFY_PAGE_SIZE:
+            break
+    return products
+
+
+def _embedded_products(html, base_url):
+    soup = BeautifulSoup(html, "lxml")
+    title = soup.title.get_text().strip() if soup.title else ""
+    for source, read in ((JSON_LD, products_from_json_ld), (NEXT_DATA, products_from_next_data)):
+        products = read(soup, base_url)
+        if products:
+            return products, title, source
+    return [], title, None
+
+
+async def structured_products(url, max_pages, page_url=None):
+    """
+    Products of the listing at url from its structured data, or None if it
+    has none. page_url(url, n), if given, builds the URL of listing page n so
+    embedded data can be read for pages 2..max_pages as well.
+    """
+    response = await _get(url)
+    if response is None:
+        return None
+    html = response.text
+    base_url = str(response.url)
+
+    feed_url = shopify_feed_url(base_url)
+    if feed_url and any(marker in html for marker in _SHOPIFY_MARKERS):
+        currency = _SHOPIFY_CURRENCY.search(html)
+        products = await _shopify_products(feed_url, max_pages, base_url, currency.group(1) if currency else None)
+        if products:
+            title = BeautifulSoup(html, "lxml").title
+            logging.info(f"Read {len(products)} products from Shopify feed {feed_url}")
+            return StructuredListing(products, title.get_text().strip() if title else "", SHOPIFY)
+
+    products, title, source = _embedded_products(html, base_url)
+    if not products:
+        return None
+    if max_pages > 1 and not page_url:
+        logging.info(f"{url} embeds {source} for one page only; leaving pagination to the handler")
+        return None
+
+    seen = {p["id"] or p["url"] or p["name"] for p in products}
+    for page_number in range(2, max_pages + 1):
+        response = await _get(page_url(url, page_number))
+        if response is None:
+            break
+        page_products, _, _ = _embedded_products(response.text, str(response.url))
+        new = [p for p in page_products if (p["id"] or p["url"] or p["name"]) not in seen]
+        if not new:
+            break
+        seen.update(p["id"] or p["url"] or p["name"] for p in new)
+        products.extend(new)
+
+    logging.info(f"Read {len(products)} products from {source} on {url}")
+    return StructuredListing(products, title, source)
+
+
+def _same_page(a, b):
+    a, b = urlsplit(a), urlsplit(b)
+    return a.netloc.lower() == b.netloc.lower() and a.path.rstrip("/") == b.path.rstrip("/")
+
+
+async def product_from_page(url):
+    """
+    The product a product detail page describes in its structured data, as a
+    one-product listing; None if none. A product whose url is the page itself
+    is preferred. Otherwise only JSON-LD's first Product is trusted, since
+    lists found in __NEXT_DATA__ on a detail page are usually related products.
+    """
+    response = await _get(url)
+    if response is None:
+        return None
+    page_url = str(response.url)
+    products, title, source = _embedded_products(response.text, page_url)
+    product = next((p for p in products if p["url"] and _same_page(p["url"], page_url)), None)
+    if product is None and source == JSON_LD and products:
+        product = products[0]
+    if product is None:
+        return None
+    return StructuredListing([product], title, source)
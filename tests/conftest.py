@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Modules that keep state on disk open their default files at import; point
+# them at a scratch directory so test runs never touch logs/.
+_scratch = tempfile.mkdtemp(prefix="scraper-tests-")
+os.environ.setdefault("USAGE_DB_PATH", os.path.join(_scratch, "proxy_usage.db"))
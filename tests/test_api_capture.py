@@ -0,0 +1,55 @@
+from api_capture import _detect_items, parse_products, tile_fields
+
+SEARCH_PAYLOAD = {
+    "menu": [{"name": "Rings", "url": "/rings"}, {"name": "Earrings", "url": "/earrings"},
+             {"name": "Sale", "url": "/sale"}],
+    "facets": [{"name": "Metal", "values": [{"name": "Gold"}]}],
+    "results": {
+        "products": [
+            {"code": "1001", "name": "Solitaire Ring", "url": "/p/1001",
+             "price": {"value": 1299.5, "currencyIso": "USD"},
+             "images": [{"format": "thumbnail", "url": "/img/1001.jpg"}],
+             "badges": [{"text": "New"}, "Online only"]},
+            {"code": "1002", "name": "Halo Ring", "url": "/p/1002",
+             "price": {"formattedValue": "$899.00"},
+             "images": [{"url": "https://cdn.example.com/1002.jpg"}]},
+            {"code": "1003", "name": "", "url": "/p/1003", "price": {"value": 10}},
+        ],
+    },
+}
+
+
+def test_detects_the_product_list_not_the_menus():
+    items = _detect_items(SEARCH_PAYLOAD, {})
+    assert [item["code"] for item in items] == ["1001", "1002"]
+
+
+def test_a_list_of_links_is_used_when_nothing_has_prices():
+    payload = {"grid": [{"title": "Ring A", "pdpUrl": "/a"}, {"title": "Ring B", "pdpUrl": "/b"}],
+               "nav": [{"label": "Home"}, {"label": "Rings"}]}
+    assert [item["title"] for item in _detect_items(payload, {})] == ["Ring A", "Ring B"]
+
+
+def test_lists_mostly_without_names_are_skipped():
+    payload = {"tiles": [{"price": 1}, {"price": 2}, {"price": 3, "name": "Only one"}]}
+    assert _detect_items(payload, {}) == []
+
+
+def test_parse_products_reads_and_resolves_fields():
+    products = parse_products(SEARCH_PAYLOAD, {}, base_url="https://www.example.com/api/search?page=1")
+    assert products[0] == {
+        "name": "Solitaire Ring", "url": "https://www.example.com/p/1001", "id": "1001",
+        "price": "1,299.50", "image": "https://www.example.com/img/1001.jpg", "tags": ["New", "Online only"],
+    }
+    assert products[1]["price"] == "$899.00"
+    assert products[1]["image"] == "https://cdn.example.com/1002.jpg"
+    assert tile_fields(products[1]) == ("Halo Ring", "$899.00", "https://cdn.example.com/1002.jpg", "N/A")
+
+
+def test_configured_paths_override_detection():
+    payload = {"data": {"hits": [{"label": "Pendant", "cost": {"display": "$50"}, "pic": "p.jpg"}]}}
+    config = {"items": "data.hits", "fields": {"name": "label", "price": "cost.display", "image": "pic"},
+              "image_base": "https://img.example.com/"}
+    products = parse_products(payload, config, base_url="https://www.example.com/api")
+    assert [(p["name"], p["price"], p["image"]) for p in products] == [
+        ("Pendant", "$50", "https://img.example.com/p.jpg")]
@@ -0,0 +1,21 @@
+import pytest
+
+from batch import normalize_items
+
+
+def test_strings_and_dicts_are_normalized():
+    items = normalize_items([" https://www.kay.com/rings ",
+                             {"url": "https://www.zales.com/rings", "maxPages": "3"}], default_pages=2)
+    assert items == [{"url": "https://www.kay.com/rings", "max_pages": 2},
+                     {"url": "https://www.zales.com/rings", "max_pages": 3}]
+
+
+@pytest.mark.parametrize("raw", [{"url": 5}, {"url": None}, {"url": "https://www.kay.com", "max_pages": "two"}])
+def test_malformed_items_raise_value_error(raw):
+    with pytest.raises(ValueError):
+        normalize_items([raw])
+
+
+def test_missing_url_raises_key_error():
+    with pytest.raises(KeyError):
+        normalize_items([{"max_pages": 1}])
@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+from crawl_queue import SQLiteCrawlQueue, QUEUED, LEASED, DONE, FAILED
+
+
+@pytest.fixture(params=["memory", "file"])
+def queue(request, tmp_path):
+    path = ":memory:" if request.param == "memory" else str(tmp_path / "crawl_queue.db")
+    return SQLiteCrawlQueue(path)
+
+
+def test_enqueue_dedupes_in_flight_urls(queue):
+    first = queue.enqueue("https://Example.com/rings/", 2)
+    assert queue.enqueue("https://example.com/rings#top", 5) == first
+
+    task = queue.lease("node-a")
+    assert task.id == first
+    assert queue.enqueue("https://example.com/rings", 2) == first
+
+    queue.complete(task.id, "node-a", {"rows": 1})
+    assert queue.enqueue("https://example.com/rings", 2) != first
+    assert queue.stats()[QUEUED] == 1
+
+
+def test_expired_lease_is_requeued(queue):
+    task_id = queue.enqueue("https://example.com/rings", 1, max_attempts=2)
+    assert queue.lease("node-a", lease_seconds=-1).id == task_id
+    assert queue.heartbeat(task_id, "node-a") is True
+
+    assert queue.requeue_expired() == 0
+
+    assert queue.heartbeat(task_id, "node-a", lease_seconds=-1) is True
+    assert queue.requeue_expired() == 1
+    assert queue.get(task_id).status == QUEUED
+
+    task = queue.lease("node-b", lease_seconds=-1)
+    assert task.id == task_id and task.attempts == 2
+    queue.requeue_expired()
+    assert queue.get(task_id).status == FAILED
+
+
+def test_heartbeat_and_complete_need_the_lease_owner(queue):
+    task_id = queue.enqueue("https://example.com/rings", 1)
+    queue.lease("node-a")
+
+    assert queue.heartbeat(task_id, "node-b") is False
+    assert queue.complete(task_id, "node-b") is False
+    assert queue.fail(task_id, "node-b", "boom") is False
+    assert queue.get(task_id).status == LEASED
+
+    assert queue.heartbeat(task_id, "node-a") is True
+    assert queue.complete(task_id, "node-a", {"rows": 3}) is True
+    assert queue.get(task_id).status == DONE
+    assert queue.heartbeat(task_id, "node-a") is False
+
+
+def test_concurrent_leases_hand_out_each_task_once(queue):
+    task_ids = {queue.enqueue(f"https://example.com/rings?page={n}", 1) for n in range(40)}
+    leased = []
+    errors = []
+    start = threading.Barrier(8)
+
+    def worker(name):
+        start.wait()
+        try:
+            while True:
+                task = queue.lease(name)
+                if task is None:
+                    return
+                leased.append(task.id)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(f"node-{n}",)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert sorted(leased) == sorted(task_ids)
+    assert queue.stats()[LEASED] == len(task_ids)
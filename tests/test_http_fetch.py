@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+import http_fetch
+from http_fetch import BROWSER, HTTP, FetchModes, fetch_listing
+from proxy_monitor import BRIGHT_DATA, OXYLABS
+
+
+class FakePage:
+    async def title(self):
+        return "Rings"
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    async def close(self):
+        pass
+
+
+async def open_browser(p, url):
+    return FakeBrowser(), FakePage()
+
+
+@pytest.fixture
+def modes(tmp_path, monkeypatch):
+    modes = FetchModes(str(tmp_path / "fetch_modes.json"), flush_seconds=3600)
+    monkeypatch.setattr(http_fetch, "fetch_modes", modes)
+    return modes
+
+
+def use_proxies(monkeypatch, order):
+    async def preferred_proxies(url):
+        return list(order)
+    monkeypatch.setattr(http_fetch, "preferred_proxies", preferred_proxies)
+
+
+def test_modes_are_saved_on_flush_only(modes):
+    modes.record("kay.com", HTTP, "tiles found in HTML")
+    modes.record("kay.com", HTTP, "tiles found in HTML")
+    assert modes.get("kay.com") == HTTP
+    with pytest.raises(FileNotFoundError):
+        open(modes.path)
+
+    modes.flush()
+    with open(modes.path) as f:
+        assert json.load(f)["kay.com"]["pages"] == 2
+    assert FetchModes(modes.path).get("kay.com") == HTTP
+
+
+def test_bright_data_pages_skip_http(modes, monkeypatch):
+    use_proxies(monkeypatch, [BRIGHT_DATA, OXYLABS])
+
+    async def fetch_http(url, spec):
+        raise AssertionError("HTTP fetch through Oxylabs")
+    monkeypatch.setattr(http_fetch, "_fetch_http", fetch_http)
+    monkeypatch.setattr(http_fetch, "extract_tiles", lambda page, spec: asyncio.sleep(0, ["tile"]))
+
+    listing = asyncio.run(fetch_listing(None, "https://www.example.com/rings", {}, open_browser))
+    assert listing.mode == BROWSER
+    assert listing.tiles == ["tile"]
+    # the choice of proxy is not a verdict on the domain
+    assert modes.snapshot() == {}
+
+
+def test_oxylabs_pages_use_http(modes, monkeypatch):
+    use_proxies(monkeypatch, [OXYLABS, BRIGHT_DATA])
+
+    async def fetch_http(url, spec):
+        return (["tile"], "Rings"), None
+    monkeypatch.setattr(http_fetch, "_fetch_http", fetch_http)
+
+    listing = asyncio.run(fetch_listing(None, "https://www.example.com/rings", {}, open_browser))
+    assert listing.mode == HTTP
+    assert modes.get("example.com") == HTTP
@@ -0,0 +1,65 @@
+import asyncio
+
+from paginator import fetch_pages
+
+
+def url_for_page(page_number):
+    return f"https://example.com/rings?page={page_number}"
+
+
+def crawl(fetch_page, max_pages, concurrency=3):
+    seen = []
+    results = asyncio.run(fetch_pages(url_for_page, max_pages, fetch_page,
+                                      on_page=lambda n, rows: seen.append((n, rows)),
+                                      concurrency=concurrency))
+    return results, seen
+
+
+def test_results_arrive_in_page_order():
+    finished = []
+
+    async def fetch_page(page_number, page_url):
+        # later pages finish first
+        await asyncio.sleep(0.01 * (6 - page_number))
+        finished.append(page_number)
+        return 1, [page_url]
+
+    results, seen = crawl(fetch_page, 5, concurrency=5)
+    assert finished != sorted(finished)
+    assert [n for n, _ in seen] == [1, 2, 3, 4, 5]
+    assert results == [[url_for_page(n)] for n in range(1, 6)]
+
+
+def test_page_without_tiles_stops_the_crawl():
+    started = []
+
+    async def fetch_page(page_number, page_url):
+        started.append(page_number)
+        await asyncio.sleep(0.01)
+        return (0, []) if page_number == 3 else (2, [page_number])
+
+    results, seen = crawl(fetch_page, 10, concurrency=2)
+    assert [n for n, _ in seen] == [1, 2]
+    assert results == [[1], [2]]
+    # pages queued behind the empty one never start
+    assert max(started) <= 4
+
+
+def test_page_whose_tiles_were_all_skipped_does_not_stop_the_crawl():
+    async def fetch_page(page_number, page_url):
+        return (4, []) if page_number == 2 else (4, [page_number])
+
+    results, seen = crawl(fetch_page, 3)
+    assert [n for n, _ in seen] == [1, 2, 3]
+    assert results == [[1], [], [3]]
+
+
+def test_failing_page_is_skipped():
+    async def fetch_page(page_number, page_url):
+        if page_number == 2:
+            raise RuntimeError("navigation failed")
+        return 1, [page_number]
+
+    results, seen = crawl(fetch_page, 3)
+    assert [n for n, _ in seen] == [1, 3]
+    assert results == [[1], [3]]
@@ -0,0 +1,36 @@
+import threading
+import time
+
+import proxy
+from proxy import ProxyHealthCache
+
+
+def test_first_reads_share_the_background_check(monkeypatch):
+    checks = []
+
+    async def check():
+        return None
+
+    def run_scraper(coro):
+        coro.close()
+        checks.append(threading.current_thread().name)
+        time.sleep(0.1)
+        return {"ok": True, "message": "Both proxies are working.", "checked_at": time.time(), "proxies": {}}
+
+    monkeypatch.setattr(proxy, "_check_proxies_async", check)
+    monkeypatch.setattr(proxy, "run_scraper", run_scraper)
+    monkeypatch.setattr(proxy, "log_event", lambda message: None)
+
+    health = ProxyHealthCache(ttl=3600)
+    readers = [threading.Thread(target=lambda: results.append(health.get())) for _ in range(3)]
+    results = []
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join(5)
+
+    assert checks == ["proxy-health"]
+    assert [status["ok"] for status in results] == [True, True, True]
+
+    health.get(force=True)
+    assert len(checks) == 2
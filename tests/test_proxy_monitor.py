@@ -0,0 +1,74 @@
+import types
+
+import pytest
+
+import proxy_monitor
+from proxy_monitor import BRIGHT_DATA, CLOSED, HALF_OPEN, OPEN, OXYLABS, ProxyMonitor
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(proxy_monitor, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def monitor(clock):
+    return ProxyMonitor(cooldown=60, max_failures=3, failure_rate=0.5)
+
+
+def fail(monitor, name, times=1):
+    for _ in range(times):
+        monitor.record(name, False, error="net::ERR_TUNNEL_CONNECTION_FAILED")
+
+
+def test_consecutive_failures_open_the_circuit(monitor):
+    fail(monitor, BRIGHT_DATA, 2)
+    assert monitor.snapshot()[BRIGHT_DATA]["state"] == CLOSED
+    fail(monitor, BRIGHT_DATA)
+    assert monitor.snapshot()[BRIGHT_DATA]["state"] == OPEN
+    assert monitor.order([BRIGHT_DATA, OXYLABS]) == [OXYLABS]
+    assert monitor.allow(BRIGHT_DATA) is False
+
+
+def test_failure_rate_opens_the_circuit(monitor):
+    for _ in range(5):
+        monitor.record(OXYLABS, True, 100, 900)
+        fail(monitor, OXYLABS)
+    assert monitor.snapshot()[OXYLABS]["state"] == OPEN
+    assert monitor.snapshot()[OXYLABS]["consecutive_failures"] == 1
+
+
+def test_one_trial_after_the_cooldown(monitor, clock):
+    fail(monitor, BRIGHT_DATA, 3)
+    clock[0] += 61
+    assert monitor.available(BRIGHT_DATA) is True
+    assert monitor.allow(BRIGHT_DATA) is True
+    assert monitor.snapshot()[BRIGHT_DATA]["state"] == HALF_OPEN
+    # the trial slot is taken until the attempt is recorded
+    assert monitor.allow(BRIGHT_DATA) is False
+    assert monitor.available(BRIGHT_DATA) is False
+
+    fail(monitor, BRIGHT_DATA)
+    assert monitor.snapshot()[BRIGHT_DATA]["state"] == OPEN
+    clock[0] += 61
+    assert monitor.allow(BRIGHT_DATA) is True
+    monitor.record(BRIGHT_DATA, True, 120, 800)
+    assert monitor.snapshot()[BRIGHT_DATA]["state"] == CLOSED
+
+
+def test_all_open_returns_every_backend(monitor):
+    fail(monitor, BRIGHT_DATA, 3)
+    fail(monitor, OXYLABS, 3)
+    assert monitor.order([OXYLABS, BRIGHT_DATA]) == [OXYLABS, BRIGHT_DATA]
+
+
+def test_snapshot_latency_percentiles(monitor):
+    for ms in range(1, 11):
+        monitor.record(OXYLABS, True, ms * 10, ms * 100)
+    stats = monitor.snapshot()[OXYLABS]
+    assert stats["success_rate"] == 1.0
+    assert stats["connect_ms"] == {"p50": 60, "p90": 100, "p99": 100}
+    assert stats["navigation_ms"]["p50"] == 600
+    assert monitor.snapshot()[BRIGHT_DATA]["success_rate"] is None
@@ -0,0 +1,69 @@
+import asyncio
+import types
+
+import pytest
+
+import rate_limiter
+import scraper_registry
+from rate_limiter import TokenBucket, rate_stats, throttle
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(rate_limiter, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waited = []
+
+    async def sleep(seconds):
+        waited.append(seconds)
+
+    monkeypatch.setattr(rate_limiter, "asyncio", types.SimpleNamespace(sleep=sleep))
+    return waited
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(scraper_registry, "_by_host", {})
+    monkeypatch.setattr(scraper_registry, "_entries", {})
+    monkeypatch.setattr(rate_limiter, "_buckets", {})
+
+
+def test_burst_then_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # each further token is a reservation one second further out
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_elapsed_time_counts_towards_the_gap(clock):
+    bucket = TokenBucket(rate_per_minute=30)
+    assert bucket.reserve() == 0
+    clock[0] += 1.5
+    assert bucket.reserve() == pytest.approx(0.5)
+    clock[0] += 10
+    # refill is capped at the burst
+    assert bucket.reserve() == pytest.approx(0.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_throttle_shares_a_bucket_per_retailer(clock, sleeps):
+    scraper_registry.register({"domains": ["kay.com", "kayoutlet.com"], "handler": "handle_kay",
+                               "settings": {"rate_per_minute": 6}}, "kay")
+
+    async def crawl():
+        await throttle("https://www.kay.com/rings")
+        await throttle("https://www.kayoutlet.com/rings")
+        await throttle("https://www.zales.com/rings")
+
+    asyncio.run(crawl())
+    assert sleeps == [pytest.approx(10.0)]
+    stats = rate_stats()
+    assert stats["kay"] == {"rate_per_minute": 6.0, "burst": 1, "requests": 2, "seconds_waited": 10.0}
+    assert stats["www.zales.com"]["requests"] == 1
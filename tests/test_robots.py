@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from robots import RobotsCache, RobotsRules, parse_robots_txt
+
+ROBOTS_TXT = """
+User-agent: *
+Disallow: /account
+Allow: /account/login
+Disallow: /*?sort=
+Disallow: /*.pdf$
+Disallow: /search
+Allow: /search
+
+User-agent: otherbot
+Disallow: /
+
+Sitemap: https://www.example.com/sitemap.xml
+"""
+
+
+@pytest.fixture
+def rules():
+    return parse_robots_txt(ROBOTS_TXT, "*")
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/rings", True),
+    ("/account/orders", False),
+    # the longer Allow beats the shorter Disallow
+    ("/account/login", True),
+    ("/account/login/reset", True),
+    ("/rings?sort=price", False),
+    ("/rings?page=2", True),
+    ("/catalog/rings.pdf", False),
+    # $ anchors the pattern to the end of the URL
+    ("/catalog/rings.pdf?download=1", True),
+    # Allow wins a tie of equal length
+    ("/search", True),
+])
+def test_longest_match_wins(rules, path, allowed):
+    assert rules.is_allowed(f"https://www.example.com{path}") is allowed
+
+
+def test_specific_agent_group_is_chosen():
+    rules = parse_robots_txt(ROBOTS_TXT, "OtherBot/2.1")
+    assert rules.is_allowed("https://www.example.com/rings") is False
+    assert rules.sitemaps == ["https://www.example.com/sitemap.xml"]
+
+
+def test_agent_lines_share_a_group():
+    rules = parse_robots_txt("User-agent: a\nUser-agent: *\nDisallow: /private\n", "*")
+    assert rules.is_allowed("https://www.example.com/private/1") is False
+
+
+def test_concurrent_misses_fetch_once(monkeypatch):
+    cache = RobotsCache()
+    fetches = []
+
+    async def fetch(base_url):
+        fetches.append(base_url)
+        await asyncio.sleep(0.05)
+        rules = RobotsRules([(False, "/private")])
+        cache._rules[base_url] = (rules, float("inf"))
+        return rules
+
+    monkeypatch.setattr(cache, "_fetch", fetch)
+
+    async def main():
+        return await asyncio.gather(*(cache.get_rules("https://www.example.com") for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert fetches == ["https://www.example.com"]
+    assert all(rules is results[0] for rules in results)
+    assert cache.stats()["misses"] == 1
+
+
+def test_cancelled_fetch_hands_over_to_a_waiter(monkeypatch):
+    cache = RobotsCache()
+    fetches = []
+
+    async def fetch(base_url):
+        fetches.append(base_url)
+        await asyncio.sleep(0.05)
+        rules = RobotsRules()
+        cache._rules[base_url] = (rules, float("inf"))
+        return rules
+
+    monkeypatch.setattr(cache, "_fetch", fetch)
+
+    async def main():
+        first = asyncio.create_task(cache.get_rules("https://www.example.com"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_rules("https://www.example.com"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert isinstance(asyncio.run(main()), RobotsRules)
+    assert len(fetches) == 2
@@ -0,0 +1,71 @@
+import pytest
+
+import scraper_registry
+from scraper_registry import (DEFAULT_SETTINGS, get_settings, load_registry, normalize_host,
+                              read_retailer_meta, register, resolve)
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(scraper_registry, "_by_host", {})
+    monkeypatch.setattr(scraper_registry, "_entries", {})
+
+
+@pytest.mark.parametrize("value, host", [
+    ("https://WWW.Bash.com:443/rings?page=2", "www.bash.com"),
+    ("bash.com/rings", "bash.com"),
+    ("bash.com.", "bash.com"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_host(value, host):
+    assert normalize_host(value) == host
+
+
+def test_resolve_walks_parent_domains():
+    entry = register({"domains": ["bash.com"], "handler": "handle_bash"}, "bash")
+    assert resolve("https://www.bash.com/rings") is entry
+    assert resolve("https://shop.eu.bash.com") is entry
+    assert resolve("https://notbash.com") is None
+
+
+def test_resolve_never_matches_a_bare_tld():
+    register({"domains": ["com.au"], "handler": "handle_au"}, "au")
+    register({"domains": ["com"], "handler": "handle_com"}, "com")
+    assert resolve("https://www.example.com") is None
+    assert resolve("https://www.example.com.au").module_name == "au"
+
+
+def test_settings_override_the_defaults():
+    register({"domains": ["kay.com"], "handler": "handle_kay", "settings": {"concurrency": 2}}, "kay")
+    settings = get_settings("https://www.kay.com")
+    assert settings["concurrency"] == 2
+    assert settings["timeout"] == DEFAULT_SETTINGS["timeout"]
+    assert get_settings("https://unknown.example") == DEFAULT_SETTINGS
+
+
+def write_scraper(directory, name, source):
+    (directory / f"{name}.py").write_text(source, encoding="utf-8")
+
+
+def test_retailer_meta_is_read_from_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(scraper_registry, "SCRAPERS_DIR", str(tmp_path))
+    write_scraper(tmp_path, "block", 'import missing_dependency\n\nRETAILER = {\n'
+                                     '    "domains": ["block.com"],\n    "handler": "handle_block",\n}\n')
+    # a one-line block has no closing brace at the start of a line, so the module is parsed
+    write_scraper(tmp_path, "fallback", 'RETAILER = {"domains": ["fallback.com"], "handler": "handle_fallback"}\n')
+    write_scraper(tmp_path, "helper", "def helper():\n    pass\n")
+
+    assert read_retailer_meta("block") == {"domains": ["block.com"], "handler": "handle_block"}
+    assert read_retailer_meta("fallback") == {"domains": ["fallback.com"], "handler": "handle_fallback"}
+    assert read_retailer_meta("helper") is None
+
+
+def test_every_bundled_scraper_declares_a_handler():
+    entries = load_registry(lazy=True)
+    assert entries
+    for entry in entries.values():
+        assert entry.domains and entry.handler_name
+        source = open(f"{scraper_registry.SCRAPERS_DIR}/{entry.module_name}.py", encoding="utf-8").read()
+        assert f"def {entry.handler_name}(" in source
+    assert resolve("https://www.bash.com/rings").handler_name == "handle_bash"
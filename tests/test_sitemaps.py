@@ -0,0 +1,112 @@
+import asyncio
+import gzip
+
+import pytest
+
+import sitemaps
+from sitemaps import SitemapState, _SitemapReader, iter_sitemap_urls, parse_lastmod
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+URLSET = f"""<?xml version="1.0" encoding="UTF-8"?>
+<urlset {NS}>
+  <url><loc>https://www.example.com/products/ring-1</loc><lastmod>2025-03-01</lastmod></url>
+  <url><loc>https://www.example.com/products/ring-2</loc><lastmod>2025-03-02T10:00:00+02:00</lastmod></url>
+  <url><loc>https://www.example.com/about</loc></url>
+</urlset>""".encode()
+
+INDEX = f"""<?xml version="1.0" encoding="UTF-8"?>
+<sitemapindex {NS}>
+  <sitemap><loc>https://www.example.com/sitemap_products_1.xml</loc></sitemap>
+  <sitemap><loc>https://www.example.com/sitemap_pages_1.xml</loc></sitemap>
+</sitemapindex>""".encode()
+
+
+def read(data, chunk_size=7):
+    reader = _SitemapReader()
+    entries = []
+    for i in range(0, len(data), chunk_size):
+        entries += reader.feed(data[i:i + chunk_size])
+    entries += reader.close()
+    return reader, [(e.kind, e.loc, e.lastmod) for e in entries]
+
+
+def test_reader_streams_url_entries():
+    reader, entries = read(URLSET)
+    assert entries == [
+        ("url", "https://www.example.com/products/ring-1", "2025-03-01T00:00:00+00:00"),
+        ("url", "https://www.example.com/products/ring-2", "2025-03-02T08:00:00+00:00"),
+        ("url", "https://www.example.com/about", None),
+    ]
+    # read entries are dropped from the tree as they complete
+    assert len(reader.root) == 0
+
+
+def test_reader_inflates_gzip():
+    _, entries = read(gzip.compress(URLSET), chunk_size=5)
+    assert entries == read(URLSET)[1]
+
+
+def test_reader_yields_index_entries():
+    _, entries = read(INDEX)
+    assert [(kind, loc) for kind, loc, _ in entries] == [
+        ("sitemap", "https://www.example.com/sitemap_products_1.xml"),
+        ("sitemap", "https://www.example.com/sitemap_pages_1.xml"),
+    ]
+
+
+def test_reader_enforces_size_cap(monkeypatch):
+    monkeypatch.setattr(sitemaps, "SITEMAP_MAX_BYTES", 100)
+    with pytest.raises(ValueError):
+        read(URLSET, chunk_size=50)
+
+
+def test_parse_lastmod():
+    assert parse_lastmod("2025-03-02T10:00:00Z") == "2025-03-02T10:00:00+00:00"
+    assert parse_lastmod("not a date") is None
+    assert parse_lastmod(None) is None
+
+
+def test_nested_index_is_followed_through_the_filter(monkeypatch):
+    files = {"https://www.example.com/sitemap.xml": INDEX,
+             "https://www.example.com/sitemap_products_1.xml": URLSET}
+    fetched = []
+
+    async def read_sitemap(url):
+        fetched.append(url)
+        _, entries = read(files[url])
+        for kind, loc, lastmod in entries:
+            yield sitemaps.SitemapEntry(kind, loc, lastmod)
+
+    monkeypatch.setattr(sitemaps, "read_sitemap", read_sitemap)
+
+    async def collect():
+        return [url async for url, _ in iter_sitemap_urls(["https://www.example.com/sitemap.xml"],
+                                                          child_filter="sitemap_products_")]
+
+    urls = asyncio.run(collect())
+    assert fetched == ["https://www.example.com/sitemap.xml", "https://www.example.com/sitemap_products_1.xml"]
+    assert len(urls) == 3
+
+
+def test_state_reports_new_and_moved_lastmods():
+    state = SitemapState(":memory:")
+    first = [("https://www.example.com/products/a", "2025-03-01T00:00:00+00:00"),
+             ("https://www.example.com/products/b", None)]
+    assert state.changed(first) == first
+    state.record(first)
+
+    assert state.changed(first) == []
+    later = [("https://www.example.com/products/a", "2025-04-01T00:00:00+00:00"),
+             ("https://www.example.com/products/b", "2025-04-01T00:00:00+00:00"),
+             ("https://www.example.com/products/a/", "2025-02-01T00:00:00+00:00")]
+    # the trailing-slash duplicate of a keeps the last entry, which is older than the stored lastmod
+    assert state.changed(later) == [later[1]]
+
+
+def test_forgotten_urls_are_queued_again():
+    state = SitemapState(":memory:")
+    entries = [("https://www.example.com/products/a", "2025-03-01T00:00:00+00:00")]
+    state.record(entries)
+    state.forget("https://www.example.com/products/a/")
+    assert state.changed(entries) == entries
@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from structured_data import (JSON_LD, NEXT_DATA, _embedded_products, _price, _shopify_product,
+                             shopify_feed_url)
+
+BASE_URL = "https://www.example.com/collections/rings"
+
+
+def page(*scripts, title="Rings | Example"):
+    return f"<html><head><title>{title}</title>{''.join(scripts)}</head><body></body></html>"
+
+
+def ld_json(document):
+    return f'<script type="application/ld+json">{json.dumps(document)}</script>'
+
+
+def next_data(document):
+    return f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(document)}</script>'
+
+
+ITEM_LIST = {
+    "@context": "https://schema.org",
+    "@graph": [
+        {"@type": "Organization", "name": "Example Jewellers"},
+        {"@type": "ItemList", "itemListElement": [
+            {"@type": "ListItem", "position": 1, "item": {
+                "@type": "Product", "name": "Solitaire Ring", "sku": "R-1", "url": "/products/solitaire",
+                "image": [{"@type": "ImageObject", "url": "/img/r1.jpg"}],
+                "brand": {"@type": "Brand", "name": "Example"},
+                "offers": [{"@type": "Offer", "price": "1299", "priceCurrency": "USD",
+                            "availability": "https://schema.org/InStock"}]}},
+            {"@type": "ListItem", "position": 2, "item": {
+                "@type": ["Product", "Thing"], "name": "Halo Ring", "sku": "R-2",
+                "offers": {"@type": "Offer",
+                           "priceSpecification": {"price": 899.5, "priceCurrency": "GBP"}}}},
+        ]},
+    ],
+}
+
+
+@pytest.mark.parametrize("value, currency, expected", [
+    ("1299", "USD", "$1,299.00"),
+    (899.5, "GBP", "£899.50"),
+    ("1,050.00", "CHF", "CHF 1,050.00"),
+    ("1000", None, "1,000.00"),
+    ("Price on request", "USD", "Price on request"),
+    ("", "USD", None),
+])
+def test_price(value, currency, expected):
+    assert _price(value, currency) == expected
+
+
+def test_json_ld_item_list():
+    products, title, source = _embedded_products(page(ld_json(ITEM_LIST)), BASE_URL)
+    assert (title, source) == ("Rings | Example", JSON_LD)
+    assert products == [
+        {"name": "Solitaire Ring", "price": "$1,299.00", "image": "https://www.example.com/img/r1.jpg",
+         "url": "https://www.example.com/products/solitaire", "id": "R-1",
+         "tags": ["Stock: InStock", "Brand: Example"]},
+        {"name": "Halo Ring", "price": "£899.50", "image": None, "url": None, "id": "R-2", "tags": []},
+    ]
+
+
+def test_json_ld_duplicates_and_broken_scripts_are_skipped():
+    product = {"@type": "Product", "name": "Solitaire Ring", "sku": "R-1"}
+    html = page('<script type="application/ld+json">{not json</script>', ld_json(product), ld_json([product]))
+    products, _, _ = _embedded_products(html, BASE_URL)
+    assert [p["id"] for p in products] == ["R-1"]
+
+
+def test_next_data_is_read_when_there_is_no_json_ld():
+    document = {"props": {"pageProps": {"products": [
+        {"id": 7, "name": "Tennis Bracelet", "price": 450, "imageUrl": "/b7.jpg", "url": "/p/7"},
+        {"id": 8, "name": "Cuff", "price": 120, "imageUrl": "/b8.jpg", "url": "/p/8"},
+    ]}}}
+    html = page(ld_json({"@type": "WebSite", "name": "Example"}), next_data(document))
+    products, _, source = _embedded_products(html, BASE_URL)
+    assert source == NEXT_DATA
+    assert [(p["name"], p["price"], p["url"]) for p in products] == [
+        ("Tennis Bracelet", "450.00", "https://www.example.com/p/7"),
+        ("Cuff", "120.00", "https://www.example.com/p/8"),
+    ]
+
+
+def test_page_without_structured_data():
+    assert _embedded_products(page(title="Rings"), BASE_URL) == ([], "Rings", None)
+
+
+@pytest.mark.parametrize("url, feed", [
+    ("https://shop.example.com/collections/rings?page=2", "https://shop.example.com/collections/rings/products.json"),
+    ("https://shop.example.com/en-au/collections/rings/gold", "https://shop.example.com/en-au/collections/rings/products.json"),
+    ("https://shop.example.com/products/solitaire", None),
+])
+def test_shopify_feed_url(url, feed):
+    assert shopify_feed_url(url) == feed
+
+
+def test_shopify_product_takes_the_cheapest_variant():
+    product = _shopify_product({
+        "id": 42, "title": "Stacking Ring", "handle": "stacking-ring", "vendor": "Example",
+        "tags": "gold, stackable", "images": [{"src": "https://cdn.shopify.com/r.jpg"}],
+        "variants": [{"price": "120.00"}, {"price": "95.00"}, {"price": None}],
+    }, "https://shop.example.com", "AUD")
+    assert product == {
+        "name": "Stacking Ring", "price": "$95.00", "image": "https://cdn.shopify.com/r.jpg",
+        "url": "https://shop.example.com/products/stacking-ring", "id": 42,
+        "tags": ["Brand: Example", "gold", "stackable"],
+    }
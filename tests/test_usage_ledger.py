@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+from playwright.async_api import Error as PlaywrightError
+
+from usage_ledger import UsageLedger, response_size
+
+
+class FakeRequest:
+    def __init__(self, sizes):
+        self._sizes = sizes
+
+    async def sizes(self):
+        if isinstance(self._sizes, Exception):
+            raise self._sizes
+        return self._sizes
+
+
+class FakeResponse:
+    def __init__(self, sizes, headers=None):
+        self.request = FakeRequest(sizes)
+        self.headers = headers or {}
+
+
+class FakeContext:
+    def __init__(self):
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers[event] = handler
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return UsageLedger(str(tmp_path / "usage.db"), flush_seconds=3600)
+
+
+def test_response_size_uses_measured_sizes():
+    response = FakeResponse({"responseBodySize": 5000, "responseHeadersSize": 300},
+                            headers={"content-length": "10"})
+    assert asyncio.run(response_size(response)) == 5300
+
+
+def test_response_size_falls_back_to_content_length():
+    assert asyncio.run(response_size(FakeResponse(PlaywrightError("closed"), {"content-length": "42"}))) == 42
+    assert asyncio.run(response_size(FakeResponse(PlaywrightError("closed")))) == 0
+
+
+def test_records_are_summed_until_flushed(ledger):
+    ledger.record_request("oxylabs", "https://www.kay.com/rings", 1000, job="job-1")
+    ledger.record_request("oxylabs", "https://kay.com/earrings", 500, job="job-1")
+    ledger.record_navigation("oxylabs", "https://www.kay.com/rings", 1200.0)
+    ledger.record_navigation("oxylabs", "https://www.kay.com/rings", 800.0, ok=False)
+    ledger.record_request("direct", "https://www.zales.com/rings", 250)
+
+    assert len(ledger._pending) == 3
+    ledger.flush()
+    assert ledger._pending == {}
+
+    rows = {row["domain"]: row for row in ledger.query(group_by=("domain",))}
+    assert rows["kay.com"]["requests"] == 2
+    assert rows["kay.com"]["bytes"] == 1500
+    assert rows["kay.com"]["navigations"] == 2
+    assert rows["kay.com"]["failures"] == 1
+    assert rows["kay.com"]["nav_seconds"] == 2.0
+    assert rows["zales.com"]["bytes"] == 250
+
+
+def test_flushes_add_to_stored_rows(ledger):
+    ledger.record_request("oxylabs", "https://www.kay.com/rings", 100)
+    ledger.flush()
+    ledger.record_request("oxylabs", "https://www.kay.com/rings", 50)
+    ledger.flush()
+    assert ledger.totals()["oxylabs"]["requests"] == 2
+    assert ledger.totals()["oxylabs"]["bytes"] == 150
+
+
+def test_track_context_counts_measured_bytes(ledger):
+    context = FakeContext()
+    ledger.track_context(context, "brightdata", "https://www.kay.com/rings")
+    response = FakeResponse({"responseBodySize": 2048, "responseHeadersSize": 0})
+    asyncio.run(context.handlers["response"](response))
+
+    rows = ledger.query(group_by=("proxy", "domain"))
+    assert rows == [{"proxy": "brightdata", "domain": "kay.com", "requests": 1, "bytes": 2048,
+                     "navigations": 0, "failures": 0, "nav_seconds": 0.0}]
@@ -0,0 +1,47 @@
+import queue
+import threading
+
+import worker_farm
+from worker_farm import WorkerFarm
+
+
+class DeadProcess:
+    exitcode = -9
+
+    def is_alive(self):
+        return False
+
+
+class BusyQueue(queue.Queue):
+    """Never empty: another worker keeps sending progress events."""
+
+    def get(self, block=True, timeout=None):
+        return "progress", 1, "other-job", {"event": "page", "data": {}}
+
+
+def test_dead_worker_is_replaced_while_results_keep_arriving(monkeypatch):
+    monkeypatch.setattr(worker_farm, "FARM_LIVENESS_SECONDS", 0.05)
+    farm = WorkerFarm(num_workers=2)
+    farm._result_queue = BusyQueue()
+    farm._processes = {0: DeadProcess()}
+    farm._stats[0].current_job = "job-1"
+    future = worker_farm.Future()
+    farm._pending["job-1"] = (future, None)
+    spawned = []
+    # the replacement stays out of _processes, so the dead worker is reported once
+    monkeypatch.setattr(farm, "_spawn", lambda worker_id: (spawned.append(worker_id),
+                                                           farm._processes.pop(worker_id)))
+
+    farm._running = True
+    collector = threading.Thread(target=farm._collect, daemon=True)
+    collector.start()
+    try:
+        result = future.result(timeout=5)
+    finally:
+        farm._running = False
+        collector.join(5)
+
+    assert result["status"] == "failed"
+    assert "exited with code -9" in result["error"]
+    assert spawned == [0]
+    assert farm._stats[0].restarts == 1
@@ -0,0 +1,219 @@
+"""
+Proxy usage ledger: requests, response bytes and navigation time per proxy,
+retailer domain and job.
+
+Counts are taken from Playwright network events on every context opened
+through proxysetup and from the scrapers' image downloads (recorded under
+proxy "direct", since those do not go through a proxy). They are summed in
+memory and flushed every USAGE_FLUSH_SECONDS into an hourly-bucketed SQLite
+table (logs/proxy_usage.db), which several processes can write to at once.
+
+    python usage_ledger.py --group-by domain --since 2025-01-01
+"""
+import os
+import json
+import atexit
+import sqlite3
+import logging
+import argparse
+import threading
+import contextvars
+from datetime import datetime
+from contextlib import closing
+from urllib.parse import urlsplit
+
+import httpx
+from playwright.async_api import Error as PlaywrightError
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", os.path.join(BASE_DIR, "logs", "proxy_usage.db"))
+USAGE_FLUSH_SECONDS = int(os.getenv("USAGE_FLUSH_SECONDS", "30"))
+
+DIRECT = "direct"
+GROUP_COLUMNS = ("proxy", "domain", "job")
+
+# Job the current scrape belongs to; set by whatever started it (job, batch, crawl node...)
+_job = contextvars.ContextVar("usage_job", default=None)
+# Retailer domain being scraped; set when the handler opens its first page, so
+# image downloads from CDN hosts are charged to the retailer
+_site = contextvars.ContextVar("usage_site", default=None)
+
+
+def bind_job(job_id):
+    """Attribute usage in the current context to job_id. Returns a reset token."""
+    return _job.set(job_id)
+
+
+def unbind_job(token):
+    _job.reset(token)
+
+
+def bind_site(url):
+    _site.set(url)
+
+
+async def response_size(response):
+    """
+    Bytes a Playwright response took on the wire (body plus headers), as the
+    browser measured them. Content-Length is only the fallback: chunked and
+    most compressed responses do not send it.
+    """
+    try:
+        sizes = await response.request.sizes()
+        return max(0, sizes["responseBodySize"]) + max(0, sizes["responseHeadersSize"])
+    except (PlaywrightError, KeyError, TypeError):
+        try:
+            return int(response.headers.get("content-length", 0))
+        except ValueError:
+            return 0
+
+
+def _domain(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class UsageLedger:
+    def __init__(self, path=USAGE_DB_PATH, flush_seconds=USAGE_FLUSH_SECONDS):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self._pending = {}   # (hour, proxy, domain, job) -> [requests, bytes, navigations, nav_ms, failures]
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop = threading.Event()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS proxy_usage (
+                    hour TEXT NOT NULL,
+                    proxy TEXT NOT NULL,
+                    domain TEXT NOT NULL,
+                    job TEXT NOT NULL,
+                    requests INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    navigations INTEGER NOT NULL DEFAULT 0,
+                    nav_ms REAL NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (hour, proxy, domain, job)
+                )
+            """)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _add(self, proxy, domain, job, requests=0, size=0, navigations=0, nav_ms=0.0, failures=0):
+        key = (datetime.now().strftime("%Y-%m-%d %H:00"), proxy, domain, job or "")
+        with self._lock:
+            row = self._pending.setdefault(key, [0, 0, 0, 0.0, 0])
+            row[0] += requests
+            row[1] += size
+            row[2] += navigations
+            row[3] += nav_ms
+            row[4] += failures
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="usage-ledger", daemon=True)
+                self._flusher.start()
+
+    def record_request(self, proxy, page_url, size, job=None):
+        self._add(proxy, _domain(page_url), job or _job.get(), requests=1, size=size)
+
+    def record_navigation(self, proxy, page_url, nav_ms, ok=True):
+        self._add(proxy, _domain(page_url), _job.get(), navigations=1, nav_ms=nav_ms, failures=0 if ok else 1)
+
+    def track_context(self, context, proxy, page_url):
+        """Count every response the context receives against proxy and page_url's domain."""
+        job = _job.get()   # event callbacks do not run in the scraper's context
+
+        async def on_response(response):
+            self.record_request(proxy, page_url, await response_size(response), job)
+
+        context.on("response", on_response)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany("""
+                    INSERT INTO proxy_usage (hour, proxy, domain, job, requests, bytes, navigations, nav_ms, failures)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (hour, proxy, domain, job) DO UPDATE SET
+                        requests = requests + excluded.requests,
+                        bytes = bytes + excluded.bytes,
+                        navigations = navigations + excluded.navigations,
+                        nav_ms = nav_ms + excluded.nav_ms,
+                        failures = failures + excluded.failures
+                """, [(*key, *row) for key, row in pending.items()])
+        except sqlite3.Error as e:
+            logging.error(f"Could not flush proxy usage: {e}")
+            # keep the counts for the next flush rather than losing them
+            with self._lock:
+                for key, row in pending.items():
+                    current = self._pending.setdefault(key, [0, 0, 0, 0.0, 0])
+                    for i, value in enumerate(row):
+                        current[i] += value
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_seconds):
+            self.flush()
+
+    def query(self, group_by=("domain",), since=None, job=None, limit=100):
+        """Totals grouped by any of proxy/domain/job, most bytes first."""
+        columns = [c for c in group_by if c in GROUP_COLUMNS] or ["domain"]
+        self.flush()
+        where, params = [], []
+        if since:
+            where.append("hour >= ?")
+            params.append(since)
+        if job:
+            where.append("job = ?")
+            params.append(job)
+        sql = f"""
+            SELECT {", ".join(columns)}, SUM(requests) AS requests, SUM(bytes) AS bytes,
+                   SUM(navigations) AS navigations, SUM(nav_ms) AS nav_ms, SUM(failures) AS failures
+            FROM proxy_usage {"WHERE " + " AND ".join(where) if where else ""}
+            GROUP BY {", ".join(columns)}
+            ORDER BY bytes DESC
+            LIMIT ?
+        """
+        with closing(self._connect()) as conn:
+            conn.row_factory = sqlite3.Row
+            rows = [dict(row) for row in conn.execute(sql, (*params, int(limit)))]
+        for row in rows:
+            row["nav_seconds"] = round(row.pop("nav_ms") / 1000, 1)
+        return rows
+
+    def totals(self):
+        rows = self.query(group_by=("proxy",))
+        return {row["proxy"]: {k: v for k, v in row.items() if k != "proxy"} for row in rows}
+
+
+ledger = UsageLedger()
+atexit.register(ledger.flush)
+
+
+def tracked_client(**kwargs):
+    """httpx.AsyncClient whose responses (e.g. image downloads) are recorded in the ledger."""
+    async def on_response(response):
+        await response.aread()
+        ledger.record_request(DIRECT, _site.get() or str(response.url), len(response.content))
+
+    return httpx.AsyncClient(event_hooks={"response": [on_response]}, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show proxy usage from the ledger.")
+    parser.add_argument("--group-by", default="domain", help="comma list of proxy,domain,job")
+    parser.add_argument("--since", help="YYYY-MM-DD or 'YYYY-MM-DD HH:00'")
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+    rows = ledger.query(args.group_by.split(","), args.since, limit=args.limit)
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
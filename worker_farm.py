@@ -0,0 +1,265 @@
+"""
+Multi-process scrape worker farm.
+
+Each worker process has its own scraper event loop and Playwright driver and
+pulls jobs from a shared queue, so PIL thumbnailing, openpyxl serialisation,
+row normalisation and Playwright message handling for different scrapes run
+on different cores instead of sharing one GIL. Progress events, results and
+per-worker metrics flow back to the coordinator over a result queue.
+
+    python worker_farm.py urls.json --workers 4 --output manifest.json
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import Future
+
+FARM_WORKERS = int(os.getenv("SCRAPE_FARM_WORKERS", str(os.cpu_count() or 2)))
+# How often the collector checks for dead workers, busy or not
+FARM_LIVENESS_SECONDS = float(os.getenv("SCRAPE_FARM_LIVENESS_SECONDS", "1"))
+
+
+def _worker_main(worker_id, job_queue, result_queue):
+    """Worker process: own registry, own loop/driver, one job at a time."""
+    from scraper_registry import load_registry, resolve
+    from scraper_loop import run_scraper, shutdown
+    from progress import bind_listener, unbind_listener
+    from usage_ledger import bind_job, unbind_job, ledger
+
+    load_registry()
+    pid = os.getpid()
+    result_queue.put(("ready", worker_id, pid, None))
+    try:
+        while True:
+            job = job_queue.get()
+            if job is None:
+                break
+            job_id, url, max_pages = job
+            result_queue.put(("started", worker_id, job_id, None))
+
+            def forward(event, data, job_id=job_id):
+                result_queue.put(("progress", worker_id, job_id, {"event": event, "data": data}))
+
+            token = bind_listener(forward)
+            job_token = bind_job(job_id)
+            start = time.perf_counter()
+            result = {"url": url, "max_pages": max_pages, "worker": worker_id, "pid": pid,
+                      "status": "failed", "filename": None, "file_path": None, "error": None}
+            try:
+                scraper = resolve(url)
+                if scraper is None:
+                    raise RuntimeError("Unknown website")
+                filename, file_path = run_scraper(scraper.load_handler()(url, max_pages))
+                result.update(status="done" if filename else "failed", filename=filename, file_path=file_path)
+                if not filename:
+                    result["error"] = "Scraper did not produce a file"
+            except Exception as e:
+                result["error"] = str(e)
+            finally:
+                unbind_job(job_token)
+                unbind_listener(token)
+            result["seconds"] = round(time.perf_counter() - start, 2)
+            result_queue.put(("result", worker_id, job_id, result))
+    finally:
+        ledger.flush()
+        shutdown()
+
+
+class WorkerStats:
+    def __init__(self, worker_id):
+        self.worker_id = worker_id
+        self.pid = None
+        self.jobs_done = 0
+        self.jobs_failed = 0
+        self.busy_seconds = 0.0
+        self.current_job = None
+        self.restarts = 0
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class WorkerFarm:
+    """Pool of scraper processes fed from one job queue."""
+
+    def __init__(self, num_workers=FARM_WORKERS):
+        self.num_workers = num_workers
+        self._ctx = multiprocessing.get_context("spawn")
+        self._job_queue = self._ctx.Queue()
+        self._result_queue = self._ctx.Queue()
+        self._processes = {}
+        self._stats = {i: WorkerStats(i) for i in range(num_workers)}
+        self._pending = {}   # job_id -> (Future, on_progress)
+        self._lock = threading.Lock()
+        self._running = False
+        self._stopping = False
+        self._collector = None
+
+    def start(self):
+        if self._running:
+            return self
+        self._running = True
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+        self._collector = threading.Thread(target=self._collect, name="farm-collector", daemon=True)
+        self._collector.start()
+        logging.info(f"Worker farm started with {self.num_workers} processes")
+        return self
+
+    def _spawn(self, worker_id):
+        process = self._ctx.Process(
+            target=_worker_main, args=(worker_id, self._job_queue, self._result_queue),
+            name=f"scrape-worker-{worker_id}", daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    def submit(self, url, max_pages, on_progress=None, job_id=None):
+        """Queue one scrape; the Future resolves to the worker's result dict."""
+        if not self._running:
+            self.start()
+        job_id = job_id or uuid.uuid4().hex
+        future = Future()
+        with self._lock:
+            self._pending[job_id] = (future, on_progress)
+        self._job_queue.put((job_id, url, max_pages))
+        return future
+
+    def _collect(self):
+        next_check = time.monotonic() + FARM_LIVENESS_SECONDS
+        while self._running:
+            # on a timer: a steady stream of progress events must not hide a dead worker
+            if time.monotonic() >= next_check:
+                self._check_workers()
+                next_check = time.monotonic() + FARM_LIVENESS_SECONDS
+            try:
+                kind, worker_id, ref, payload = self._result_queue.get(
+                    timeout=max(0.0, next_check - time.monotonic()))
+            except queue.Empty:
+                continue
+            stats = self._stats[worker_id]
+            if kind == "ready":
+                stats.pid = ref
+            elif kind == "started":
+                stats.current_job = ref
+            elif kind == "progress":
+                with self._lock:
+                    _, on_progress = self._pending.get(ref, (None, None))
+                if on_progress:
+                    try:
+                        on_progress(payload["event"], payload["data"])
+                    except Exception as e:
+                        logging.warning(f"Progress callback failed: {e}")
+            elif kind == "result":
+                stats.current_job = None
+                stats.busy_seconds += payload.get("seconds") or 0
+                if payload["status"] == "done":
+                    stats.jobs_done += 1
+                else:
+                    stats.jobs_failed += 1
+                self._resolve(ref, payload)
+
+    def _resolve(self, job_id, result):
+        with self._lock:
+            future, _ = self._pending.pop(job_id, (None, None))
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def _check_workers(self):
+        """Fail the job of any worker that died and start a replacement."""
+        for worker_id, process in list(self._processes.items()):
+            if process.is_alive() or self._stopping:
+                continue
+            stats = self._stats[worker_id]
+            logging.error(f"Scrape worker {worker_id} (pid {stats.pid}) exited with code {process.exitcode}")
+            if stats.current_job:
+                self._resolve(stats.current_job, {
+                    "status": "failed", "worker": worker_id, "pid": stats.pid,
+                    "error": f"Worker process exited with code {process.exitcode}",
+                })
+                stats.jobs_failed += 1
+                stats.current_job = None
+            stats.restarts += 1
+            self._spawn(worker_id)
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._pending)
+        return {
+            "workers": [s.to_dict() for s in self._stats.values()],
+            "in_flight": queued,
+            "jobs_done": sum(s.jobs_done for s in self._stats.values()),
+            "jobs_failed": sum(s.jobs_failed for s in self._stats.values()),
+        }
+
+    def shutdown(self, timeout=30):
+        if not self._running:
+            return
+        self._stopping = True
+        for _ in self._processes:
+            self._job_queue.put(None)
+        for process in self._processes.values():
+            process.join(timeout)
+        self._running = False
+        logging.info("Worker farm stopped")
+
+
+_farm = None
+_farm_lock = threading.Lock()
+
+
+def get_farm():
+    """Process-wide farm, started on first use."""
+    global _farm
+    with _farm_lock:
+        if _farm is None:
+            _farm = WorkerFarm().start()
+    return _farm
+
+
+def main():
+    from batch import _read_items
+    parser = argparse.ArgumentParser(description="Scrape a list of URLs across several worker processes.")
+    parser.add_argument("input", help="JSON list of {url, max_pages} or a text file of 'url [max_pages]' lines")
+    parser.add_argument("--workers", type=int, default=FARM_WORKERS)
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--output", help="write the manifest here instead of stdout")
+    args = parser.parse_args()
+
+    from limit_checker import check_monthly_limit
+    if not check_monthly_limit():
+        sys.exit("Monthly limit reached. Scraping is disabled.")
+
+    items = _read_items(args.input, args.pages)
+    farm = WorkerFarm(args.workers).start()
+    started = time.time()
+    try:
+        futures = [farm.submit(item["url"], item["max_pages"]) for item in items]
+        results = [future.result() for future in futures]
+    finally:
+        farm.shutdown()
+    manifest = {
+        "elapsed_seconds": round(time.time() - started, 2),
+        "total": len(results),
+        "succeeded": sum(1 for r in results if r["status"] == "done"),
+        "failed": sum(1 for r in results if r["status"] != "done"),
+        "results": results,
+        "workers": farm.stats()["workers"],
+    }
+    output = json.dumps(manifest, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()